@@ -0,0 +1,39 @@
+from django.contrib import admin
+from django.contrib.admin import display
+
+from api.models import SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'short_sql',
+        'calls',
+        'total_time',
+        'mean_time',
+        'max_time',
+        'last_seen'
+    )
+    search_fields = ('sql', 'stack')
+    readonly_fields = (
+        'fingerprint',
+        'sql',
+        'params',
+        'stack',
+        'plan',
+        'calls',
+        'total_time',
+        'max_time',
+        'last_seen'
+    )
+
+    @display(description='Запрос')
+    def short_sql(self, obj):
+        return obj.sql[:120]
+
+    @display(description='Среднее время, мс')
+    def mean_time(self, obj):
+        return round(obj.total_time / obj.calls, 3) if obj.calls else 0
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,120 @@
+import fcntl
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from api.constants import ADMISSION_POLL_INTERVAL
+
+
+class SlotPool:
+    """Слоты конкурентности, общие для процессов узла.
+
+    Каждый слот — файл, занятый процессом, пока тот держит на нем flock.
+    Блокировка снимается ядром при завершении процесса, поэтому упавший
+    воркер не оставляет занятых слотов. flock действует на открытый файл,
+    а не на поток, поэтому занятые слоты процесса дополнительно
+    отмечаются в памяти.
+    """
+
+    def __init__(self, directory, name, size):
+        self.paths = [
+            os.path.join(directory, f'{name}.{index}') for index in range(size)
+        ]
+        self._fds = {}
+        self._pid = None
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            # Дескрипторы родителя после fork указывают на те же открытые
+            # файлы, и их блокировки были бы общими с родителем.
+            self._fds = {}
+            self._held = set()
+            self._pid = os.getpid()
+
+    def _fd(self, index):
+        fd = self._fds.get(index)
+        if fd is None:
+            path = self.paths[index]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = self._fds[index] = os.open(path, os.O_RDWR | os.O_CREAT)
+        return fd
+
+    def try_acquire(self):
+        """Номер занятого слота или None, если свободных нет."""
+        size = len(self.paths)
+        if not size:
+            return None
+        offset = random.randrange(size)
+        with self._lock:
+            self._reset_after_fork()
+            for step in range(size):
+                index = (offset + step) % size
+                if index in self._held:
+                    continue
+                fd = self._fd(index)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(index)
+                return index
+        return None
+
+    def release(self, index):
+        with self._lock:
+            fcntl.flock(self._fd(index), fcntl.LOCK_UN)
+            self._held.discard(index)
+
+
+class AdmissionController:
+    """Допуск запросов по классам нагрузки с ограниченной очередью.
+
+    У каждого класса свои слоты выполнения и слоты очереди. Запрос без
+    свободного слота выполнения занимает слот очереди и ждет не дольше
+    timeout секунд; если очередь тоже заполнена, он сразу отклоняется.
+    Класс read отделен от остальных, поэтому дешевое чтение не ждет за
+    медленными запросами.
+    """
+
+    def __init__(self, directory, limits, timeout):
+        self.timeout = timeout
+        self.pools = {
+            name: (
+                SlotPool(directory, name, concurrency),
+                SlotPool(directory, f'{name}-queue', queue_size),
+            )
+            for name, (concurrency, queue_size) in limits.items()
+        }
+
+    def acquire(self, name):
+        """Занятый слот (пул, номер) или None и время ожидания в очереди."""
+        running, queue = self.pools[name]
+        index = running.try_acquire()
+        if index is not None:
+            return (running, index), 0.0
+        queue_index = queue.try_acquire()
+        if queue_index is None:
+            return None, 0.0
+        start = time.monotonic()
+        deadline = start + self.timeout
+        try:
+            while time.monotonic() < deadline:
+                time.sleep(ADMISSION_POLL_INTERVAL)
+                index = running.try_acquire()
+                if index is not None:
+                    return (running, index), time.monotonic() - start
+        finally:
+            queue.release(queue_index)
+        return None, time.monotonic() - start
+
+
+admission = AdmissionController(
+    settings.ADMISSION_DIR,
+    settings.ADMISSION_LIMITS,
+    settings.ADMISSION_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,115 @@
+import copy
+import os
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import (BaseAuthentication,
+                                           TokenAuthentication)
+from rest_framework.authtoken.models import Token
+
+from api.cache import SharedCounters, TieredCache, get_shared_cache
+from api.constants import TOKEN_CACHE_VERSION_SLOTS
+from api.metrics import registry
+
+
+class TokenUserCache:
+    """Кэш пользователей по ключу токена.
+
+    Запись хранит пользователя вместе с версией токена и действительна,
+    пока версия не изменилась; версия проверяется при каждом попадании.
+    Выход из системы, смена пароля или блокировка меняют версии только
+    токенов этого пользователя. Если настроен общий кэш, версии хранятся
+    в нем и изменения видны воркерам всех узлов. Без общего кэша версии
+    хранятся в счетчиках узла, и такой кэш годится только для
+    развертывания на одном узле.
+    """
+
+    def __init__(self, maxsize, ttl, versions_path, version_slots):
+        self.cache = TieredCache('auth-token', maxsize, ttl)
+        self.local_versions = SharedCounters(versions_path, version_slots)
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, key):
+        """Текущая версия токена; читается до загрузки пользователя из БД."""
+        shared = get_shared_cache()
+        if shared is None:
+            return self.local_versions.get(key)
+        return shared.get_or_set(
+            f'auth-token-version:{key}', lambda: uuid4().hex,
+            self.cache.local.ttl
+        )
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is not None and entry[1] == self.version(key):
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def set(self, key, user, version):
+        self.cache.set(key, (user, version))
+
+    def invalidate(self, *keys):
+        def invalidate_keys():
+            shared = get_shared_cache()
+            for key in keys:
+                self.cache.delete(key)
+                if shared is None:
+                    self.local_versions.increment(key)
+                else:
+                    shared.set(
+                        f'auth-token-version:{key}', uuid4().hex,
+                        self.cache.local.ttl
+                    )
+        transaction.on_commit(invalidate_keys)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.cache.local),
+        }
+
+    def collect(self):
+        return (
+            ('foodgram_token_cache_hits_total', {}, self.hits),
+            ('foodgram_token_cache_misses_total', {}, self.misses),
+        )
+
+
+token_cache = TokenUserCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL,
+    os.path.join(settings.SHARED_STATE_DIR, 'auth-token-versions'),
+    TOKEN_CACHE_VERSION_SLOTS,
+)
+registry.register_collector(token_cache.collect)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, кэширующая пользователя по ключу токена."""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            version = token_cache.version(key)
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, version)
+            return user, token
+        user = copy.copy(user)
+        return user, Token(key=key, user=user)
+
+
+class BatchAuthentication(BaseAuthentication):
+    """Пользователь вложенного запроса пакета.
+
+    Пакет уже аутентифицирован, и api.batch передает его пользователя и
+    токен вложенным запросам атрибутом batch_auth. У запросов извне этого
+    атрибута нет, и они пропускаются.
+    """
+
+    def authenticate(self, request):
+        return getattr(request._request, 'batch_auth', None)
@@ -0,0 +1,196 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from contextvars import copy_context
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from api.constants import ADMISSION_RETRY_AFTER, BATCH_READ_METHODS
+from api.identity import identity_scope
+from api.instrumentation import current_timings
+from api.middleware import OVERLOADED_DETAIL, admit, route_name
+from api.slowlog import recorder
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADERS = ('Location', 'Content-Disposition', 'Retry-After')
+SKIPPED_META = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'CONTENT_LENGTH',
+                'CONTENT_TYPE', 'QUERY_STRING', 'wsgi.input')
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BATCH_WORKERS, thread_name_prefix='batch'
+)
+_worker_connections = set()
+_worker_connections_lock = threading.Lock()
+
+
+def _error(status, detail, headers=None):
+    result = {'status': status, 'body': {'detail': str(detail)}}
+    if headers:
+        result['headers'] = headers
+    return result
+
+
+def _build_request(request, item):
+    """WSGI-запрос для вложенного вызова с данными исходного запроса."""
+    url = urlsplit(item['path'])
+    body = b''
+    if item['body'] is not None:
+        body = json.dumps(item['body']).encode()
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in SKIPPED_META
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+    })
+    subrequest = WSGIRequest(environ)
+    if request.user.is_authenticated:
+        # Пользователя пакета примет BatchAuthentication.
+        subrequest.batch_auth = (request.user, request.auth)
+    return subrequest, url.path
+
+
+def dispatch(request, item):
+    """Выполнить вложенный запрос через маршруты и представления API."""
+    subrequest, path = _build_request(request, item)
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, exceptions.NotFound.default_detail)
+    view_class = getattr(match.func, 'cls', None)
+    batchable = getattr(view_class, 'batchable', True)
+    if 'api' not in match.app_names or not batchable:
+        return _error(400, 'Запрос нельзя выполнить в пакете.')
+    subrequest.resolver_match = match
+    # Корзины ограничения частоты и слоты допуска те же, что у отдельного
+    # запроса к этому маршруту.
+    subrequest.metrics_route = route_name(subrequest, match.func)
+    admitted, slot = admit(subrequest, match.func)
+    if not admitted:
+        return _error(503, OVERLOADED_DETAIL, {
+            'Retry-After': str(ADMISSION_RETRY_AFTER)
+        })
+    try:
+        # Изменяющие запросы пакета не должны видеть объекты предыдущих.
+        with identity_scope():
+            response = match.func(subrequest, *match.args, **match.kwargs)
+    except Http404:
+        return _error(404, exceptions.NotFound.default_detail)
+    except Exception:
+        logger.exception(
+            'Ошибка вложенного запроса %s %s', item['method'], path
+        )
+        return _error(500, 'Внутренняя ошибка сервера.')
+    finally:
+        if slot is not None:
+            pool, index = slot
+            pool.release(index)
+    result = {'status': response.status_code}
+    if isinstance(response, Response):
+        result['body'] = response.data
+    elif response.streaming:
+        result['body'] = None
+    else:
+        result['body'] = response.content.decode(
+            response.charset, errors='replace'
+        )
+    headers = {
+        name: response[name] for name in FORWARDED_HEADERS if name in response
+    }
+    if headers:
+        result['headers'] = headers
+    return result
+
+
+def _dispatch_in_worker(request, item):
+    """Вложенный запрос в потоке пула с учетом запросов к БД в метриках."""
+    timings = current_timings()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                if timings is not None:
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute_wrapper)
+                    )
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return dispatch(request, item)
+    finally:
+        _keep_worker_connections()
+
+
+def _keep_worker_connections():
+    """Оставить соединения потока пула открытыми для следующих запросов.
+
+    close_old_connections() при CONN_MAX_AGE=0 закрывал бы соединение
+    после каждого вложенного запроса, и пакет терял бы выигрыш на
+    подключениях. Потоки пула живут дольше запросов, поэтому их соединения
+    закрываются, только если сломались или превысили заданный CONN_MAX_AGE.
+    """
+    worker_connections = connections.all()
+    for connection in worker_connections:
+        if not connection.settings_dict['CONN_MAX_AGE']:
+            connection.close_at = None
+        connection.close_if_unusable_or_obsolete()
+    with _worker_connections_lock:
+        _worker_connections.update(worker_connections)
+
+
+def close_worker_connections():
+    """Закрыть соединения простаивающих потоков пула.
+
+    Нужна перед удалением или очисткой базы, например в тестах: иначе
+    соединения потоков пула остаются открытыми.
+    """
+    with _worker_connections_lock:
+        worker_connections = list(_worker_connections)
+        _worker_connections.clear()
+    for connection in worker_connections:
+        connection.inc_thread_sharing()
+        try:
+            connection.close()
+        finally:
+            connection.dec_thread_sharing()
+
+
+def run_batch(request, items):
+    """Выполнить пакет, сохраняя порядок ответов.
+
+    Подряд идущие запросы на чтение выполняются параллельно в общем пуле
+    потоков, а каждый изменяющий запрос выполняется в текущем потоке
+    после завершения всех предыдущих.
+    """
+    results = [None] * len(items)
+    pending = []
+
+    def wait_pending():
+        for index, future in pending:
+            results[index] = future.result()
+        pending.clear()
+
+    for index, item in enumerate(items):
+        if item['method'] in BATCH_READ_METHODS:
+            context = copy_context()
+            pending.append((index, executor.submit(
+                context.run, _dispatch_in_worker, request, item
+            )))
+            continue
+        wait_pending()
+        results[index] = dispatch(request, item)
+    wait_pending()
+    return results
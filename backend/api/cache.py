@@ -0,0 +1,185 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+SHARED_CACHE_ALIAS = 'shared'
+
+MISSING = object()
+COUNTER = struct.Struct('q')
+
+
+def get_shared_cache():
+    """Общий для всех процессов кэш, если он настроен."""
+    if SHARED_CACHE_ALIAS in settings.CACHES:
+        return caches[SHARED_CACHE_ALIAS]
+    return None
+
+
+class LRUCache:
+    """Ограниченный по размеру LRU-кэш в памяти процесса."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache:
+    """LRU-кэш процесса, за которым стоит общий кэш, если он настроен."""
+
+    def __init__(self, prefix, maxsize, ttl=None):
+        self.prefix = prefix
+        self.local = LRUCache(maxsize, ttl)
+
+    def _shared_key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get(self, key, default=None):
+        value = self.local.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        shared = get_shared_cache()
+        if shared is None:
+            return default
+        value = shared.get(self._shared_key(key), MISSING)
+        if value is MISSING:
+            return default
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        """Словарь найденных значений; общий кэш опрашивается один раз."""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key, MISSING)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        shared = get_shared_cache()
+        if not missing or shared is None:
+            return found
+        values = shared.get_many([self._shared_key(key) for key in missing])
+        for key in missing:
+            value = values.get(self._shared_key(key), MISSING)
+            if value is not MISSING:
+                self.local.set(key, value)
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.set(self._shared_key(key), value, self.local.ttl)
+
+    def set_many(self, values):
+        for key, value in values.items():
+            self.local.set(key, value)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.set_many({
+                self._shared_key(key): value for key, value in values.items()
+            }, self.local.ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.delete(self._shared_key(key))
+
+
+class SharedCounters:
+    """Счетчики в отображенном в память файле, общие для процессов узла.
+
+    Ключ отображается на один из slots счетчиков; совпадение ячеек у
+    разных ключей лишь изредка меняет счетчик чужого ключа. Чтение не
+    требует системных вызовов, поэтому его можно выполнять на каждом
+    запросе; увеличение блокирует только ячейку счетчика.
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self._fd = None
+        self._mmap = None
+        # Блокировки fcntl действуют на процесс, а не на поток.
+        self._lock = threading.Lock()
+
+    def _map(self):
+        if self._mmap is None:
+            size = self.slots * COUNTER.size
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+            self._fd = fd
+        return self._mmap
+
+    def _offset(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.slots * COUNTER.size
+
+    def get(self, key):
+        return COUNTER.unpack_from(self._map(), self._offset(key))[0]
+
+    def increment(self, key):
+        buffer = self._map()
+        offset = self._offset(key)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, COUNTER.size, offset)
+            try:
+                value = COUNTER.unpack_from(buffer, offset)[0] + 1
+                COUNTER.pack_into(buffer, offset, value)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, COUNTER.size, offset)
+        return value
@@ -0,0 +1,24 @@
+ADMISSION_DEFAULT_CLASS = 'default'
+ADMISSION_POLL_INTERVAL = 0.01
+ADMISSION_RETRY_AFTER = 1
+BATCH_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+BATCH_PATH_MAX_LENGTH = 2048
+BATCH_READ_COST = 1
+BATCH_READ_METHODS = ('GET', 'HEAD')
+BATCH_WRITE_COST = 5
+IMAGE_UPLOAD_FORMATS = ('GIF', 'JPEG', 'PNG', 'WEBP')
+MEDIA_GC_BATCH_SIZE = 100
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_GC_RATE = 50
+RECIPE_BULK_MAX_IDS = 100
+STARTUP_HISTORY_WINDOW = 5
+SYNC_MAX_PAGE_SIZE = 500
+SYNC_PAGE_SIZE = 100
+THROTTLE_BODY_BYTES_PER_TOKEN = 256 * 1024
+THROTTLE_DEFAULT_COST = 1
+THROTTLE_PROBES = 8
+THROTTLE_RECIPE_WRITE_COST = 5
+THROTTLE_REGISTRATION_COST = 10
+THROTTLE_ROWS_PER_TOKEN = 100
+THROTTLE_SHOPPING_CART_DOWNLOAD_COST = 10
+TOKEN_CACHE_VERSION_SLOTS = 65536
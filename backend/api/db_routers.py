@@ -0,0 +1,108 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PG_LAG_SQL = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() '
+    'OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+_read_database = ContextVar('read_database', default=None)
+
+
+class PrimaryReplicaRouter:
+    """Чтение из реплики, выбранной для текущего запроса, запись в основную.
+
+    Вне запросов, отмеченных ReplicaRoutingMiddleware, все запросы идут
+    в основную базу, поэтому команды и миграции реплики не затрагивают.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def read_from(alias):
+    """Направить чтение внутри блока в указанную базу."""
+    token = _read_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaLagGuard:
+    """Отбирает реплики, отставание которых не превышает допустимого.
+
+    Отставание каждой реплики проверяется не чаще раза в check_interval
+    секунд; недоступная реплика считается отставшей до следующей проверки.
+    """
+
+    def __init__(self, aliases, max_lag, check_interval):
+        self.aliases = list(aliases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lags = {}
+        self._lock = threading.Lock()
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self.lags.get(alias, (None, None))
+            if checked_at is not None and (
+                now - checked_at < self.check_interval
+            ):
+                return lag
+            # Пока идет проверка, другие потоки используют прежнее значение.
+            self.lags[alias] = (now, lag)
+        lag = self.measure(alias)
+        with self._lock:
+            self.lags[alias] = (now, lag)
+        return lag
+
+    def measure(self, alias):
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PG_LAG_SQL)
+                (lag,) = cursor.fetchone()
+        except DatabaseError:
+            logger.warning('Реплика %s недоступна', alias, exc_info=True)
+            return float('inf')
+        return float(lag or 0)
+
+    def choose(self):
+        """Случайная реплика с допустимым отставанием или None."""
+        healthy = []
+        for alias in self.aliases:
+            lag = self.lag(alias)
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(alias)
+        return random.choice(healthy) if healthy else None
+
+
+replicas = ReplicaLagGuard(
+    settings.DATABASE_REPLICAS,
+    settings.REPLICA_MAX_LAG,
+    settings.REPLICA_LAG_CHECK_INTERVAL,
+)
@@ -0,0 +1,75 @@
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer, ValidationError
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_fieldset(request, serializer_class):
+    """Поля ответа, запрошенные параметрами fields, profile и expand.
+
+    fields перечисляет поля явно, profile выбирает именованный набор из
+    profiles сериализатора, expand добавляет поля к любому из них.
+    Возвращает None, если представление запрошено целиком.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    fields, profile = params.get('fields'), params.get('profile')
+    expand = _split(params.get('expand', ''))
+    if not (fields or profile or expand):
+        return None
+    available = serializer_class.Meta.fields
+    if fields:
+        fieldset = _split(fields)
+    elif profile:
+        if profile not in serializer_class.profiles:
+            raise ValidationError({
+                'profile': f'Неизвестный профиль: {profile}.'
+            })
+        fieldset = set(serializer_class.profiles[profile])
+    else:
+        fieldset = set(available)
+    fieldset |= expand
+    unknown = fieldset.difference(available)
+    if unknown:
+        raise ValidationError({
+            'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}.'
+        })
+    return frozenset(fieldset)
+
+
+class SparseFieldsetMixin:
+    """Оставляет в представлении только запрошенные поля.
+
+    Набор полей передается аргументом fields или берется из параметров
+    запроса, если сериализатор формирует ответ верхнего уровня. Методы
+    исключенных полей не вызываются, поэтому их запросы к БД не выполняются.
+    """
+    profiles = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        self._fields = None if fields is None else frozenset(fields)
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def fieldset(self):
+        if self._fields is not None:
+            return self._fields
+        parent = self.parent
+        if parent is not None and not (
+            isinstance(parent, ListSerializer) and parent.parent is None
+        ):
+            return None
+        return get_fieldset(self.context.get('request'), type(self))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.fieldset is None:
+            return fields
+        return {
+            name: field for name, field in fields.items()
+            if name in self.fieldset
+        }
@@ -1,8 +1,10 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
+                                           ChoiceFilter, FilterSet,
                                            ModelMultipleChoiceFilter,
                                            NumberFilter)
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeTag,
+                            ShoppingCart, Tag)
 
 
 class IngredientFilter(FilterSet):
@@ -17,10 +19,15 @@ class RecipeFilter(FilterSet):
     author = NumberFilter(field_name='author__id')
     tags = ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug', to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
     )
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
     is_favorited = BooleanFilter(method='filter_is_favorited')
+    ordering = ChoiceFilter(
+        choices=(('trending', 'trending'),),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -29,6 +36,13 @@ class RecipeFilter(FilterSet):
             'is_favorited'
         )
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
@@ -40,3 +54,6 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(favorites__user=user)
         return Favorite.objects.none()
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-trending_score', '-pub_date')
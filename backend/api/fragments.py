@@ -0,0 +1,58 @@
+from django.conf import settings
+from recipes.catalog import catalog
+
+from api.cache import TieredCache
+from api.metrics import registry
+
+
+class RecipeFragmentCache:
+    """Кэш не зависящей от пользователя части представления рецептов.
+
+    Ключ включает id и время изменения рецепта, поэтому правка рецепта,
+    его ингредиентов, тегов или автора, обновляющая updated_at, сразу
+    делает прежний фрагмент недостижимым, а сам он вытесняется по LRU.
+    Названия ингредиентов берутся из справочника процесса, который
+    перечитывается с задержкой, поэтому ключ включает и его версию: иначе
+    фрагмент, отрисованный со старым названием сразу после правки, остался
+    бы в кэше под новым ключом.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.cache = TieredCache('recipe-fragment', maxsize, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(recipe):
+        return (
+            f'{recipe.pk}:{recipe.updated_at.timestamp()}:{catalog.version}'
+        )
+
+    def get_many(self, recipes):
+        """Фрагменты найденных в кэше рецептов по id."""
+        catalog.refresh()
+        keys = {recipe.pk: self.key(recipe) for recipe in recipes}
+        cached = self.cache.get_many(keys.values())
+        fragments = {
+            pk: cached[key] for pk, key in keys.items() if key in cached
+        }
+        self.hits += len(fragments)
+        self.misses += len(keys) - len(fragments)
+        return fragments
+
+    def set_many(self, recipes, fragments):
+        self.cache.set_many({
+            self.key(recipe): fragments[recipe.pk] for recipe in recipes
+        })
+
+    def collect(self):
+        return (
+            ('foodgram_recipe_fragment_hits_total', {}, self.hits),
+            ('foodgram_recipe_fragment_misses_total', {}, self.misses),
+        )
+
+
+recipe_fragments = RecipeFragmentCache(
+    settings.RECIPE_FRAGMENT_CACHE_SIZE, settings.RECIPE_FRAGMENT_CACHE_TTL
+)
+registry.register_collector(recipe_fragments.collect)
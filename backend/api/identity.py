@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from api.instrumentation import current_timings
+
+_identity_map = ContextVar('identity_map', default=None)
+
+
+class IdentityMap:
+    """Объекты и представления, уже загруженные в рамках одного запроса.
+
+    Объекты хранятся по модели и первичному ключу, поэтому автор, общий
+    для нескольких рецептов страницы, загружается из БД один раз, а
+    одинаковые вложенные представления авторов и тегов строятся один раз.
+    Попадания и промахи учитываются в метриках текущего запроса.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.representations = {}
+
+    @staticmethod
+    def _count(name, count):
+        timings = current_timings()
+        if timings is not None and count:
+            timings.increment(name, count)
+
+    def add(self, obj):
+        self.objects.setdefault((type(obj), obj.pk), obj)
+        return self.objects[type(obj), obj.pk]
+
+    def attach(self, instances, field_name):
+        """Подставить уже загруженные объекты в прямую связь экземпляров.
+
+        Экземпляры с подставленным объектом пропускаются при последующем
+        prefetch_related_objects.
+        """
+        if not instances:
+            return
+        field = instances[0]._meta.get_field(field_name)
+        hits = 0
+        for instance in instances:
+            if field.is_cached(instance):
+                continue
+            obj = self.objects.get(
+                (field.related_model, getattr(instance, field.attname))
+            )
+            if obj is not None:
+                field.set_cached_value(instance, obj)
+                hits += 1
+        self._count('identity-hit', hits)
+
+    def get_representation(self, key):
+        data = self.representations.get(key)
+        self._count('identity-miss' if data is None else 'identity-hit', 1)
+        return data
+
+    def set_representation(self, key, data):
+        self.representations[key] = data
+
+
+def get_identity_map():
+    """Карта текущего запроса или новая пустая вне запроса."""
+    identity_map = _identity_map.get()
+    return IdentityMap() if identity_map is None else identity_map
+
+
+@contextmanager
+def identity_scope():
+    """Отдельная карта объектов на время блока."""
+    token = _identity_map.set(IdentityMap())
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+class SharedRepresentationMixin:
+    """Строит представление объекта один раз за запрос.
+
+    Ключ учитывает наличие запроса в контексте, от которого зависят
+    абсолютные ссылки и персональные флаги, и набор запрошенных полей.
+    """
+
+    def to_representation(self, instance):
+        identity_map = get_identity_map()
+        key = (
+            type(self),
+            instance.pk,
+            self.context.get('request') is not None,
+            getattr(self, 'fieldset', None),
+        )
+        data = identity_map.get_representation(key)
+        if data is None:
+            data = super().to_representation(instance)
+            identity_map.set_representation(key, data)
+        return data
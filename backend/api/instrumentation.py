@@ -0,0 +1,113 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from rest_framework.renderers import JSONRenderer
+
+_timings = ContextVar('request_timings', default=None)
+_serializing = ContextVar('serializing', default=False)
+
+
+class RequestTimings:
+    """Время и количество операций, накопленные за один запрос."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, duration=0.0, count=1):
+        with self._lock:
+            self.durations[name] += duration
+            self.counts[name] += count
+
+    def increment(self, name, count=1):
+        """Увеличить счетчик без учета длительности."""
+        with self._lock:
+            self.counts[name] += count
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('db', perf_counter() - start)
+
+    def server_timing(self, total):
+        entries = [
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in self.durations.items()
+        ]
+        if self.counts['db']:
+            entries.append(f'db-queries;desc="{self.counts["db"]}"')
+        if self.counts['identity-hit']:
+            entries.append(
+                f'identity-hits;desc="{self.counts["identity-hit"]}"'
+            )
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current_timings():
+    return _timings.get()
+
+
+@contextmanager
+def collect_timings(timings):
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def timing(name):
+    """Добавить длительность блока к метрике текущего запроса."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+@contextmanager
+def serialization_timing():
+    """Учесть время сериализации, если блок не вложен в другую."""
+    timings = _timings.get()
+    if timings is None or _serializing.get():
+        yield
+        return
+    token = _serializing.set(True)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add('serialize', perf_counter() - start)
+        _serializing.reset(token)
+
+
+class TimedRepresentationMixin:
+    """Учитывает время сериализации объекта верхнего уровня.
+
+    Вложенные сериализаторы выполняются внутри родительского и отдельно
+    не учитываются.
+    """
+
+    def to_representation(self, instance):
+        with serialization_timing():
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer, учитывающий время рендеринга ответа."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.plans import (SEED_RECIPES, SEED_USERS, capture, compare,
+                       load_snapshots, save_snapshots, seed)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение планов выполнения основных запросов API с сохраненными '
+        'снимками на заполненной тестовой базе. В CI планы проверяет '
+        'api.tests.test_query_plans'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Перезаписать снимки текущими планами'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=SEED_RECIPES,
+            help='Количество рецептов в тестовой базе'
+        )
+        parser.add_argument(
+            '--users', type=int, default=SEED_USERS,
+            help='Количество пользователей в тестовой базе'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        # Тестовое окружение разрешает хост testserver клиента APIClient.
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            user = seed(options['users'], options['recipes'])
+            plans = capture(user)
+        except ValueError as exc:
+            raise CommandError(exc)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        snapshots = load_snapshots()
+        if options['update'] or snapshots is None:
+            path = save_snapshots(plans)
+            self.stdout.write(self.style.SUCCESS(f'Снимки записаны в {path}'))
+            return
+        report, failures = compare(snapshots, plans)
+        for line in report:
+            self.stdout.write(line)
+        if failures:
+            raise CommandError(
+                f'Расхождений со снимками: {failures}. Если новые запросы '
+                'ожидаемы, обновите снимки с --update'
+            )
+        self.stdout.write(self.style.SUCCESS('Планы запросов не ухудшились'))
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.constants import (MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE_HOURS,
+                           MEDIA_GC_RATE)
+from api.models import StoredFile
+from api.signals import MEDIA_FIELDS
+
+
+def name_key(name):
+    """64-битный ключ пути для множества ссылок.
+
+    Ключи занимают в памяти в несколько раз меньше строк, а совпадение
+    ключей лишь оставит на диске лишний файл.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+def iter_files(root, directory):
+    """Файлы каталога directory внутри root с путями относительно root."""
+    stack = [os.path.join(root, directory)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, root)
+                    yield name.replace(os.sep, '/'), entry
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление файлов изображений рецептов и аватаров, на которые не '
+        'ссылается ни один объект'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=MEDIA_GC_GRACE_HOURS,
+            help='Не трогать файлы моложе указанного числа часов'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие файлы были бы удалены'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить файлы в этот каталог вместо удаления'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=MEDIA_GC_RATE,
+            help='Не больше указанного числа файлов в секунду; 0 — без '
+                 'ограничения'
+        )
+
+    def handle(self, *args, **options):
+        if options['quarantine'] and os.path.abspath(
+            options['quarantine']
+        ).startswith(os.path.abspath(settings.MEDIA_ROOT) + os.sep):
+            raise CommandError('Карантин не может быть внутри MEDIA_ROOT.')
+        self.options = options
+        self.stats = dict.fromkeys(
+            ('scanned', 'young', 'referenced', 'removed', 'removed_bytes'), 0
+        )
+        referenced = self.referenced_keys()
+        deadline = time.time() - options['grace_hours'] * 3600
+        batch = {}
+        for directory in self.directories():
+            for name, entry in iter_files(settings.MEDIA_ROOT, directory):
+                self.stats['scanned'] += 1
+                if name_key(name) in referenced:
+                    self.stats['referenced'] += 1
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > deadline:
+                    self.stats['young'] += 1
+                    continue
+                batch[name] = stat.st_size
+                if len(batch) >= MEDIA_GC_BATCH_SIZE:
+                    self.collect(batch)
+                    batch = {}
+        if batch:
+            self.collect(batch)
+        action = 'Будет удалено' if options['dry_run'] else (
+            'Перенесено в карантин' if options['quarantine'] else 'Удалено'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Просмотрено файлов: {self.stats["scanned"]}, '
+            f'используется: {self.stats["referenced"]}, '
+            f'моложе {options["grace_hours"]:g} ч: {self.stats["young"]}. '
+            f'{action}: {self.stats["removed"]} '
+            f'({self.stats["removed_bytes"] / 1024 / 1024:.1f} МБ)'
+        ))
+
+    @staticmethod
+    def directories():
+        return sorted({
+            model._meta.get_field(field_name).upload_to
+            for model, field_name in MEDIA_FIELDS.items()
+        })
+
+    @staticmethod
+    def referenced_keys():
+        keys = set()
+        for model, field_name in MEDIA_FIELDS.items():
+            names = model.objects.exclude(**{field_name: ''}).values_list(
+                field_name, flat=True
+            )
+            keys.update(name_key(name) for name in names.iterator() if name)
+        return keys
+
+    def collect(self, batch):
+        """Удалить файлы пакета, на которые по-прежнему нет ссылок.
+
+        Ссылки перепроверяются под блокировкой строк StoredFile: загрузка
+        того же содержимого ждет этой блокировки и не получит файл,
+        который вот-вот будет удален.
+        """
+        start = time.monotonic()
+        with transaction.atomic():
+            list(StoredFile.objects.select_for_update().filter(
+                name__in=batch
+            ))
+            in_use = set()
+            for model, field_name in MEDIA_FIELDS.items():
+                in_use.update(model.objects.filter(**{
+                    f'{field_name}__in': batch
+                }).values_list(field_name, flat=True))
+            garbage = [name for name in batch if name not in in_use]
+            self.stats['referenced'] += len(batch) - len(garbage)
+            for name in garbage:
+                if self.options['verbosity'] >= 2:
+                    self.stdout.write(name)
+                if not self.options['dry_run']:
+                    self.remove(name)
+                self.stats['removed'] += 1
+                self.stats['removed_bytes'] += batch[name]
+            if not self.options['dry_run']:
+                StoredFile.objects.filter(name__in=garbage).delete()
+        if self.options['rate'] > 0:
+            time.sleep(max(
+                0, len(batch) / self.options['rate']
+                - (time.monotonic() - start)
+            ))
+
+    def remove(self, name):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        quarantine = self.options['quarantine']
+        try:
+            if quarantine:
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,151 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.constants import STARTUP_HISTORY_WINDOW
+
+# Запуск в отдельном интерпретаторе: модули текущего процесса уже загружены.
+PROBE = '''
+import json, os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+import foodgram_backend.wsgi
+wsgi = time.perf_counter()
+from api.startup import warm_up
+warm_up(catalogs=False)
+ready = time.perf_counter()
+print(json.dumps({
+    'setup': setup - start,
+    'wsgi': wsgi - setup,
+    'warm_up': ready - wsgi,
+    'total': ready - start,
+}))
+'''
+PHASES = ('setup', 'wsgi', 'warm_up', 'total')
+
+
+def parse_importtime(stderr):
+    """Собственное время импорта модулей в секундах из вывода -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue
+        modules[name.strip()] = int(self_us) / 1e6
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Время импорта модулей и готовности приложения при запуске '
+        'воркера из foodgram_backend.wsgi'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Количество запусков; в отчет идут медианы'
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Количество строк в рейтингах пакетов и модулей'
+        )
+        parser.add_argument(
+            '--history',
+            help='Файл JSON Lines, в который дописывается результат'
+        )
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='Допустимый рост общего времени в процентах относительно '
+                 'медианы последних записей истории'
+        )
+
+    def handle(self, *args, **options):
+        runs = [self.probe() for _ in range(max(options['runs'], 1))]
+        phases = {
+            phase: statistics.median(timings[phase] for timings, _ in runs)
+            for phase in PHASES
+        }
+        modules = defaultdict(list)
+        for _, run_modules in runs:
+            for name, seconds in run_modules.items():
+                modules[name].append(seconds)
+        modules = {
+            name: statistics.median(values) for name, values in modules.items()
+        }
+        packages = defaultdict(float)
+        for name, seconds in modules.items():
+            packages[name.split('.')[0]] += seconds
+        self.report(phases, packages, modules, options['top'])
+        if options['history']:
+            self.record(
+                Path(options['history']), phases, packages, options['top'],
+                options['max_regression']
+            )
+
+    def probe(self):
+        env = {**os.environ, 'PYTHONPATH': str(settings.BASE_DIR)}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(
+                f'Запуск приложения завершился с ошибкой:\n{result.stderr}'
+            )
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        return timings, parse_importtime(result.stderr)
+
+    def report(self, phases, packages, modules, top):
+        for phase in PHASES:
+            self.stdout.write(f'{phase:<10} {phases[phase] * 1000:8.1f} мс')
+        for title, items in (('Пакеты', packages), ('Модули', modules)):
+            self.stdout.write(f'\n{title} по собственному времени импорта:')
+            ranked = sorted(items.items(), key=lambda item: -item[1])
+            for name, seconds in ranked[:top]:
+                self.stdout.write(f'{seconds * 1000:8.1f} мс  {name}')
+
+    def record(self, path, phases, packages, top, max_regression):
+        previous = []
+        if path.exists():
+            with path.open(encoding='utf-8') as file:
+                previous = [json.loads(line) for line in file if line.strip()]
+        ranked = sorted(packages.items(), key=lambda item: -item[1])[:top]
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            **{phase: round(phases[phase], 4) for phase in PHASES},
+            'packages': {name: round(value, 4) for name, value in ranked},
+        }
+        with path.open('a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + '\n')
+        window = previous[-STARTUP_HISTORY_WINDOW:]
+        if max_regression is None or not window:
+            return
+        baseline = statistics.median(item['total'] for item in window)
+        growth = (phases['total'] / baseline - 1) * 100
+        self.stdout.write(
+            f'\nОтносительно медианы {len(window)} записей: {growth:+.1f}%'
+        )
+        if growth > max_regression:
+            raise CommandError(
+                f'Время запуска выросло на {growth:.1f}% '
+                f'(допустимо {max_regression}%)'
+            )
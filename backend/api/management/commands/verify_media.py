@@ -0,0 +1,75 @@
+import hashlib
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import StoredFile
+from api.storage import INCOMING_DIR
+
+HASH_CHUNK_SIZE = 1024 * 1024
+INCOMING_MAX_AGE = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка файлов медиахранилища: наличие и размер, а с --deep '
+        'также хэш содержимого'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deep', action='store_true',
+            help='Пересчитать SHA-256 каждого файла'
+        )
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы'
+        )
+
+    def handle(self, *args, **options):
+        self.remove_stale_incoming()
+        checked = problems = 0
+        for stored in StoredFile.objects.order_by('pk').iterator():
+            checked += 1
+            problem = self.check_file(stored, options['deep'])
+            if problem:
+                problems += 1
+                self.stderr.write(f'{stored.name}: {problem}')
+        message = f'Проверено файлов: {checked}, с ошибками: {problems}'
+        if problems and options['strict']:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def check_file(self, stored, deep):
+        path = default_storage.path(stored.name)
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            return 'файл отсутствует'
+        if size != stored.size:
+            return f'размер {size} вместо {stored.size}'
+        if deep and self.sha256(path) != stored.sha256:
+            return 'хэш не совпадает'
+        return None
+
+    @staticmethod
+    def sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def remove_stale_incoming():
+        """Удалить временные файлы загрузок, прерванных больше часа назад."""
+        incoming = default_storage.path(INCOMING_DIR)
+        if not os.path.isdir(incoming):
+            return
+        deadline = time.time() - INCOMING_MAX_AGE
+        with os.scandir(incoming) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < deadline:
+                    os.remove(entry.path)
@@ -0,0 +1,224 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Метрики процесса с агрегацией по всем воркерам узла.
+
+    Каждый процесс хранит счетчики и гистограммы в памяти и не чаще раза
+    в flush_interval секунд записывает их снимок в собственный файл
+    каталога. Эндпоинт /metrics суммирует все файлы, поэтому запись не
+    требует межпроцессных блокировок.
+    """
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[name, _labels_key(labels)] += value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * (len(buckets) + 1),
+                    'sum': 0.0,
+                }
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            histogram['counts'][index] += 1
+            histogram['sum'] += value
+
+    def register_collector(self, collector):
+        """Добавить функцию, возвращающую текущие значения счетчиков.
+
+        Функция вызывается при сбросе и возвращает кортежи
+        (имя, метки, значение) с накопленными значениями процесса.
+        """
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        counters = defaultdict(float)
+        with self._lock:
+            counters.update(self.counters)
+            histograms = [
+                [name, dict(labels), {
+                    'buckets': histogram['buckets'],
+                    'counts': list(histogram['counts']),
+                    'sum': histogram['sum'],
+                }]
+                for (name, labels), histogram in self.histograms.items()
+            ]
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                counters[name, _labels_key(labels)] += value
+        return {
+            'counters': [
+                [name, dict(labels), value]
+                for (name, labels), value in counters.items()
+            ],
+            'histograms': histograms,
+        }
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temp_path, path)
+
+    def collect(self):
+        """Сумма снимков всех процессов узла."""
+        counters = defaultdict(float)
+        histograms = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot['counters']:
+                counters[name, _labels_key(labels)] += value
+            for name, labels, histogram in snapshot['histograms']:
+                key = (name, _labels_key(labels))
+                total = histograms.setdefault(key, {
+                    'buckets': histogram['buckets'],
+                    'counts': [0] * len(histogram['counts']),
+                    'sum': 0.0,
+                })
+                for index, count in enumerate(histogram['counts']):
+                    total['counts'][index] += count
+                total['sum'] += histogram['sum']
+        return counters, histograms
+
+    def render(self):
+        """Метрики узла в текстовом формате Prometheus."""
+        self.flush()
+        counters, histograms = self.collect()
+        lines = []
+        declared = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            bounds = [*histogram['buckets'], '+Inf']
+            for bound, count in zip(bounds, histogram['counts']):
+                cumulative += count
+                bucket_labels = (*labels, ('le', str(bound)))
+                lines.append(
+                    f'{name}_bucket{_format_labels(bucket_labels)} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{name}_sum{_format_labels(labels)} {histogram["sum"]}'
+            )
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+registry = MetricsRegistry(
+    settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL
+)
+atexit.register(registry.flush)
+
+
+def observe_request(route, method, status, duration, timings, size):
+    """Учесть завершенный запрос в метриках процесса."""
+    labels = {'route': route, 'method': method}
+    registry.observe('foodgram_request_duration_seconds', duration, **labels)
+    for name in ('db', 'serialize', 'render'):
+        registry.observe(
+            f'foodgram_{name}_duration_seconds',
+            timings.durations.get(name, 0.0),
+            **labels
+        )
+    registry.inc('foodgram_db_queries_total', timings.counts['db'], **labels)
+    registry.inc(
+        'foodgram_identity_map_hits_total',
+        timings.counts['identity-hit'],
+        **labels
+    )
+    registry.inc(
+        'foodgram_identity_map_misses_total',
+        timings.counts['identity-miss'],
+        **labels
+    )
+    registry.inc(
+        'foodgram_responses_total', route=route, method=method, status=status
+    )
+    if size is not None:
+        registry.observe(
+            'foodgram_response_size_bytes', size, SIZE_BUCKETS, **labels
+        )
+    registry.maybe_flush()
+
+
+def observe_admission(route, admission_class, queue_time, admitted):
+    """Учесть ожидание в очереди допуска и отклоненный запрос."""
+    labels = {'route': route, 'admission_class': admission_class}
+    registry.observe('foodgram_admission_queue_seconds', queue_time, **labels)
+    if not admitted:
+        registry.inc('foodgram_admission_shed_total', **labels)
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus для внутреннего сбора."""
+    return HttpResponse(
+        registry.render(), content_type=PROMETHEUS_CONTENT_TYPE
+    )
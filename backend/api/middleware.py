@@ -0,0 +1,256 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter, time
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+
+from api.admission import admission
+from api.constants import ADMISSION_DEFAULT_CLASS, ADMISSION_RETRY_AFTER
+from api.db_routers import read_from, replicas
+from api.identity import identity_scope
+from api.instrumentation import (RequestTimings, collect_timings,
+                                 current_timings)
+from api.metrics import observe_admission, observe_request
+from api.slowlog import recorder
+
+logger = logging.getLogger(__name__)
+
+OVERLOADED_DETAIL = 'Сервер перегружен, повторите запрос позже.'
+
+
+def route_name(request, view_func):
+    """Имя маршрута для метрик: ViewSet.action или имя представления."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return request.resolver_match.view_name or view_func.__name__
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class ServerTimingMiddleware:
+    """Замеряет время БД, сериализации и рендеринга для каждого запроса.
+
+    Результат добавляется в заголовок Server-Timing и в метрики
+    процесса, которые отдает /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        start = perf_counter()
+        with collect_timings(timings), ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.execute_wrapper)
+                )
+            response = self.get_response(request)
+        total = perf_counter() - start
+        response['Server-Timing'] = timings.server_timing(total)
+        size = None if response.streaming else len(response.content)
+        observe_request(
+            getattr(request, 'metrics_route', 'unmatched'),
+            request.method,
+            response.status_code,
+            total,
+            timings,
+            size,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_route = route_name(request, view_func)
+
+
+def admission_class(request, view_func):
+    """Класс допуска: из admission_classes по действию или admission_class."""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    return getattr(view_class, 'admission_classes', {}).get(
+        action,
+        getattr(view_class, 'admission_class', ADMISSION_DEFAULT_CLASS)
+    )
+
+
+def admit(request, view_func):
+    """Занять слот класса допуска запроса и учесть ожидание в метриках.
+
+    Возвращает (допущен ли запрос, слот). Представления с admission_class
+    = None, например пакетные запросы, допускаются без слота: слоты
+    занимают их вложенные запросы.
+    """
+    name = admission_class(request, view_func)
+    if name is None:
+        return True, None
+    slot, queue_time = admission.acquire(name)
+    timings = current_timings()
+    if timings is not None and queue_time:
+        timings.add('queue', queue_time)
+    observe_admission(
+        getattr(request, 'metrics_route', 'unmatched'),
+        name,
+        queue_time,
+        slot is not None,
+    )
+    return slot is not None, slot
+
+
+def release_slot(slot):
+    if slot is not None:
+        pool, index = slot
+        pool.release(index)
+
+
+class SlotReleasingContent:
+    """Тело потокового ответа, освобождающее слот допуска при закрытии.
+
+    Django вызывает close() тела при закрытии ответа сервером, даже если
+    тело не начали читать, например при обрыве соединения.
+    """
+
+    def __init__(self, content, slot):
+        self.content = content
+        self.slot = slot
+
+    def __iter__(self):
+        return iter(self.content)
+
+    def close(self):
+        slot, self.slot = self.slot, None
+        release_slot(slot)
+
+
+class AdmissionControlMiddleware:
+    """Ограничивает число одновременно выполняемых запросов каждого класса.
+
+    Запрос, не дождавшийся слота, или запрос при заполненной очереди
+    получает 503 с Retry-After до начала обработки. Время ожидания
+    попадает в Server-Timing и в метрики. Потоковый ответ держит слот,
+    пока сервер не отдаст тело целиком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._admission_slot = None
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release_slot(request._admission_slot)
+            raise
+        if response.streaming and request._admission_slot is not None:
+            # Тело формируется уже после выхода из представления.
+            response.streaming_content = SlotReleasingContent(
+                response.streaming_content, request._admission_slot
+            )
+        else:
+            release_slot(request._admission_slot)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        admitted, slot = admit(request, view_func)
+        if not admitted:
+            response = JsonResponse(
+                {'detail': OVERLOADED_DETAIL}, status=503
+            )
+            response['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+            return response
+        request._admission_slot = slot
+
+
+class SlowQueryMiddleware:
+    """Записывает медленные запросы к БД, выполненные при обработке запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        if recorder.pending:
+            # Ошибка записи в таблицу не должна подменять готовый ответ.
+            try:
+                recorder.flush()
+            except Exception:
+                logger.exception('Не удалось сохранить медленные запросы')
+        return response
+
+
+class IdentityMapMiddleware:
+    """Создает карту объектов, общую для обработки одного запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity_scope():
+            return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Направляет чтение безопасных запросов в реплику.
+
+    В реплику уходят запросы к представлениям с replica_reads = True.
+    После изменяющего запроса клиент получает cookie и заголовок
+    X-Primary-Until со сроком, до которого его запросы читают из основной
+    базы, чтобы он сразу видел свои изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            request._replica_stack = stack
+            response = self.get_response(request)
+        # Представление может само указать, изменял ли запрос данные,
+        # как пакет, состоящий только из чтений.
+        wrote = getattr(
+            request, 'stick_to_primary', request.method not in SAFE_METHODS
+        )
+        if wrote and response.status_code < 500:
+            primary_until = str(int(time()) + settings.REPLICA_STICKY_SECONDS)
+            response[settings.REPLICA_STICKY_HEADER] = primary_until
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                primary_until,
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if (
+            request.method not in SAFE_METHODS
+            or not getattr(view_class, 'replica_reads', False)
+            or self.is_sticky(request)
+        ):
+            return
+        alias = replicas.choose()
+        if alias is not None:
+            request._replica_stack.enter_context(read_from(alias))
+
+    def is_sticky(self, request):
+        values = (
+            request.COOKIES.get(settings.REPLICA_STICKY_COOKIE),
+            request.headers.get(settings.REPLICA_STICKY_HEADER),
+        )
+        now = time()
+        for value in values:
+            try:
+                if value is not None and float(value) > now:
+                    return True
+            except ValueError:
+                continue
+        return False
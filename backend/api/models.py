@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """Медленный SQL-запрос, сгруппированный по нормализованному тексту."""
+    fingerprint = models.CharField(
+        'Отпечаток',
+        max_length=32,
+        unique=True
+    )
+    sql = models.TextField('Нормализованный запрос')
+    params = models.TextField('Пример параметров', blank=True)
+    stack = models.TextField('Место вызова', blank=True)
+    plan = models.TextField('План выполнения', blank=True)
+    calls = models.PositiveIntegerField('Количество вызовов', default=0)
+    total_time = models.FloatField('Суммарное время, мс', default=0)
+    max_time = models.FloatField('Максимальное время, мс', default=0)
+    last_seen = models.DateTimeField('Последний вызов', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'медленные запросы'
+        ordering = ('-total_time',)
+
+    def __str__(self):
+        return self.sql[:80]
+
+
+class StoredFile(models.Model):
+    """Файл медиахранилища, названный по хэшу содержимого."""
+    name = models.CharField(
+        'Путь',
+        max_length=255,
+        unique=True
+    )
+    sha256 = models.CharField('SHA-256', max_length=64)
+    size = models.PositiveBigIntegerField('Размер, байт')
+    refcount = models.PositiveIntegerField('Количество ссылок', default=0)
+    created = models.DateTimeField('Загружен', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'файлы'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,278 @@
+import json
+import random
+import re
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.catalog import bump_catalog_version, catalog
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCart, Tag)
+from rest_framework.test import APIClient
+
+from api.slowlog import fingerprint, normalize_sql
+
+User = get_user_model()
+
+SEED_RECIPES = 3000
+SEED_USERS = 300
+SNAPSHOT_DIR = Path(__file__).resolve().parent / 'query_plans'
+
+SCENARIOS = (
+    ('recipe_list', '/api/recipes/', {}),
+    ('recipe_list_by_tags', '/api/recipes/', {'tags': ['tag-0', 'tag-1']}),
+    ('recipe_list_by_author', '/api/recipes/', {'author': '{author}'}),
+    ('recipe_list_favorited', '/api/recipes/', {'is_favorited': 1}),
+    ('recipe_list_in_cart', '/api/recipes/', {'is_in_shopping_cart': 1}),
+    ('recipe_list_trending', '/api/recipes/', {'ordering': 'trending'}),
+    ('download_shopping_cart', '/api/recipes/download_shopping_cart/', {}),
+    ('subscriptions', '/api/users/subscriptions/', {}),
+)
+
+_COST_RE = re.compile(r'\s*\((?:cost|actual)=[^)]*\)')
+_PG_SCAN_RE = re.compile(
+    r'^(?P<node>(?:Parallel )?Seq Scan|Index Scan|Index Only Scan'
+    r'|Bitmap Heap Scan)(?: Backward)?(?: using \S+)? on (?P<table>\S+)'
+)
+_SQLITE_SCAN_RE = re.compile(
+    r'^(?P<node>SCAN|SEARCH)(?: TABLE)? (?P<table>\S+)(?P<rest>.*)'
+)
+
+
+def normalize_plan(vendor, rows):
+    """Узлы плана без оценок стоимости, с отступом по вложенности."""
+    if vendor == 'sqlite':
+        return [str(row[-1]) for row in rows]
+    lines = []
+    for (line,) in rows:
+        stripped = line.strip()
+        if lines and not stripped.startswith('->'):
+            continue
+        depth = (len(line) - len(line.lstrip()) + 4) // 6
+        node = _COST_RE.sub('', stripped.lstrip('-> '))
+        lines.append('  ' * depth + node)
+    return lines
+
+
+def access_paths(vendor, plan):
+    """Таблицы, читаемые полным просмотром и по индексу, и число циклов."""
+    sequential, indexed, loops = set(), set(), 0
+    for line in plan:
+        node = line.strip()
+        if vendor == 'sqlite':
+            match = _SQLITE_SCAN_RE.match(node)
+            if not match:
+                continue
+            loops += 1
+            if match['node'] == 'SCAN' and 'INDEX' not in match['rest']:
+                sequential.add(match['table'])
+            else:
+                indexed.add(match['table'])
+            continue
+        if node.startswith('Nested Loop'):
+            loops += 1
+        match = _PG_SCAN_RE.match(node)
+        if match:
+            if match['node'].endswith('Seq Scan'):
+                sequential.add(match['table'])
+            else:
+                indexed.add(match['table'])
+    if vendor == 'sqlite':
+        loops = max(loops - 1, 0)
+    return sequential, indexed, loops
+
+
+def degradations(vendor, expected, actual):
+    expected_seq, expected_indexed, expected_loops = access_paths(
+        vendor, expected
+    )
+    actual_seq, actual_indexed, actual_loops = access_paths(vendor, actual)
+    problems = [
+        f'{table}: индекс заменен полным просмотром'
+        for table in sorted(actual_seq - expected_seq)
+        if table in expected_indexed or table not in actual_indexed
+    ]
+    if actual_loops > expected_loops:
+        problems.append(
+            f'вложенных циклов стало {actual_loops} вместо {expected_loops}'
+        )
+    return problems
+
+
+def seed(users_count=SEED_USERS, recipes_count=SEED_RECIPES):
+    """Детерминированные тестовые данные.
+
+    Ключи перечитываются из базы: bulk_create заполняет их не на всех СУБД.
+    """
+    rnd = random.Random(0)
+    User.objects.bulk_create(
+        User(
+            username=f'user{index}',
+            email=f'user{index}@example.com',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='!'
+        )
+        for index in range(users_count)
+    )
+    users = list(User.objects.order_by('id'))
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {index}', slug=f'tag-{index}')
+        for index in range(8)
+    )
+    tags = list(Tag.objects.order_by('id'))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+        for index in range(500)
+    )
+    ingredients = list(Ingredient.objects.order_by('id'))
+    bump_catalog_version()
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=rnd.choice(users),
+            name=f'Рецепт {index}',
+            text='Описание',
+            image='recipes/images/seed.jpg',
+            cooking_time=rnd.randint(1, 120),
+            trending_score=rnd.random()
+        )
+        for index in range(recipes_count)
+    )
+    recipes = list(Recipe.objects.order_by('id'))
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rnd.sample(tags, 2)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in rnd.sample(ingredients, 6)
+    )
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user=user, recipe=recipe)
+            for user in users
+            for recipe in rnd.sample(recipes, 10)
+        )
+    Follow.objects.bulk_create(
+        Follow(user=user, following=following)
+        for user in users
+        for following in rnd.sample(users, 5)
+        if following != user
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users[0]
+
+
+def capture(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    author = Recipe.objects.values_list('author_id', flat=True).first()
+    plans = {}
+    for name, path, params in SCENARIOS:
+        params = {
+            key: str(value).format(author=author)
+            if isinstance(value, str) else value
+            for key, value in params.items()
+        }
+        # Проверка версии справочников попала бы в случайный сценарий, и
+        # снимок зависел бы от времени запуска.
+        catalog.reload()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path, params)
+        if response.status_code != 200:
+            raise ValueError(f'{name}: ответ {response.status_code}')
+        plans[name] = explain_queries(context.captured_queries)
+    return plans
+
+
+def explain_queries(queries):
+    explained = {}
+    prefix = connection.ops.explain_query_prefix()
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        if key in explained:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            rows = cursor.fetchall()
+        explained[key] = {
+            'sql': normalized,
+            'plan': normalize_plan(connection.vendor, rows),
+        }
+    return explained
+
+
+def snapshot_path():
+    return SNAPSHOT_DIR / f'{connection.vendor}.json'
+
+
+def load_snapshots():
+    """Сохраненные планы для текущей СУБД или None, если их нет."""
+    path = snapshot_path()
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def save_snapshots(plans):
+    path = snapshot_path()
+    path.write_text(
+        json.dumps(plans, ensure_ascii=False, indent=2) + '\n',
+        encoding='utf-8'
+    )
+    return path
+
+
+def compare(snapshots, plans):
+    """Сравнить планы со снимками.
+
+    Возвращает строки отчета и число расхождений: запросов, планы которых
+    ухудшились, а также новых и пропавших запросов. Новый отпечаток
+    означает, что запрос изменил форму, и его план не с чем сравнить,
+    поэтому снимки нужно обновить с --update. Изменившиеся без ухудшения
+    планы попадают только в отчет.
+    """
+    vendor = connection.vendor
+    report, failures = [], 0
+    for scenario in sorted(snapshots.keys() - plans.keys()):
+        failures += 1
+        report.append(f'{scenario}: сценарий пропал')
+    for scenario, queries in plans.items():
+        expected_queries = snapshots.get(scenario, {})
+        for key in expected_queries.keys() - queries.keys():
+            failures += 1
+            report.append(
+                f'{scenario}: запрос пропал '
+                f'{expected_queries[key]["sql"][:100]}'
+            )
+        for key, query in queries.items():
+            expected = expected_queries.get(key)
+            if expected is None:
+                failures += 1
+                report.append(f'{scenario}: новый запрос {query["sql"][:100]}')
+                report.append('  план:\n    ' + '\n    '.join(query['plan']))
+                continue
+            problems = degradations(vendor, expected['plan'], query['plan'])
+            if problems:
+                failures += 1
+                report.append(f'{scenario}: {query["sql"][:100]}')
+                report.extend(f'  {problem}' for problem in problems)
+                report.append('  было:\n    ' + '\n    '.join(
+                    expected['plan']
+                ))
+                report.append('  стало:\n    ' + '\n    '.join(
+                    query['plan']
+                ))
+            elif query['plan'] != expected['plan']:
+                report.append(
+                    f'{scenario}: план изменился {query["sql"][:100]}'
+                )
+    return report, failures
@@ -0,0 +1,45 @@
+from django.utils.functional import cached_property
+from recipes.models import Favorite, Follow, ShoppingCart
+
+
+class UserRelations:
+    """Избранное, список покупок и подписки пользователя в виде множеств id.
+
+    Каждое множество загружается одним запросом при первом обращении,
+    после чего флаги в представлениях проверяются без обращений к БД.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def favorite_ids(self):
+        return set(Favorite.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+
+    @cached_property
+    def cart_ids(self):
+        return set(ShoppingCart.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+
+    @cached_property
+    def following_ids(self):
+        return set(Follow.objects.filter(
+            user=self.user
+        ).values_list('following_id', flat=True))
+
+
+def get_relations(request):
+    """Связи текущего пользователя, общие для всего запроса.
+
+    Для анонимного пользователя или вне запроса возвращает None.
+    """
+    if request is None or not request.user.is_authenticated:
+        return None
+    relations = getattr(request, '_user_relations', None)
+    if relations is None or relations.user.pk != request.user.pk:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
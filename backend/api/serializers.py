@@ -1,11 +1,20 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, router
+from django.db.models import Manager, prefetch_related_objects
 from django.db.transaction import atomic
-from django.shortcuts import get_object_or_404
-from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.catalog import catalog
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 from rest_framework import serializers
 
-from .utils import Base64ImageField
+from .constants import (BATCH_METHODS, BATCH_PATH_MAX_LENGTH, BATCH_READ_COST,
+                        BATCH_READ_METHODS, BATCH_WRITE_COST)
+from .fieldsets import SparseFieldsetMixin
+from .fragments import recipe_fragments
+from .identity import SharedRepresentationMixin, get_identity_map
+from .instrumentation import TimedRepresentationMixin, serialization_timing
+from .relations import get_relations
+from .utils import Base64ImageField, CatalogRelatedField
 
 User = get_user_model()
 
@@ -72,10 +81,14 @@ class CreateUserSerializer(serializers.ModelSerializer):
         return representation
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedRepresentationMixin, SharedRepresentationMixin,
+                     SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для отображения пользователя."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     avatar = Base64ImageField(max_length=None, use_url=True, required=False)
+    profiles = {
+        'card': ('id', 'username', 'first_name', 'last_name', 'avatar'),
+    }
 
     class Meta:
         model = User
@@ -92,17 +105,22 @@ class UserSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            return (request.user.is_authenticated
-                    and Follow.objects.filter(
-                        user=request.user, following=obj
-                    ).exists())
+            relations = get_relations(request)
+            return relations is not None and obj.pk in relations.following_ids
 
 
-class UserFollowSerializer(serializers.ModelSerializer):
+class UserFollowSerializer(TimedRepresentationMixin, SparseFieldsetMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для отображения пользователя и его рецептов."""
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
+    profiles = {
+        'card': (
+            'id', 'username', 'first_name', 'last_name', 'avatar',
+            'recipes_count',
+        ),
+    }
 
     class Meta:
         model = User
@@ -119,7 +137,8 @@ class UserFollowSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return True
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and obj.pk in relations.following_ids
 
     def get_recipes(self, obj):
         recipes_limit = self.context['request'].query_params.get(
@@ -153,38 +172,8 @@ class ChangePasswordSerializer(serializers.Serializer):
         return user
 
 
-class FollowSerializer(serializers.ModelSerializer):
-    """Сериализатор для подписок."""
-    class Meta:
-        model = Follow
-        fields = (
-            'user',
-            'following'
-        )
-        read_only_fields = (
-            'user',
-            'following'
-        )
-
-    def validate(self, data):
-        following = self.context['following']
-        user = self.context['request'].user
-        if user == following:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя.'
-            )
-        if Follow.objects.filter(user=user, following=following).exists():
-            raise serializers.ValidationError(
-                'Нельзя подписаться на этого пользователя!'
-            )
-        return data
-
-    def to_representation(self, instance):
-        return UserFollowSerializer(instance.following,
-                                    context=self.context).data
-
-
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для отображения ингредиентов."""
     class Meta:
         model = Ingredient
@@ -209,12 +198,14 @@ class IngredientPostSerializer(serializers.ModelSerializer):
 
 
 class IngredientGetSerializer(serializers.ModelSerializer):
-    """Сериализатор для отображения ингредиентов в рецепте."""
-    id = serializers.IntegerField(source='ingredient.id')
-    name = serializers.CharField(source='ingredient.name', read_only=True)
-    measurement_unit = serializers.CharField(
-        source='ingredient.measurement_unit', read_only=True
-    )
+    """Сериализатор для отображения ингредиентов в рецепте.
+
+    Название и единица измерения берутся из справочника в памяти, поэтому
+    из БД читаются только строки RecipeIngredient.
+    """
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredient
@@ -225,8 +216,21 @@ class IngredientGetSerializer(serializers.ModelSerializer):
             'amount'
         )
 
+    @staticmethod
+    def catalog_entry(obj):
+        # Ингредиент, удаленный после чтения строк рецепта, выводится без
+        # названия и единицы измерения.
+        return catalog.ingredient(obj.ingredient_id) or (None, None)
+
+    def get_name(self, obj):
+        return self.catalog_entry(obj)[0]
 
-class TagSerializer(serializers.ModelSerializer):
+    def get_measurement_unit(self, obj):
+        return self.catalog_entry(obj)[1]
+
+
+class TagSerializer(TimedRepresentationMixin, SharedRepresentationMixin,
+                    serializers.ModelSerializer):
     """Сериализатор для отображения тегов."""
     class Meta:
         model = Tag
@@ -237,13 +241,94 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeFragmentSerializer(SparseFieldsetMixin,
+                               serializers.ModelSerializer):
+    """Общая для всех пользователей часть представления рецепта."""
+    author = UserSerializer(read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+    ingredients = IngredientGetSerializer(
+        source='recipeingredient_set', many=True, read_only=True
+    )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id',
+            'author',
+            'name',
+            'text',
+            'ingredients',
+            'image',
+            'tags',
+            'cooking_time'
+        )
+
+
+RECIPE_FIELD_PREFETCHES = {
+    'author': 'author',
+    'tags': 'tags',
+    'ingredients': 'recipeingredient_set',
+}
+
+
+def get_recipe_fragments(recipes, fieldset=None):
+    """Фрагменты рецептов по id: из кэша, а для промахов — отрисованные.
+
+    Связанные объекты подгружаются только для рецептов, которых нет в кэше,
+    а авторы, уже загруженные в рамках запроса, берутся из карты объектов.
+    Если задан fieldset, промахи отрисовываются только с этими полями,
+    без подгрузки остальных связей, и в кэш не попадают.
+    """
+    fragments = recipe_fragments.get_many(recipes)
+    misses = [recipe for recipe in recipes if recipe.pk not in fragments]
+    if not misses:
+        return fragments
+    lookups = [
+        lookup for field, lookup in RECIPE_FIELD_PREFETCHES.items()
+        if fieldset is None or field in fieldset
+    ]
+    identity_map = get_identity_map()
+    if 'author' in lookups:
+        identity_map.attach(misses, 'author')
+    prefetch_related_objects(misses, *lookups)
+    serializer = RecipeFragmentSerializer(fields=fieldset)
+    for recipe in misses:
+        if 'author' in lookups:
+            identity_map.add(recipe.author)
+        fragments[recipe.pk] = serializer.to_representation(recipe)
+    if fieldset is None:
+        recipe_fragments.set_many(misses, fragments)
+    return fragments
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов, собранный из фрагментов одним запросом к кэшу."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        with serialization_timing():
+            fragments = get_recipe_fragments(recipes, self.child.fieldset)
+            return [
+                self.child.personalize(recipe, fragments[recipe.pk])
+                for recipe in recipes
+            ]
+
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для отображения рецептов."""
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = IngredientGetSerializer(
+        source='recipeingredient_set', many=True, read_only=True
+    )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    profiles = {
+        'card': (
+            'id', 'name', 'image', 'tags', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart',
+        ),
+    }
 
     class Meta:
         model = Recipe
@@ -259,27 +344,51 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_favorited',
             'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeListSerializer
 
-    def get_ingredients(self, obj):
-        return IngredientGetSerializer(
-            RecipeIngredient.objects.filter(recipe=obj), many=True
-        ).data
+    def to_representation(self, instance):
+        with serialization_timing():
+            fragment = get_recipe_fragments(
+                [instance], self.fieldset
+            )[instance.pk]
+            return self.personalize(instance, fragment)
+
+    def personalize(self, instance, fragment):
+        """Добавить к фрагменту данные, зависящие от запроса."""
+        request = self.context.get('request')
+        fieldset = self.fieldset
+        data = {
+            name: value for name, value in fragment.items()
+            if fieldset is None or name in fieldset
+        }
+        containers = [('image', data)]
+        if 'author' in data:
+            data['author'] = author = dict(data['author'])
+            containers.append(('avatar', author))
+        if request is not None:
+            for field, container in containers:
+                if container.get(field):
+                    container[field] = request.build_absolute_uri(
+                        container[field]
+                    )
+            if 'author' in data:
+                relations = get_relations(request)
+                author['is_subscribed'] = (
+                    relations is not None
+                    and instance.author_id in relations.following_ids
+                )
+        for field in ('is_favorited', 'is_in_shopping_cart'):
+            if fieldset is None or field in fieldset:
+                data[field] = getattr(self, f'get_{field}')(instance)
+        return data
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        return (
-            not user.is_anonymous and Favorite.objects.filter(
-                user=user, recipe=obj
-            ).exists()
-        )
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and obj.pk in relations.favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        return (
-            not user.is_anonymous and ShoppingCart.objects.filter(
-                user=user, recipe=obj
-            ).exists()
-        )
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and obj.pk in relations.cart_ids
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -287,8 +396,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientPostSerializer(
         many=True, required=True
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(), required=True
+    tags = CatalogRelatedField(
+        lookup=catalog.tag,
+        many=True,
+        queryset=Tag.objects.all(),
+        required=True
     )
     image = Base64ImageField(required=True)
 
@@ -316,9 +428,6 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Теги должны быть уникальными.'
             )
-        for tag in tags:
-            if not Tag.objects.filter(id=tag.id).exists():
-                raise serializers.ValidationError('Несуществующий тег.')
         return tags
 
     def validate_cooking_time(self, cooking_time):
@@ -339,26 +448,36 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             if ingredient.get('amount') < 1:
                 raise serializers.ValidationError(
                     'Количество ингредиента должно быть больше 0.')
-            if not Ingredient.objects.filter(
-                id=ingredient['id']
-            ).exists():
+            if not catalog.has_ingredient(ingredient['id']):
                 raise serializers.ValidationError('Несуществующий ингредиент.')
         return ingredients
 
     def create_ingredients(self, ingredients, recipe):
         ingredient_list = []
         for ingredient_data in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient, id=ingredient_data.get('id')
-            )
             ingredient_list.append(
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient,
+                    ingredient_id=ingredient_data.get('id'),
                     amount=ingredient_data.get('amount')
                 )
             )
-        RecipeIngredient.objects.bulk_create(ingredient_list)
+        using = router.db_for_write(RecipeIngredient)
+        # Ингредиент могут удалить между проверкой и вставкой. Внешние ключи
+        # проверяются сразу, а не при фиксации транзакции, чтобы ответить
+        # ошибкой валидации вместо 500.
+        try:
+            with atomic(using=using):
+                RecipeIngredient.objects.using(using).bulk_create(
+                    ingredient_list
+                )
+                connections[using].check_constraints(
+                    table_names=[RecipeIngredient._meta.db_table]
+                )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'ingredients': ['Несуществующий ингредиент.']}
+            )
 
     @atomic
     def create(self, validated_data):
@@ -386,6 +505,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags_data = validated_data.get('tags', [])
         if tags_data:
             instance.tags.set(tags_data)
+        # Сохранение после замены связей обновляет updated_at и журнал
+        # изменений один раз на всю правку.
+        instance.save()
         return instance
 
     def to_representation(self, instance):
@@ -395,7 +517,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ).data
 
 
-class RecipeMiniSerializer(serializers.ModelSerializer):
+class RecipeMiniSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для для отображения рецептов в укороченной форме."""
     class Meta:
         model = Recipe
@@ -407,51 +530,37 @@ class RecipeMiniSerializer(serializers.ModelSerializer):
         )
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для списка покупок."""
-    class Meta:
-        model = ShoppingCart
-        fields = (
-            'id',
-            'user',
-            'recipe'
-        )
+class BatchItemSerializer(serializers.Serializer):
+    """Сериализатор вложенного запроса пакета."""
+    method = serializers.ChoiceField(choices=BATCH_METHODS)
+    path = serializers.RegexField(
+        r'^/api/', max_length=BATCH_PATH_MAX_LENGTH
+    )
+    body = serializers.JSONField(required=False, default=None)
 
-    def validate(self, data):
-        request = self.context.get('request')
-        if ShoppingCart.objects.filter(
-            user=request.user, recipe=data['recipe']
-        ).exists():
-            raise serializers.ValidationError('Рецепт уже в списке покупок.')
-        return data
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = {**data, 'method': data['method'].upper()}
+        return super().to_internal_value(data)
 
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeMiniSerializer(
-            instance.recipe, context={'request': request}
-        ).data
 
+class BatchSerializer(serializers.Serializer):
+    """Сериализатор пакета запросов с ограничением количества и стоимости."""
+    requests = BatchItemSerializer(many=True, allow_empty=False)
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор для работы с избранными рецептами."""
-    class Meta:
-        model = Favorite
-        fields = (
-            'id',
-            'user',
-            'recipe'
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_REQUESTS} запросов в пакете.'
+            )
+        cost = sum(
+            BATCH_READ_COST if item['method'] in BATCH_READ_METHODS
+            else BATCH_WRITE_COST
+            for item in value
         )
-
-    def validate(self, data):
-        request = self.context.get('request')
-        if Favorite.objects.filter(
-            user=request.user, recipe=data['recipe']
-        ).exists():
-            raise serializers.ValidationError('Рецепт уже в избранном.')
-        return data
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeMiniSerializer(
-            instance.recipe, context={'request': request}
-        ).data
+        if cost > settings.BATCH_MAX_COST:
+            raise serializers.ValidationError(
+                f'Стоимость пакета {cost} превышает '
+                f'{settings.BATCH_MAX_COST}.'
+            )
+        return value
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+
+User = get_user_model()
+
+MEDIA_FIELDS = {
+    Recipe: 'image',
+    User: 'avatar',
+}
+
+
+def release_file(name):
+    """Снять ссылку на файл хранилища после фиксации транзакции."""
+    if name:
+        transaction.on_commit(lambda: default_storage.delete(name))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    token_cache.invalidate(
+        *Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+def media_replaced(sender, instance, update_fields, **kwargs):
+    field_name = MEDIA_FIELDS[sender]
+    if instance.pk is None or (
+        update_fields is not None and field_name not in update_fields
+    ):
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list(
+        field_name, flat=True
+    ).first()
+    file = getattr(instance, field_name)
+    if old_name and (not file._committed or file.name != old_name):
+        release_file(old_name)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def media_owner_deleted(sender, instance, **kwargs):
+    release_file(getattr(instance, MEDIA_FIELDS[sender]).name)
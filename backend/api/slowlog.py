@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+from decimal import Decimal
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from api.models import SlowQuery
+
+logger = logging.getLogger('foodgram.slow_queries')
+
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+PROJECT_MODULES = ('api.', 'recipes.', 'users.')
+IGNORED_MODULES = ('api.instrumentation', 'api.middleware', 'api.slowlog')
+STACK_DEPTH = 6
+PARAMS_MAX_LENGTH = 1000
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Текст запроса без значений: литералы и параметры заменены на '?'."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()
+
+
+def mask_params(params):
+    """Параметры запроса, в которых строки заменены типом и длиной.
+
+    Числа и None сохраняются: их хватает, чтобы понять план, а в строках
+    бывают ключи токенов, хэши паролей и адреса почты.
+    """
+    if params is None or isinstance(params, (bool, int, float, Decimal)):
+        return params
+    if isinstance(params, dict):
+        return {name: mask_params(value) for name, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [mask_params(value) for value in params]
+    if isinstance(params, (str, bytes, bytearray, memoryview)):
+        return f'<{type(params).__name__}:{len(params)}>'
+    return f'<{type(params).__name__}>'
+
+
+def call_site():
+    """Ближайшие к запросу вызовы кода проекта, начиная с внутреннего.
+
+    Методы DRF, унаследованные представлениями и сериализаторами проекта,
+    подписываются именем класса: RecipeSerializer.to_representation.
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < STACK_DEPTH:
+        module = frame.f_globals.get('__name__', '')
+        owner = type(frame.f_locals.get('self'))
+        if module.startswith(IGNORED_MODULES):
+            location = None
+        elif module.startswith(PROJECT_MODULES):
+            location = f'{module}:{frame.f_lineno} {frame.f_code.co_name}'
+        elif owner.__module__.startswith(PROJECT_MODULES):
+            location = f'{owner.__name__}.{frame.f_code.co_name}'
+        else:
+            location = None
+        if location and (not frames or frames[-1] != location):
+            frames.append(location)
+        frame = frame.f_back
+    return '\n'.join(frames)
+
+
+class SlowQueryRecorder:
+    """Обертка execute_wrapper, записывающая запросы дольше порога.
+
+    Для каждого нового в процессе отпечатка снимается план выполнения.
+    Записи пишутся в ротируемый лог сразу, а в таблицу SlowQuery
+    сбрасываются методом flush() после завершения запроса, чтобы не
+    вмешиваться в транзакции представлений.
+    """
+
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms / 1000
+        self.explained = set()
+        self.pending = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(self._local, 'explaining', False):
+            return execute(sql, params, many, context)
+        start = perf_counter()
+        result = execute(sql, params, many, context)
+        duration = perf_counter() - start
+        if duration >= self.threshold:
+            self.record(sql, params, many, context['connection'], duration)
+        return result
+
+    def record(self, sql, params, many, connection, duration):
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        plan = ''
+        if not many and key not in self.explained:
+            self.explained.add(key)
+            plan = self.explain(connection, sql, params)
+        entry = {
+            'fingerprint': key,
+            'duration_ms': round(duration * 1000, 3),
+            'sql': normalized,
+            'params': repr(mask_params(params))[:PARAMS_MAX_LENGTH],
+            'stack': call_site(),
+            'plan': plan,
+        }
+        logger.info(json.dumps(entry, ensure_ascii=False))
+        with self._lock:
+            self.pending.append(entry)
+
+    def explain(self, connection, sql, params):
+        if not sql.lstrip().lower().startswith(EXPLAINABLE):
+            return ''
+        self._local.explaining = True
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'{connection.ops.explain_query_prefix()} {sql}',
+                        params
+                    )
+                    plan = '\n'.join(
+                        ' '.join(str(column) for column in row)
+                        for row in cursor.fetchall()
+                    )
+            # В условиях плана PostgreSQL подставлены значения параметров.
+            return _STRING_RE.sub('?', plan)
+        except DatabaseError:
+            return ''
+        finally:
+            self._local.explaining = False
+
+    def flush(self):
+        with self._lock:
+            entries, self.pending = self.pending, []
+        for entry in entries:
+            duration = entry['duration_ms']
+            changes = {
+                'calls': F('calls') + 1,
+                'total_time': F('total_time') + duration,
+                'max_time': Greatest(F('max_time'), duration),
+                # update() не заполняет поля auto_now.
+                'last_seen': timezone.now(),
+            }
+            if entry['plan']:
+                changes['plan'] = entry['plan']
+            queries = SlowQuery.objects.filter(
+                fingerprint=entry['fingerprint']
+            )
+            if not queries.update(**changes):
+                SlowQuery.objects.get_or_create(
+                    fingerprint=entry['fingerprint'],
+                    defaults={
+                        'sql': entry['sql'],
+                        'params': entry['params'],
+                        'stack': entry['stack'],
+                        'plan': entry['plan'],
+                        'calls': 1,
+                        'total_time': duration,
+                        'max_time': duration,
+                    }
+                )
+
+
+recorder = SlowQueryRecorder(settings.SLOW_QUERY_THRESHOLD_MS)
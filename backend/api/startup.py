@@ -0,0 +1,45 @@
+import logging
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.urls import URLResolver, get_resolver
+from PIL import Image
+from recipes.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+
+def populate_resolver(resolver):
+    """Построить таблицы обратного разрешения маршрутов всех уровней."""
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            populate_resolver(pattern)
+
+
+def populate_model_options():
+    """Заполнить кэши полей в _meta моделей, общие для всех экземпляров."""
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def warm_up(catalogs=True):
+    """Выполнить в мастере gunicorn работу первого запроса каждого воркера.
+
+    Маршруты, метаданные моделей, модули Pillow и, по желанию, справочники
+    загружаются до fork и достаются воркерам через copy-on-write.
+    Недоступная или еще не мигрированная база не мешает запуску:
+    справочники тогда загрузит первый запрос воркера.
+    Соединения с БД закрываются, чтобы воркеры не унаследовали их.
+    """
+    populate_resolver(get_resolver())
+    populate_model_options()
+    Image.init()
+    if catalogs:
+        try:
+            catalog.refresh()
+        except DatabaseError:
+            logger.warning(
+                'Справочники не загружены до запуска воркеров', exc_info=True
+            )
+    connections.close_all()
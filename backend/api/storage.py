@@ -0,0 +1,77 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from api.models import StoredFile
+
+INCOMING_DIR = '.incoming'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, называющее файлы по SHA-256 содержимого.
+
+    Одинаковые загрузки сохраняются один раз, а число ссылающихся на
+    файл объектов хранится в StoredFile: файл удаляется с диска, только
+    когда ссылок не остается. Имена не меняются, пока не меняется
+    содержимое, поэтому файлы можно кэшировать как неизменяемые.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            name = posixpath.join(directory, sha256[:2], sha256 + extension)
+            path = self.path(name)
+            with transaction.atomic():
+                stored, _ = StoredFile.objects.select_for_update(
+                ).get_or_create(
+                    name=name, defaults={'sha256': sha256, 'size': size}
+                )
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                    os.replace(temp_path, path)
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    refcount=F('refcount') + 1
+                )
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def delete(self, name):
+        """Снять одну ссылку на файл и удалить его, если ссылок не осталось.
+
+        Файлы, загруженные до появления учета ссылок, удаляются сразу.
+        """
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if stored is not None:
+                if stored.refcount > 1:
+                    StoredFile.objects.filter(pk=stored.pk).update(
+                        refcount=F('refcount') - 1
+                    )
+                    return
+                stored.delete()
+            super().delete(name)
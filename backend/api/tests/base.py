@@ -0,0 +1,130 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.test import APIClient
+
+from api import throttling
+from api.batch import close_worker_connections
+
+User = get_user_model()
+
+IMAGE = b'image content'
+
+
+def create_user(username, **fields):
+    return User.objects.create(
+        username=username,
+        email=f'{username}@example.com',
+        first_name='Имя',
+        last_name='Фамилия',
+        **fields
+    )
+
+
+def create_recipe(author, name='Рецепт', tags=(), ingredients=(), **fields):
+    """Рецепт с тегами и ингредиентами по 10 единиц каждого."""
+    fields.setdefault('image', 'recipes/images/test.png')
+    fields.setdefault('cooking_time', 10)
+    fields.setdefault('text', 'Описание')
+    recipe = Recipe.objects.create(author=author, name=name, **fields)
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+def create_catalog(tags=2, ingredients=3):
+    """Теги tag-0… и ингредиенты справочника."""
+    return (
+        [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag-{index}')
+            for index in range(tags)
+        ],
+        [
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+            for index in range(ingredients)
+        ],
+    )
+
+
+def png(size=(1, 1)):
+    """Содержимое PNG-изображения заданного размера."""
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def png_data_uri(size=(1, 1)):
+    """Изображение в виде строки base64, как его передают в JSON."""
+    return 'data:image/png;base64,' + base64.b64encode(png(size)).decode()
+
+
+class MediaRootMixin:
+    """Медиафайлы теста во временном каталоге."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save(self, content=IMAGE, name='recipes/images/image.png'):
+        return default_storage.save(name, ContentFile(content))
+
+
+class IsolatedThrottleMixin:
+    """Отдельные корзины ограничения частоты для класса тестов.
+
+    Корзины живут в общем для процессов файле, поэтому без подмены
+    запросы разных тестов и запусков расходовали бы одни и те же жетоны.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        state_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(state_dir.cleanup)
+        patcher = mock.patch.object(
+            throttling, 'buckets', throttling.TokenBucketStore(
+                os.path.join(state_dir.name, 'throttle'),
+                settings.THROTTLE_SLOTS
+            )
+        )
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
+    @staticmethod
+    def client_for(user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+
+class APITestCase(IsolatedThrottleMixin, TestCase):
+    pass
+
+
+class APITransactionTestCase(IsolatedThrottleMixin, TransactionTestCase):
+    """Для запросов, выполняемых в других потоках со своими соединениями."""
+
+    def tearDown(self):
+        # Открытые соединения потоков пакета не дали бы удалить базу.
+        close_worker_connections()
+        super().tearDown()
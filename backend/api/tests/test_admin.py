@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.admin import EstimatedCountPaginator
+from recipes.constants import ADMIN_TEXT_PREVIEW_LENGTH
+from recipes.models import Favorite, Recipe, RecipeIngredient
+
+from api.tests.base import create_catalog, create_recipe, create_user
+
+
+class RecipeAdminTest(TestCase):
+    """Списки админки на больших таблицах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', is_staff=True, is_superuser=True)
+        cls.author = create_user('author')
+        _, cls.ingredients = create_catalog(tags=0, ingredients=1)
+        cls.soup = create_recipe(
+            cls.author, 'Суп', ingredients=cls.ingredients,
+            text='x' * (ADMIN_TEXT_PREVIEW_LENGTH + 10)
+        )
+        cls.salad = create_recipe(
+            cls.author, 'Салат', ingredients=cls.ingredients
+        )
+        Favorite.objects.create(user=cls.admin, recipe=cls.soup)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, query=None):
+        response = self.client.get(
+            f'/admin/recipes/{model}/', query or {}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_changelist(self):
+        response = self.changelist('recipe')
+        results = response.context['cl'].result_list
+        soup = next(recipe for recipe in results if recipe.pk == self.soup.pk)
+        self.assertEqual(soup.favorites_count, 1)
+        self.assertIn('text', soup.get_deferred_fields())
+        self.assertContains(response, 'x' * ADMIN_TEXT_PREVIEW_LENGTH + '…')
+
+    def test_recipe_changelist_queries_do_not_grow(self):
+        with CaptureQueriesContext(connection) as before:
+            self.changelist('recipe')
+        for index in range(5):
+            recipe = create_recipe(
+                create_user(f'user{index}'), f'Рецепт {index}'
+            )
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+        with CaptureQueriesContext(connection) as after:
+            self.changelist('recipe')
+        self.assertEqual(len(after), len(before))
+
+    def test_recipe_name_filter(self):
+        response = self.changelist('recipeingredient', {'recipe_name': 'Су'})
+        self.assertEqual(
+            [item.recipe_id for item in response.context['cl'].result_list],
+            [self.soup.pk]
+        )
+
+    def test_recipe_ingredient_delete_touches_recipe(self):
+        item = RecipeIngredient.objects.get(recipe=self.salad)
+        updated_at = self.salad.updated_at
+        response = self.client.post(
+            f'/admin/recipes/recipeingredient/{item.pk}/delete/',
+            {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(
+            Recipe.objects.get(pk=self.salad.pk).updated_at, updated_at
+        )
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """Оценка числа строк вместо COUNT(*)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        for index in range(3):
+            create_recipe(author, f'Рецепт {index}')
+
+    def count_queries(self, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            count = EstimatedCountPaginator(queryset, 10).count
+        return count, [query['sql'] for query in queries]
+
+    def test_small_table_counted_exactly(self):
+        count, queries = self.count_queries(Recipe.objects.all())
+        self.assertEqual(count, 3)
+        self.assertIn('COUNT(*)', queries[-1])
+
+    def test_large_table_estimated(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Оценка берется из статистики PostgreSQL')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE recipes_recipe')
+        with mock.patch('recipes.admin.ADMIN_COUNT_ESTIMATE_THRESHOLD', 1):
+            count, queries = self.count_queries(Recipe.objects.all())
+            self.assertEqual(count, 3)
+            self.assertEqual(len(queries), 1)
+            self.assertIn('pg_class', queries[0])
+            count, queries = self.count_queries(
+                Recipe.objects.filter(name__startswith='Рецепт 1')
+            )
+        self.assertEqual(count, 1)
+        self.assertIn('COUNT(*)', queries[-1])
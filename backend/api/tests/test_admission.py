@@ -0,0 +1,145 @@
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from api import middleware
+from api.admission import AdmissionController, SlotPool
+from api.constants import ADMISSION_RETRY_AFTER
+from api.tests.base import APITestCase, create_user
+from api.views import RecipeViewSet, TagViewSet
+
+
+class TemporaryDirectoryMixin:
+    """Слоты теста во временном каталоге."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+
+class SlotPoolTest(TemporaryDirectoryMixin, SimpleTestCase):
+    """Слоты конкурентности на файлах с flock."""
+
+    def test_acquire_and_release(self):
+        pool = SlotPool(self.directory, 'read', 2)
+        slots = {pool.try_acquire(), pool.try_acquire()}
+        self.assertEqual(slots, {0, 1})
+        self.assertIsNone(pool.try_acquire())
+        pool.release(0)
+        self.assertEqual(pool.try_acquire(), 0)
+
+    def test_slots_shared_with_other_processes(self):
+        # Отдельно открытые файлы блокируются flock так же, как в другом
+        # процессе.
+        pool = SlotPool(self.directory, 'read', 1)
+        other = SlotPool(self.directory, 'read', 1)
+        index = pool.try_acquire()
+        self.assertIsNone(other.try_acquire())
+        pool.release(index)
+        self.assertEqual(other.try_acquire(), 0)
+
+    def test_empty_pool(self):
+        self.assertIsNone(SlotPool(self.directory, 'read', 0).try_acquire())
+
+
+class AdmissionControllerTest(TemporaryDirectoryMixin, SimpleTestCase):
+    """Допуск с ограниченной очередью."""
+
+    def controller(self, concurrency, queue_size, timeout=0.05):
+        return AdmissionController(
+            self.directory, {'read': (concurrency, queue_size)}, timeout
+        )
+
+    def test_full_queue_rejected_immediately(self):
+        controller = self.controller(1, 0)
+        self.assertIsNotNone(controller.acquire('read')[0])
+        self.assertEqual(controller.acquire('read'), (None, 0.0))
+
+    def test_queue_timeout(self):
+        controller = self.controller(1, 1)
+        controller.acquire('read')
+        slot, queue_time = controller.acquire('read')
+        self.assertIsNone(slot)
+        self.assertGreaterEqual(queue_time, 0.05)
+
+    def test_queued_request_admitted_after_release(self):
+        controller = self.controller(1, 1, timeout=5)
+        (pool, index), _ = controller.acquire('read')
+        timer = threading.Timer(0.05, pool.release, [index])
+        timer.start()
+        self.addCleanup(timer.join)
+        slot, queue_time = controller.acquire('read')
+        self.assertEqual(slot, (pool, index))
+        self.assertGreater(queue_time, 0)
+
+
+class AdmissionControlMiddlewareTest(TemporaryDirectoryMixin, APITestCase):
+    """503 при перегрузке и освобождение слотов."""
+
+    def setUp(self):
+        super().setUp()
+        controller = AdmissionController(self.directory, {
+            'read': (0, 0), 'default': (1, 0), 'heavy': (1, 0),
+        }, 0)
+        patcher = mock.patch.object(middleware, 'admission', controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_overloaded_class_rejected(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(ADMISSION_RETRY_AFTER))
+        self.assertEqual(
+            response.json(), {'detail': middleware.OVERLOADED_DETAIL}
+        )
+
+    def test_slot_released_after_response(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+
+    def test_streaming_response_holds_slot(self):
+        client = self.client_for(create_user('admin', is_staff=True))
+        response = client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/recipes/export/').status_code, 503)
+        # Клиент тестов закрывает ответ, дочитав тело.
+        b''.join(response.streaming_content)
+        response = client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+
+    def test_slot_released_once_on_close(self):
+        # Закрытие без чтения тела тоже освобождает слот, повторное — нет.
+        pool = mock.Mock()
+        content = middleware.SlotReleasingContent([b'data'], (pool, 0))
+        content.close()
+        content.close()
+        pool.release.assert_called_once_with(0)
+
+    def test_queue_time_in_server_timing(self):
+        pool = SlotPool(self.directory, 'read', 1)
+        with mock.patch.object(
+            middleware.admission, 'acquire',
+            return_value=((pool, pool.try_acquire()), 0.25)
+        ):
+            response = self.client.get('/api/tags/')
+        self.assertIn('queue;dur=250.0', response['Server-Timing'])
+
+    def test_admission_class(self):
+        factory = APIRequestFactory()
+        cases = (
+            (TagViewSet.as_view({'get': 'list'}), 'get', 'read'),
+            (RecipeViewSet.as_view({'get': 'list'}), 'get', 'default'),
+            (RecipeViewSet.as_view({'get': 'export'}), 'get', 'heavy'),
+        )
+        for view, method, expected in cases:
+            with self.subTest(expected=expected):
+                request = getattr(factory, method)('/')
+                self.assertEqual(
+                    middleware.admission_class(request, view), expected
+                )
@@ -0,0 +1,92 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.tests.base import APITestCase, create_user
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tests',
+    },
+}
+
+
+class TokenCacheTest(APITestCase):
+    """Кэш пользователей по токену и его сброс."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.other = create_user('other')
+
+    def setUp(self):
+        self.token = Token.objects.create(user=self.user)
+        self.other_token = Token.objects.create(user=self.other)
+
+    def get_me(self, token):
+        client = self.client_for()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client.get('/api/users/me/')
+
+    def test_second_request_skips_token_query(self):
+        self.assertEqual(self.get_me(self.token).status_code, 200)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_me(self.token).status_code, 200)
+        self.assertFalse(any(
+            'authtoken_token' in query['sql']
+            for query in context.captured_queries
+        ))
+
+    def test_deactivated_user_is_rejected(self):
+        self.get_me(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get_me(self.token).status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        self.get_me(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        self.assertEqual(self.get_me(self.token).status_code, 401)
+
+    def test_user_change_keeps_other_users_cached(self):
+        self.get_me(self.token)
+        self.get_me(self.other_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Другое'
+            self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(token_cache.get(self.other_token.key), self.other)
+
+    def test_last_login_does_not_invalidate(self):
+        self.get_me(self.token)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=('last_login',))
+        self.assertEqual(token_cache.get(self.token.key), self.user)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class SharedTokenCacheTest(TokenCacheTest):
+    """Версии токенов в общем кэше видны воркерам других узлов."""
+
+    def tearDown(self):
+        caches['shared'].clear()
+
+    def test_version_change_on_other_node(self):
+        self.get_me(self.token)
+        self.assertEqual(token_cache.get(self.token.key), self.user)
+        # Другой узел сменил версию; локальная запись процесса осталась.
+        caches['shared'].set(
+            f'auth-token-version:{self.token.key}', 'changed'
+        )
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertEqual(self.get_me(self.token).status_code, 200)
+        self.assertEqual(token_cache.get(self.token.key), self.user)
@@ -0,0 +1,139 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from recipes.models import Favorite
+
+from api import batch, middleware
+from api.tests.base import (APITransactionTestCase, create_catalog,
+                            create_recipe, create_user)
+
+THROTTLE_RATES = {'ip': '1000/min', 'user': '1000/min', 'route': '3/min'}
+
+
+class BatchMixin:
+    """Отправка пакета запросов (метод, путь) без тел."""
+
+    def batch(self, *items):
+        return self.client.post('/api/batch/', {'requests': [
+            {'method': method, 'path': path} for method, path in items
+        ]}, format='json')
+
+
+class BatchTest(BatchMixin, APITransactionTestCase):
+    """Пакетные запросы.
+
+    Чтения пакета выполняются в потоках пула со своими соединениями,
+    поэтому данные теста должны быть зафиксированы.
+    """
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.recipe = create_recipe(self.user)
+        self.client = self.client_for(self.user)
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['status'] for item in response.data]
+
+    def test_reads_do_not_stick_to_primary(self):
+        response = self.batch(('GET', '/api/tags/'), ('GET', '/api/recipes/'))
+        self.assertEqual(self.statuses(response), [200, 200])
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertNotIn(settings.REPLICA_STICKY_HEADER, response)
+
+    def test_write_sticks_to_primary(self):
+        response = self.batch(
+            ('GET', '/api/tags/'),
+            ('POST', f'/api/recipes/{self.recipe.pk}/shopping_cart/'),
+        )
+        self.assertEqual(self.statuses(response), [200, 201])
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertIn(settings.REPLICA_STICKY_HEADER, response)
+
+    def test_subrequests_are_throttled_per_route(self):
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': THROTTLE_RATES,
+        }
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            response = self.batch(*[('GET', '/api/tags/')] * 5)
+            statuses = self.statuses(response)
+            self.assertEqual(statuses.count(200), 3)
+            self.assertEqual(statuses.count(429), 2)
+            # Отдельный запрос к маршруту расходует те же жетоны.
+            self.assertEqual(self.client.get('/api/tags/').status_code, 429)
+
+    def test_subrequests_take_admission_slots(self):
+        acquired = []
+
+        def acquire(name):
+            acquired.append(name)
+            return None, 0.0
+
+        with mock.patch.object(middleware.admission, 'acquire', acquire):
+            response = self.batch(('GET', '/api/tags/'))
+        self.assertEqual(acquired, ['read'])
+        self.assertEqual(self.statuses(response), [503])
+        self.assertIn('Retry-After', response.data[0]['headers'])
+
+    def test_subrequest_slots_are_released(self):
+        released = []
+        pool = mock.Mock(release=released.append)
+        with mock.patch.object(
+            middleware.admission, 'acquire', return_value=((pool, 7), 0.0)
+        ):
+            response = self.batch(
+                ('GET', '/api/tags/'), ('GET', '/api/missing/'),
+                ('GET', '/api/recipes/')
+            )
+        self.assertEqual(self.statuses(response), [200, 404, 200])
+        self.assertEqual(released, [7, 7])
+
+
+class BatchResultsTest(BatchMixin, APITransactionTestCase):
+    """Ответы пакета с зафиксированными данными, видимыми потокам пула."""
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.tags, _ = create_catalog()
+        self.recipe = create_recipe(self.user, tags=self.tags)
+        self.client = self.client_for(self.user)
+
+    def test_results_keep_order(self):
+        response = self.batch(
+            ('GET', f'/api/recipes/{self.recipe.pk}/'),
+            ('GET', '/api/missing/'),
+            ('POST', f'/api/recipes/{self.recipe.pk}/favorite/'),
+            ('GET', f'/api/tags/{self.tags[0].pk}/'),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['status'] for item in response.data], [200, 404, 201, 200]
+        )
+        self.assertEqual(response.data[0]['body']['id'], self.recipe.pk)
+        self.assertEqual(response.data[3]['body']['slug'], 'tag-0')
+        self.assertTrue(Favorite.objects.filter(user=self.user).exists())
+
+    def test_subrequests_authenticated_as_batch_user(self):
+        response = self.batch(('GET', '/api/users/me/'))
+        self.assertEqual(response.data[0]['status'], 200)
+        self.assertEqual(response.data[0]['body']['username'], 'reader')
+        response = self.client_for().post('/api/batch/', {'requests': [
+            {'method': 'GET', 'path': '/api/users/me/'},
+        ]}, format='json')
+        self.assertEqual(response.data[0]['status'], 401)
+
+    def test_worker_connections_reused(self):
+        self.batch(('GET', '/api/tags/'))
+        opened = {
+            connection.connection for connection in batch._worker_connections
+            if connection.connection is not None
+        }
+        self.assertTrue(opened)
+        self.batch(*[('GET', '/api/tags/')] * 3)
+        self.assertLessEqual(opened, {
+            connection.connection for connection in batch._worker_connections
+        })
+        batch.close_worker_connections()
+        self.assertFalse(batch._worker_connections)
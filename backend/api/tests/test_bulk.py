@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.catalog import catalog
+from recipes.models import Favorite
+
+from api import serializers
+from api.constants import RECIPE_BULK_MAX_IDS
+from api.fragments import RecipeFragmentCache
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class RecipeBulkTest(APITestCase):
+    """Загрузка рецептов по списку id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        author = create_user('author')
+        tags, ingredients = create_catalog(tags=1, ingredients=1)
+        cls.recipes = [
+            create_recipe(
+                author, f'Рецепт {index}',
+                tags=tags, ingredients=ingredients
+            )
+            for index in range(3)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            serializers, 'recipe_fragments', RecipeFragmentCache(100, 60)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        catalog.reload()
+
+    def bulk(self, ids):
+        return self.client_for(self.user).get(
+            '/api/recipes/bulk/', {'ids': ids}
+        )
+
+    def test_order_and_missing(self):
+        first, second, third = (recipe.pk for recipe in self.recipes)
+        missing = third + 1000
+        response = self.bulk(f'{third},{missing},{first},{third}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [third, first]
+        )
+        self.assertEqual(response.data['missing'], [missing])
+
+    def test_personal_flags(self):
+        response = self.bulk(','.join(str(r.pk) for r in self.recipes))
+        self.assertEqual(
+            [recipe['is_favorited'] for recipe in response.data['results']],
+            [False, True, False]
+        )
+
+    def test_queries_do_not_grow_with_ids(self):
+        with CaptureQueriesContext(connection) as one:
+            self.bulk(str(self.recipes[0].pk))
+        with CaptureQueriesContext(connection) as many:
+            self.bulk(','.join(str(r.pk) for r in self.recipes))
+        self.assertEqual(len(many), len(one))
+
+    def test_invalid_ids(self):
+        for ids in ('', 'a,b', '0', '-1,2', '1,,2'):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.bulk(ids).status_code, 400)
+
+    def test_too_many_ids(self):
+        ids = ','.join(str(pk) for pk in range(1, RECIPE_BULK_MAX_IDS + 2))
+        self.assertEqual(self.bulk(ids).status_code, 400)
+        ids = ','.join(['1'] * (RECIPE_BULK_MAX_IDS + 1))
+        self.assertEqual(self.bulk(ids).status_code, 200)
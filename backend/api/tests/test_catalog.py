@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.test import TestCase
+from recipes.catalog import ReferenceCatalog, catalog
+from recipes.models import Ingredient, Recipe
+
+from api.tests.base import (APITestCase, MediaRootMixin, create_catalog,
+                            create_recipe, create_user, png_data_uri)
+
+
+class ReferenceCatalogTest(TestCase):
+    """Справочники ингредиентов и тегов в памяти процесса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, cls.ingredients = create_catalog(tags=1, ingredients=1)
+
+    def setUp(self):
+        self.catalog = ReferenceCatalog(check_interval=60)
+        self.catalog.refresh()
+
+    def test_ingredient(self):
+        self.assertEqual(
+            self.catalog.ingredient(self.ingredients[0].pk),
+            ('Ингредиент 0', 'г')
+        )
+        with self.assertNumQueries(0):
+            self.catalog.ingredient(self.ingredients[0].pk)
+
+    def test_ingredient_added_without_signals(self):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Соль', measurement_unit='г')]
+        )
+        ingredient = Ingredient.objects.get(name='Соль')
+        self.assertEqual(
+            self.catalog.ingredient(ingredient.pk), ('Соль', 'г')
+        )
+
+    def test_missing_ingredient(self):
+        missing = self.ingredients[0].pk + 1000
+        self.assertIsNone(self.catalog.ingredient(missing))
+        self.assertFalse(self.catalog.has_ingredient(missing))
+
+    def test_misses_reload_once_per_interval(self):
+        missing = self.ingredients[0].pk + 1000
+        self.catalog.ingredient(missing)
+        # Повторные промахи только сверяют версию справочников.
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.catalog.ingredient(missing))
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.catalog.ingredient(missing + 1))
+
+    def test_version_checked_once_per_interval(self):
+        tag = self.tags[0]
+        tag.name = 'Ужин'
+        tag.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.catalog.tag(tag.pk).name, 'Тег 0')
+        self.catalog.refresh(check_now=True)
+        self.assertEqual(self.catalog.tag(tag.pk).name, 'Ужин')
+
+    def test_missing_tag(self):
+        self.assertIsNone(self.catalog.tag(self.tags[0].pk + 1000))
+
+
+class IngredientRaceTest(MediaRootMixin, APITestCase):
+    """Ингредиент удален между проверкой и записью рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags, cls.ingredients = create_catalog(tags=1, ingredients=2)
+
+    def setUp(self):
+        super().setUp()
+        catalog.reload()
+
+    def test_deleted_ingredient_rejected(self):
+        deleted = self.ingredients[0]
+        Ingredient.objects.filter(pk=deleted.pk).delete()
+        self.assertTrue(catalog.has_ingredient(deleted.pk))
+        response = self.client_for(self.author).post('/api/recipes/', {
+            'name': 'Суп',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': png_data_uri(),
+            'tags': [self.tags[0].pk],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in self.ingredients
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data, {'ingredients': ['Несуществующий ингредиент.']}
+        )
+        self.assertFalse(Recipe.objects.filter(name='Суп').exists())
+
+    def test_ingredient_missing_from_catalog(self):
+        recipe = create_recipe(self.author, ingredients=self.ingredients)
+        entries = dict(catalog.ingredients)
+        missing = self.ingredients[0].pk
+        with mock.patch.object(
+            catalog, 'ingredient', side_effect=lambda pk: (
+                None if pk == missing else entries[pk]
+            )
+        ):
+            response = self.client.get(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        names = {
+            item['id']: item['name'] for item in response.data['ingredients']
+        }
+        self.assertEqual(names, {
+            missing: None, self.ingredients[1].pk: 'Ингредиент 1',
+        })
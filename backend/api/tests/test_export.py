@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from recipes.catalog import catalog
+from recipes.export import CSV_HEADER, iter_recipes, recipe_record
+
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class ExportTest(APITestCase):
+    """Потоковая выгрузка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', is_staff=True)
+        author = create_user('author')
+        cls.tags, cls.ingredients = create_catalog(tags=2, ingredients=2)
+        cls.recipes = [
+            create_recipe(
+                author, f'Рецепт {index}',
+                tags=cls.tags, ingredients=cls.ingredients
+            )
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        catalog.reload()
+
+    def export(self, output):
+        response = self.client_for(self.admin).get(
+            '/api/recipes/export/', {'output': output}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        records = [
+            json.loads(line) for line in self.export('ndjson').splitlines()
+        ]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [recipe.pk for recipe in self.recipes]
+        )
+        self.assertEqual(records[0]['tags'], ['tag-0', 'tag-1'])
+        self.assertEqual(records[0]['author']['username'], 'author')
+        self.assertEqual(records[0]['ingredients'][0], {
+            'name': 'Ингредиент 0', 'measurement_unit': 'г', 'amount': 10,
+        })
+
+    def test_csv(self):
+        rows = list(csv.reader(StringIO(self.export('csv'))))
+        self.assertEqual(tuple(rows[0]), CSV_HEADER)
+        self.assertEqual(len(rows), len(self.recipes) + 1)
+        row = dict(zip(CSV_HEADER, rows[1]))
+        self.assertEqual(row['tags'], 'tag-0|tag-1')
+        self.assertEqual(
+            row['ingredients'], 'Ингредиент 0:10:г|Ингредиент 1:10:г'
+        )
+
+    def test_admin_only(self):
+        response = self.client_for(self.recipes[0].author).get(
+            '/api/recipes/export/'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_format(self):
+        response = self.client_for(self.admin).get(
+            '/api/recipes/export/', {'output': 'xml'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_relations_loaded_per_chunk(self):
+        # Рецепты одним курсором и по запросу тегов и ингредиентов на пачку.
+        with self.assertNumQueries(1 + 3 * 2):
+            recipes = list(iter_recipes(chunk_size=2))
+            for recipe in recipes:
+                recipe_record(recipe)
+        self.assertEqual(len(recipes), len(self.recipes))
+
+    def test_ingredient_missing_from_catalog(self):
+        stale = {
+            pk: entry for pk, entry in catalog.ingredients.items()
+            if pk != self.ingredients[0].pk
+        }
+        with mock.patch.object(catalog, 'ingredients', stale):
+            # Недостающие ингредиенты читаются из базы одним запросом.
+            with self.assertNumQueries(4):
+                record = recipe_record(next(iter_recipes()))
+        self.assertEqual(
+            [item['name'] for item in record['ingredients']],
+            ['Ингредиент 0', 'Ингредиент 1']
+        )
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.csv')
+            call_command(
+                'export_recipes', output='csv', file=path, chunk_size=2,
+                stderr=StringIO()
+            )
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = list(csv.reader(file))
+        self.assertEqual(len(rows), len(self.recipes) + 1)
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.catalog import catalog
+from recipes.models import Follow, Recipe, RecipeIngredient
+
+from api import serializers
+from api.fragments import RecipeFragmentCache
+from api.serializers import (RecipeSerializer, UserFollowSerializer,
+                             UserSerializer)
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Параметры fields, profile и expand."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.author = create_user('author')
+        tags, ingredients = create_catalog(tags=1, ingredients=2)
+        create_recipe(cls.author, tags=tags, ingredients=ingredients)
+        Follow.objects.create(user=cls.user, following=cls.author)
+
+    def setUp(self):
+        self.fragments = RecipeFragmentCache(100, 60)
+        patcher = mock.patch.object(
+            serializers, 'recipe_fragments', self.fragments
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        catalog.reload()
+
+    def recipes(self, **params):
+        response = self.client_for(self.user).get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_fields(self):
+        (recipe,) = self.recipes(fields='id,name')
+        self.assertEqual(set(recipe), {'id', 'name'})
+
+    def test_card_profile(self):
+        (recipe,) = self.recipes(profile='card')
+        self.assertEqual(set(recipe), set(RecipeSerializer.profiles['card']))
+
+    def test_expand(self):
+        (recipe,) = self.recipes(profile='card', expand='author')
+        self.assertEqual(
+            set(recipe), {*RecipeSerializer.profiles['card'], 'author'}
+        )
+        self.assertTrue(recipe['author']['is_subscribed'])
+
+    def test_unknown_field_or_profile(self):
+        cases = ({'fields': 'id,secret'}, {'profile': 'tiny'},
+                 {'profile': 'card', 'expand': 'secret'})
+        for params in cases:
+            with self.subTest(**params):
+                response = self.client.get('/api/recipes/', params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_unrequested_relations_not_loaded(self):
+        # Неполные фрагменты не кэшируются, поэтому оба запроса — промахи.
+        with CaptureQueriesContext(connection) as card:
+            self.recipes(profile='card')
+        with CaptureQueriesContext(connection) as full:
+            self.recipes()
+        self.assertLess(len(card), len(full))
+        unrequested = (
+            RecipeIngredient._meta.db_table,
+            f'"{Recipe._meta.db_table}"."text"',
+        )
+        self.assertFalse([
+            query for query in card
+            if any(part in query['sql'] for part in unrequested)
+        ])
+
+    def test_sparse_fragment_not_cached(self):
+        self.recipes(fields='id,name')
+        (recipe,) = self.recipes()
+        self.assertIn('text', recipe)
+        self.assertEqual(len(recipe['ingredients']), 2)
+
+    def test_users_card_profile(self):
+        response = self.client.get('/api/users/', {'profile': 'card'})
+        self.assertEqual(response.status_code, 200)
+        for user in response.data['results']:
+            self.assertEqual(set(user), set(UserSerializer.profiles['card']))
+
+    def test_subscriptions_card_profile(self):
+        with mock.patch.object(
+            UserFollowSerializer, 'get_recipes'
+        ) as get_recipes:
+            response = self.client_for(self.user).get(
+                '/api/users/subscriptions/', {'profile': 'card'}
+            )
+        self.assertEqual(response.status_code, 200)
+        (author,) = response.data['results']
+        self.assertEqual(
+            set(author), set(UserFollowSerializer.profiles['card'])
+        )
+        self.assertEqual(author['recipes_count'], 1)
+        get_recipes.assert_not_called()
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from recipes.models import Favorite, Follow, Recipe, RecipeTag, ShoppingCart
+
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class RecipeTagFilterTest(APITestCase):
+    """Фильтр рецептов по тегам и порядок списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags, _ = create_catalog(tags=3, ingredients=0)
+        cls.both = create_recipe(cls.author, 'Оба тега', tags=cls.tags[:2])
+        cls.first = create_recipe(cls.author, 'Первый', tags=cls.tags[:1])
+        cls.other = create_recipe(cls.author, 'Другой', tags=cls.tags[2:])
+        cls.untagged = create_recipe(cls.author, 'Без тегов')
+
+    def list_ids(self, query):
+        response = self.client.get('/api/recipes/', query)
+        self.assertEqual(response.status_code, 200)
+        return response.data['count'], [
+            recipe['id'] for recipe in response.data['results']
+        ]
+
+    def test_each_recipe_listed_once(self):
+        count, ids = self.list_ids({'tags': ['tag-0', 'tag-1']})
+        self.assertEqual(count, 2)
+        self.assertCountEqual(ids, [self.both.pk, self.first.pk])
+
+    def test_single_tag(self):
+        self.assertEqual(
+            self.list_ids({'tags': 'tag-2'}), (1, [self.other.pk])
+        )
+
+    def test_unknown_tag(self):
+        response = self.client.get('/api/recipes/', {'tags': 'missing'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_same_pub_date_ordered_by_id(self):
+        Recipe.objects.update(pub_date=timezone.now())
+        _, ids = self.list_ids({'limit': 10})
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+
+class ListingIndexesTest(TestCase):
+    """Индексы для списков созданы в базе."""
+
+    def test_indexes_exist(self):
+        expected = {
+            Recipe: ('recipe_pub_date_idx', 'recipe_author_pub_date_idx'),
+            RecipeTag: ('recipetag_tag_recipe_idx',),
+            ShoppingCart: ('cart_recipe_user_idx',),
+            Favorite: ('favorite_recipe_user_idx',),
+            Follow: ('follow_following_user_idx',),
+        }
+        with connection.cursor() as cursor:
+            for model, names in expected.items():
+                constraints = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+                for name in names:
+                    with self.subTest(index=name):
+                        self.assertTrue(constraints[name]['index'])
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from recipes.catalog import catalog
+from recipes.models import Ingredient, RecipeChange, Tag
+
+from api import serializers
+from api.fragments import RecipeFragmentCache
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class RecipeFragmentCacheTest(APITestCase):
+    """Кэш представлений рецептов устаревает при любой их правке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.tags, cls.ingredients = create_catalog(tags=1, ingredients=2)
+        cls.recipe = create_recipe(
+            cls.author, tags=cls.tags, ingredients=cls.ingredients
+        )
+
+    def setUp(self):
+        self.fragments = RecipeFragmentCache(100, 60)
+        patcher = mock.patch.object(
+            serializers, 'recipe_fragments', self.fragments
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        catalog.reload()
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get(self, user=None):
+        response = self.client_for(user).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_unchanged_recipe_served_from_cache(self):
+        self.get()
+        self.get(self.reader)
+        self.assertEqual((self.fragments.hits, self.fragments.misses), (1, 1))
+
+    def test_personal_flags_not_cached(self):
+        self.get()
+        self.client_for(self.reader).post(f'{self.url}favorite/')
+        self.assertTrue(self.get(self.reader)['is_favorited'])
+        self.assertFalse(self.get(self.author)['is_favorited'])
+
+    def test_recipe_edit(self):
+        self.get()
+        response = self.client_for(self.author).patch(
+            self.url, {'name': 'Новое название'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get()['name'], 'Новое название')
+
+    def test_edit_logged_once(self):
+        changes = RecipeChange.objects.filter(recipe_id=self.recipe.pk)
+        before = changes.count()
+        self.client_for(self.author).patch(self.url, {
+            'tags': [self.tags[0].pk],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 5}
+                for ingredient in self.ingredients
+            ],
+        }, format='json')
+        self.assertEqual(changes.count(), before + 1)
+
+    def test_author_rename(self):
+        self.get()
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.assertEqual(self.get()['author']['first_name'], 'Новое')
+
+    def test_tag_rename(self):
+        self.get()
+        tag = Tag.objects.get(pk=self.tags[0].pk)
+        tag.name = 'Ужин'
+        tag.save()
+        self.assertEqual(self.get()['tags'][0]['name'], 'Ужин')
+
+    def test_ingredient_rename_after_catalog_refresh(self):
+        self.get()
+        ingredient = self.ingredients[0]
+        ingredient.name = 'Соль'
+        ingredient.save()
+        # Справочник процесса еще не перечитан.
+        self.get()
+        catalog.refresh(check_now=True)
+        names = {item['name'] for item in self.get()['ingredients']}
+        self.assertIn('Соль', names)
+
+    def test_ingredient_delete(self):
+        self.get()
+        Ingredient.objects.filter(pk=self.ingredients[0].pk).delete()
+        self.assertEqual(
+            [item['id'] for item in self.get()['ingredients']],
+            [self.ingredients[1].pk]
+        )
+
+    def test_tag_delete(self):
+        self.get()
+        Tag.objects.filter(pk=self.tags[0].pk).delete()
+        self.assertEqual(self.get()['tags'], [])
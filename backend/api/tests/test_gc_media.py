@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.management.commands.gc_media import Command
+from api.models import StoredFile
+from api.tests.base import (IMAGE, APITestCase, MediaRootMixin, create_recipe,
+                            create_user)
+
+
+class GarbageCollectMediaTest(MediaRootMixin, APITestCase):
+    """Удаление медиафайлов без ссылок."""
+
+    def setUp(self):
+        super().setUp()
+        self.old = self.put('recipes/images/old.png', hours=48)
+
+    def put(self, name, hours=0):
+        """Файл MEDIA_ROOT с временем изменения hours часов назад."""
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(IMAGE)
+        mtime = time.time() - hours * 3600
+        os.utime(path, (mtime, mtime))
+        return name
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+    def gc(self, **options):
+        stdout = StringIO()
+        call_command(
+            'gc_media', grace_hours=24, rate=0, stdout=stdout, **options
+        )
+        return stdout.getvalue()
+
+    def test_unreferenced_old_file_removed(self):
+        StoredFile.objects.create(
+            name=self.old, sha256='0' * 64, size=len(IMAGE)
+        )
+        output = self.gc()
+        self.assertFalse(self.exists(self.old))
+        self.assertFalse(StoredFile.objects.filter(name=self.old).exists())
+        self.assertIn('Удалено: 1', output)
+
+    def test_referenced_files_kept(self):
+        recipe_image = self.put('recipes/images/recipe.png', hours=48)
+        avatar = self.put('avatars/avatar.png', hours=48)
+        create_recipe(create_user('author', avatar=avatar), image=recipe_image)
+        self.gc()
+        self.assertTrue(self.exists(recipe_image))
+        self.assertTrue(self.exists(avatar))
+        self.assertFalse(self.exists(self.old))
+
+    def test_young_file_kept(self):
+        young = self.put('recipes/images/young.png', hours=1)
+        self.gc()
+        self.assertTrue(self.exists(young))
+
+    def test_other_directories_ignored(self):
+        other = self.put('exports/recipes.csv', hours=48)
+        self.gc()
+        self.assertTrue(self.exists(other))
+
+    def test_reference_added_after_scan(self):
+        # Ссылка, появившаяся после обхода каталога, перепроверяется перед
+        # удалением.
+        create_recipe(create_user('author'), image=self.old)
+        with mock.patch.object(Command, 'referenced_keys', return_value=set()):
+            self.gc()
+        self.assertTrue(self.exists(self.old))
+
+    def test_dry_run(self):
+        output = self.gc(dry_run=True)
+        self.assertTrue(self.exists(self.old))
+        self.assertIn('Будет удалено: 1', output)
+
+    def test_quarantine(self):
+        quarantine = tempfile.TemporaryDirectory()
+        self.addCleanup(quarantine.cleanup)
+        self.gc(quarantine=quarantine.name)
+        self.assertFalse(self.exists(self.old))
+        self.assertTrue(
+            os.path.exists(os.path.join(quarantine.name, self.old))
+        )
+
+    def test_quarantine_inside_media_root(self):
+        with self.assertRaises(CommandError):
+            self.gc(quarantine=os.path.join(settings.MEDIA_ROOT, 'trash'))
+        self.assertTrue(self.exists(self.old))
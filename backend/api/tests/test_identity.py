@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.catalog import catalog
+from recipes.models import Recipe, Tag
+
+from api import serializers
+from api.fragments import RecipeFragmentCache
+from api.identity import IdentityMap, get_identity_map, identity_scope
+from api.tests.base import (APITestCase, create_catalog, create_recipe,
+                            create_user)
+
+
+class IdentityMapTest(TestCase):
+    """Карта объектов, загруженных за запрос."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, _ = create_catalog(tags=3, ingredients=0)
+
+    def test_add_keeps_first_instance(self):
+        identity_map = IdentityMap()
+        first = Tag.objects.get(pk=self.tags[0].pk)
+        second = Tag.objects.get(pk=self.tags[0].pk)
+        self.assertIs(identity_map.add(first), first)
+        self.assertIs(identity_map.add(second), first)
+
+    def test_attach(self):
+        author = create_user('author')
+        recipes = [create_recipe(author, f'Рецепт {index}') for index in '12']
+        recipes = list(Recipe.objects.filter(pk__in=[r.pk for r in recipes]))
+        identity_map = IdentityMap()
+        identity_map.add(author)
+        identity_map.attach(recipes, 'author')
+        with self.assertNumQueries(0):
+            for recipe in recipes:
+                self.assertIs(recipe.author, author)
+
+    def test_scope(self):
+        self.assertIsNot(get_identity_map(), get_identity_map())
+        with identity_scope():
+            identity_map = get_identity_map()
+            self.assertIs(get_identity_map(), identity_map)
+            with identity_scope():
+                self.assertIsNot(get_identity_map(), identity_map)
+            self.assertIs(get_identity_map(), identity_map)
+
+
+class SharedRepresentationTest(APITestCase):
+    """Одинаковые вложенные объекты загружаются и строятся один раз."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tags, _ = create_catalog(tags=1, ingredients=0)
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            serializers, 'recipe_fragments', RecipeFragmentCache(100, 60)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        catalog.reload()
+
+    def create_recipes(self, count):
+        for _ in range(count):
+            create_recipe(
+                self.author, f'Рецепт {Recipe.objects.count()}',
+                tags=self.tags
+            )
+
+    def list_recipes(self):
+        response = self.client.get('/api/recipes/', {'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_same_author_serialized_once(self):
+        self.create_recipes(4)
+        with mock.patch.object(
+            serializers.UserSerializer, 'get_is_subscribed', return_value=False
+        ) as get_is_subscribed:
+            response = self.list_recipes()
+        self.assertEqual(get_is_subscribed.call_count, 1)
+        self.assertIn('identity-hits', response['Server-Timing'])
+
+    def test_queries_do_not_grow_with_page(self):
+        self.create_recipes(2)
+        with CaptureQueriesContext(connection) as before:
+            self.list_recipes()
+        self.create_recipes(4)
+        serializers.recipe_fragments.cache.local.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.list_recipes()
+        self.assertEqual(len(after), len(before))
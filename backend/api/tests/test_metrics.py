@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+from recipes.models import Tag
+
+from api import metrics
+from api.metrics import MetricsRegistry
+from api.tests.base import APITestCase
+
+
+class IsolatedRegistryMixin:
+    """Метрики теста в отдельном каталоге."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.registry = MetricsRegistry(directory.name, 60)
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ServerTimingTest(IsolatedRegistryMixin, APITestCase):
+    """Заголовок Server-Timing и метрики запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def test_header(self):
+        response = self.client.get('/api/tags/')
+        entries = dict(
+            entry.split(';', 1)
+            for entry in response['Server-Timing'].split(', ')
+        )
+        for name in ('db', 'serialize', 'render', 'total'):
+            self.assertRegex(entries[name], r'^dur=\d+\.\d$')
+        self.assertEqual(entries['db-queries'], 'desc="1"')
+
+    def test_request_metrics(self):
+        self.client.get('/api/tags/')
+        self.client.get('/api/tags/')
+        text = self.client.get('/metrics').content.decode()
+        self.assertIn(
+            'foodgram_responses_total{method="GET",'
+            'route="TagViewSet.list",status="200"} 2.0',
+            text
+        )
+        self.assertIn(
+            'foodgram_db_queries_total{method="GET",'
+            'route="TagViewSet.list"} 2.0',
+            text
+        )
+        self.assertIn(
+            'foodgram_request_duration_seconds_count{method="GET",'
+            'route="TagViewSet.list"} 2\n',
+            text
+        )
+
+
+class MetricsRegistryTest(IsolatedRegistryMixin, SimpleTestCase):
+    """Суммирование метрик воркеров узла."""
+
+    def test_collect_sums_process_snapshots(self):
+        self.registry.inc('foodgram_test_total', 2, route='a')
+        self.registry.observe('foodgram_test_seconds', 0.02, route='a')
+        other = {
+            'counters': [['foodgram_test_total', {'route': 'a'}, 3]],
+            'histograms': [[
+                'foodgram_test_seconds', {'route': 'a'}, {
+                    'buckets': list(metrics.DURATION_BUCKETS),
+                    'counts': [1] + [0] * len(metrics.DURATION_BUCKETS),
+                    'sum': 0.001,
+                },
+            ]],
+        }
+        path = os.path.join(self.registry.directory, 'other.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(other, file)
+        text = self.registry.render()
+        self.assertIn('foodgram_test_total{route="a"} 5.0', text)
+        self.assertIn('foodgram_test_seconds_count{route="a"} 2', text)
+        self.assertIn(
+            'foodgram_test_seconds_bucket{route="a",le="0.005"} 1', text
+        )
+        self.assertIn(
+            'foodgram_test_seconds_bucket{route="a",le="0.025"} 2', text
+        )
+
+    def test_broken_snapshot_is_skipped(self):
+        self.registry.inc('foodgram_test_total', route='a')
+        path = os.path.join(self.registry.directory, 'broken.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{')
+        self.assertIn(
+            'foodgram_test_total{route="a"} 1.0', self.registry.render()
+        )
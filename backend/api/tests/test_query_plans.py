@@ -0,0 +1,96 @@
+from django.test import SimpleTestCase, TestCase
+
+from api.plans import (capture, compare, degradations, load_snapshots,
+                       normalize_plan, seed)
+
+
+class QueryPlansTest(TestCase):
+    """Планы основных запросов API не хуже сохраненных снимков."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed()
+
+    def test_plans_not_degraded(self):
+        snapshots = load_snapshots()
+        if snapshots is None:
+            self.skipTest('Нет снимков планов для этой СУБД')
+        report, failures = compare(snapshots, capture(self.user))
+        self.assertEqual(failures, 0, '\n'.join(report))
+
+
+class DegradationsTest(SimpleTestCase):
+    """Распознавание ухудшений плана."""
+
+    def test_normalize_postgresql_plan(self):
+        rows = [
+            ('Nested Loop  (cost=0.29..16.34 rows=1 width=8)',),
+            ('  ->  Seq Scan on recipes_tag  (cost=0.00..1.01 rows=1)',),
+            ('        Filter: (slug = \'a\')',),
+            ('  ->  Index Scan using tag_pkey on recipes_recipe_tags'
+             '  (cost=0.29..15.31 rows=1)',),
+        ]
+        self.assertEqual(normalize_plan('postgresql', rows), [
+            'Nested Loop',
+            '  Seq Scan on recipes_tag',
+            '  Index Scan using tag_pkey on recipes_recipe_tags',
+        ])
+
+    def test_index_replaced_by_seq_scan(self):
+        expected = ['Index Scan using recipe_pkey on recipes_recipe']
+        actual = ['Seq Scan on recipes_recipe']
+        self.assertEqual(
+            degradations('postgresql', expected, actual),
+            ['recipes_recipe: индекс заменен полным просмотром']
+        )
+
+    def test_extra_nested_loop(self):
+        expected = ['Hash Join', '  Seq Scan on recipes_tag']
+        actual = ['Nested Loop', '  Seq Scan on recipes_tag']
+        self.assertEqual(
+            degradations('postgresql', expected, actual),
+            ['вложенных циклов стало 1 вместо 0']
+        )
+
+    def test_improvement_is_not_degradation(self):
+        expected = ['Seq Scan on recipes_recipe']
+        actual = ['Index Only Scan using recipe_pkey on recipes_recipe']
+        self.assertEqual(degradations('postgresql', expected, actual), [])
+
+    def test_sqlite_full_scan(self):
+        expected = ['SEARCH recipes_recipe USING INDEX recipe_author']
+        actual = ['SCAN recipes_recipe']
+        self.assertEqual(
+            degradations('sqlite', expected, actual),
+            ['recipes_recipe: индекс заменен полным просмотром']
+        )
+
+
+class CompareTest(SimpleTestCase):
+    """Новые и пропавшие запросы считаются расхождениями."""
+
+    plan = ['SCAN recipes_tag']
+    snapshots = {'tags': {'a': {'sql': 'SELECT a', 'plan': plan}}}
+
+    def test_same_queries(self):
+        self.assertEqual(compare(self.snapshots, self.snapshots), ([], 0))
+
+    def test_new_query(self):
+        plans = {'tags': {
+            **self.snapshots['tags'],
+            'b': {'sql': 'SELECT b', 'plan': self.plan},
+        }}
+        report, failures = compare(self.snapshots, plans)
+        self.assertEqual(failures, 1)
+        self.assertEqual(report[0], 'tags: новый запрос SELECT b')
+
+    def test_missing_query(self):
+        plans = {'tags': {'b': {'sql': 'SELECT b', 'plan': self.plan}}}
+        report, failures = compare(self.snapshots, plans)
+        self.assertEqual(failures, 2)
+        self.assertIn('tags: запрос пропал SELECT a', report)
+
+    def test_missing_scenario(self):
+        self.assertEqual(
+            compare(self.snapshots, {}), (['tags: сценарий пропал'], 1)
+        )
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, Follow, ShoppingCart
+
+from api.tests.base import APITestCase, create_recipe, create_user
+
+
+class UserRelationsTest(APITestCase):
+    """Флаги связей пользователя берутся из множеств id на запрос."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [create_user(f'author{index}') for index in range(3)]
+        cls.recipes = [
+            create_recipe(author, name=f'Рецепт {index}')
+            for index, author in enumerate(cls.authors)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Follow.objects.create(user=cls.user, following=cls.authors[2])
+
+    def test_recipe_flags(self):
+        response = self.client_for(self.user).get('/api/recipes/')
+        flags = {
+            recipe['id']: (
+                recipe['is_favorited'],
+                recipe['is_in_shopping_cart'],
+                recipe['author']['is_subscribed'],
+            )
+            for recipe in response.data['results']
+        }
+        self.assertEqual(flags, {
+            self.recipes[0].pk: (True, False, False),
+            self.recipes[1].pk: (False, True, False),
+            self.recipes[2].pk: (False, False, True),
+        })
+
+    def test_anonymous_flags(self):
+        response = self.client_for().get('/api/recipes/')
+        for recipe in response.data['results']:
+            self.assertFalse(recipe['is_favorited'])
+            self.assertFalse(recipe['is_in_shopping_cart'])
+
+    def test_flag_queries_do_not_grow_with_page(self):
+        client = self.client_for(self.user)
+        with CaptureQueriesContext(connection) as small:
+            client.get('/api/recipes/', {'limit': 1})
+        with CaptureQueriesContext(connection) as full:
+            client.get('/api/recipes/', {'limit': 3})
+        self.assertEqual(len(full), len(small))
+
+    def test_subscriptions_is_subscribed(self):
+        response = self.client_for(self.user).get('/api/users/subscriptions/')
+        self.assertEqual(
+            [user['is_subscribed'] for user in response.data['results']],
+            [True]
+        )
+
+    def test_subscribe_response_is_subscribed(self):
+        response = self.client_for(self.user).post(
+            f'/api/users/{self.authors[0].pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIs(response.data['is_subscribed'], True)
+
+    def test_is_subscribed_is_per_user(self):
+        other = create_user('other')
+        Follow.objects.create(user=other, following=self.authors[0])
+        response = self.client_for(other).get('/api/users/subscriptions/')
+        self.assertEqual(response.data['results'][0]['is_subscribed'], True)
+        response = self.client_for(self.user).get(
+            f'/api/users/{self.authors[0].pk}/'
+        )
+        self.assertIs(response.data['is_subscribed'], False)
@@ -0,0 +1,112 @@
+from time import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from recipes.models import Tag
+
+from api import middleware
+from api.db_routers import ReplicaLagGuard
+from api.tests.base import APITestCase, create_recipe, create_user
+
+
+class ReplicaLagGuardTest(SimpleTestCase):
+    """Выбор реплики по отставанию."""
+
+    def guard(self, lags, check_interval=60):
+        guard = ReplicaLagGuard(lags, max_lag=5, check_interval=check_interval)
+        patcher = mock.patch.object(guard, 'measure', side_effect=lags.get)
+        self.measure = patcher.start()
+        self.addCleanup(patcher.stop)
+        return guard
+
+    def test_lagging_and_unavailable_skipped(self):
+        guard = self.guard({
+            'replica_1': 10.0, 'replica_2': 1.0, 'replica_3': float('inf'),
+        })
+        for _ in range(5):
+            self.assertEqual(guard.choose(), 'replica_2')
+
+    def test_falls_back_to_primary(self):
+        guard = self.guard({'replica_1': 10.0, 'replica_2': float('inf')})
+        self.assertIsNone(guard.choose())
+
+    def test_lag_measured_once_per_interval(self):
+        guard = self.guard({'replica_1': 1.0})
+        guard.choose()
+        guard.choose()
+        self.assertEqual(self.measure.call_count, 1)
+
+    def test_lag_remeasured_after_interval(self):
+        guard = self.guard({'replica_1': 1.0}, check_interval=0)
+        guard.choose()
+        guard.choose()
+        self.assertEqual(self.measure.call_count, 2)
+
+
+class ReplicaRoutingMiddlewareTest(APITestCase):
+    """Чтение из реплики и чтение из основной базы после записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipe = create_recipe(create_user('author'))
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        patcher = mock.patch.object(middleware, 'replicas')
+        self.replicas = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Реплики в тестах нет, поэтому «реплика» — та же основная база.
+        self.replicas.choose.return_value = 'default'
+        self.client = self.client_for(self.user)
+
+    def test_safe_read_goes_to_replica(self):
+        with mock.patch.object(
+            middleware, 'read_from', wraps=middleware.read_from
+        ) as read_from:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        read_from.assert_called_once_with('default')
+        self.assertNotIn(settings.REPLICA_STICKY_HEADER, response)
+
+    def test_view_without_replica_reads(self):
+        self.client.get(f'/api/s/{self.recipe.short_link}/')
+        self.replicas.choose.assert_not_called()
+
+    def test_write_sticks_to_primary(self):
+        before = int(time())
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        primary_until = int(response[settings.REPLICA_STICKY_HEADER])
+        self.assertGreaterEqual(
+            primary_until, before + settings.REPLICA_STICKY_SECONDS
+        )
+        self.assertEqual(
+            response.cookies[settings.REPLICA_STICKY_COOKIE].value,
+            str(primary_until)
+        )
+        self.client.get('/api/tags/')
+        self.replicas.choose.assert_not_called()
+
+    def test_sticky_header(self):
+        self.client.get(
+            '/api/tags/',
+            HTTP_X_PRIMARY_UNTIL=str(int(time()) + 60)
+        )
+        self.replicas.choose.assert_not_called()
+
+    def test_expired_or_invalid_stickiness_ignored(self):
+        for value in (str(int(time()) - 1), 'invalid'):
+            self.client.cookies[settings.REPLICA_STICKY_COOKIE] = value
+            self.client.get('/api/tags/')
+        self.assertEqual(self.replicas.choose.call_count, 2)
+
+    def test_no_healthy_replica(self):
+        self.replicas.choose.return_value = None
+        with mock.patch.object(middleware, 'read_from') as read_from:
+            response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        read_from.assert_not_called()
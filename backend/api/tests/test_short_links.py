@@ -0,0 +1,115 @@
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from recipes.constants import BASE62_ALPHABET
+from recipes.models import Recipe, ShortLinkAlias
+from recipes.utils import encode_base62, short_link_code
+
+from api import views
+from api.cache import TieredCache
+from api.tests.base import APITestCase, create_recipe, create_user
+
+
+class Base62Test(APITestCase):
+    """Кодирование id рецепта в короткую ссылку."""
+
+    def test_encode(self):
+        self.assertEqual(encode_base62(0), BASE62_ALPHABET[0])
+        self.assertEqual(encode_base62(61), BASE62_ALPHABET[61])
+        self.assertEqual(encode_base62(62), '10')
+        self.assertEqual(encode_base62(62 ** 2 - 1), BASE62_ALPHABET[61] * 2)
+
+    def test_new_recipe_gets_code_of_its_id(self):
+        recipe = create_recipe(create_user('author'))
+        self.assertEqual(recipe.short_link, encode_base62(recipe.pk))
+
+    def test_code_taken_by_alias(self):
+        self.assertEqual(short_link_code(5, {'5', '5-1', '6'}), '5-2')
+
+    def test_new_code_does_not_shadow_alias(self):
+        author = create_user('author')
+        recipe = create_recipe(author)
+        other = create_recipe(author, 'Другой')
+        code = encode_base62(recipe.pk)
+        ShortLinkAlias.objects.create(recipe=other, slug=code)
+        Recipe.objects.filter(pk=recipe.pk).update(short_link=None)
+        recipe.short_link = None
+        recipe.save()
+        self.assertEqual(recipe.short_link, f'{code}-1')
+
+    def test_backfill_keeps_aliases(self):
+        author = create_user('author')
+        recipe = create_recipe(author)
+        other = create_recipe(author, 'Другой')
+        # Прежняя ссылка рецепта совпала с будущим кодом другого рецепта.
+        old_link = encode_base62(other.pk)
+        Recipe.objects.update(short_link=None)
+        Recipe.objects.filter(pk=recipe.pk).update(short_link=old_link)
+        migration = import_module(
+            'recipes.migrations.0003_recipe_short_link_codes'
+        )
+        migration.backfill_short_links(apps, None)
+        self.assertEqual(
+            ShortLinkAlias.objects.get(slug=old_link).recipe_id, recipe.pk
+        )
+        self.assertEqual(
+            Recipe.objects.get(pk=other.pk).short_link, f'{old_link}-1'
+        )
+
+
+class ShortLinkTest(APITestCase):
+    """Редирект с короткой ссылки и кэш ссылок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipe = create_recipe(cls.author)
+        cls.alias = ShortLinkAlias.objects.create(
+            recipe=cls.recipe, slug='old-soup'
+        )
+
+    def setUp(self):
+        patcher = mock.patch.object(
+            views, 'short_links', TieredCache('short-link', 100, 60)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def recipe_url(self):
+        return f'http://{settings.DOMAIN}/api/recipes/{self.recipe.pk}'
+
+    def test_get_link(self):
+        response = self.client_for(self.author).get(
+            f'/api/recipes/{self.recipe.pk}/get-link/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['short-link'],
+            f'https://{settings.DOMAIN}/api/s/{self.recipe.short_link}'
+        )
+
+    def test_redirect(self):
+        response = self.client.get(f'/api/s/{self.recipe.short_link}/')
+        self.assertRedirects(
+            response, self.recipe_url(), fetch_redirect_response=False
+        )
+
+    def test_alias_redirect(self):
+        response = self.client.get(f'/api/s/{self.alias.slug}/')
+        self.assertRedirects(
+            response, self.recipe_url(), fetch_redirect_response=False
+        )
+
+    def test_unknown_code(self):
+        self.assertEqual(self.client.get('/api/s/missing/').status_code, 404)
+
+    def test_second_resolution_is_cached(self):
+        url = f'/api/s/{self.recipe.short_link}/'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertRedirects(
+            response, self.recipe_url(), fetch_redirect_response=False
+        )
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase
+from django.utils import timezone
+from recipes.models import Tag
+
+from api import middleware
+from api.models import SlowQuery
+from api.slowlog import (SlowQueryRecorder, fingerprint, mask_params,
+                         normalize_sql)
+from api.tests.base import APITestCase
+
+
+class NormalizeSqlTest(SimpleTestCase):
+    """Отпечаток запроса без значений."""
+
+    def test_values_replaced(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT *  FROM t\n WHERE name = 'O''Brien' AND id IN "
+                "(%s, %s, %s) AND amount > 10.5"
+            ),
+            'SELECT * FROM t WHERE name = ? AND id IN (...) AND amount > ?'
+        )
+
+    def test_same_shape_same_fingerprint(self):
+        self.assertEqual(
+            fingerprint(normalize_sql('SELECT 1 FROM t WHERE id IN (1, 2)')),
+            fingerprint(normalize_sql('SELECT 1 FROM t WHERE id IN (%s)'))
+        )
+
+    def test_params_masked(self):
+        self.assertEqual(
+            mask_params((
+                'user@example.com', 5, None, Decimal('1.5'), b'hash',
+                ['token', 7],
+            )),
+            ['<str:16>', 5, None, Decimal('1.5'), '<bytes:4>', ['<str:5>', 7]]
+        )
+        self.assertEqual(mask_params({'email': 'a@b'}), {'email': '<str:3>'})
+
+
+class SlowQueryMiddlewareTest(APITestCase):
+    """Запись медленных запросов, выполненных при обработке запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        self.recorder = SlowQueryRecorder(0)
+        patcher = mock.patch.object(middleware, 'recorder', self.recorder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_tags(self):
+        with self.assertLogs('foodgram.slow_queries', 'INFO'):
+            return self.client.get('/api/tags/')
+
+    def test_queries_aggregated_by_fingerprint(self):
+        self.get_tags()
+        self.get_tags()
+        query = SlowQuery.objects.get(sql__contains='"recipes_tag"')
+        self.assertEqual(query.calls, 2)
+        self.assertGreaterEqual(query.total_time, query.max_time)
+        self.assertTrue(query.plan)
+        self.assertIn('TagViewSet', query.stack)
+        self.assertEqual(self.recorder.pending, [])
+
+    def test_plan_taken_once_per_fingerprint(self):
+        with mock.patch.object(
+            self.recorder, 'explain', wraps=self.recorder.explain
+        ) as explain:
+            self.get_tags()
+            self.get_tags()
+        self.assertEqual(explain.call_count, 1)
+
+    def test_flush_error_keeps_response(self):
+        with mock.patch.object(
+            self.recorder, 'flush', side_effect=DatabaseError
+        ), self.assertLogs('api.middleware', 'ERROR'):
+            response = self.get_tags()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+class SlowQueryRecorderTest(APITestCase):
+    """Запись медленного запроса в таблицу."""
+
+    def record(self, recorder, email):
+        users = get_user_model().objects.filter(email=email)
+        with self.assertLogs('foodgram.slow_queries', 'INFO') as logs:
+            list(users)
+        recorder.flush()
+        return logs.output
+
+    def test_params_not_stored(self):
+        recorder = SlowQueryRecorder(0)
+        with connection.execute_wrapper(recorder):
+            output = self.record(recorder, 'secret@example.com')
+        query = SlowQuery.objects.get(sql__contains='"email" = ?')
+        self.assertNotIn('secret', query.params + query.plan)
+        self.assertIn('<str:18>', query.params)
+        self.assertNotIn('secret', ''.join(output))
+
+    def test_last_seen_updated(self):
+        recorder = SlowQueryRecorder(0)
+        with connection.execute_wrapper(recorder):
+            self.record(recorder, 'first@example.com')
+            first_seen = timezone.now() - timedelta(hours=1)
+            SlowQuery.objects.update(last_seen=first_seen)
+            self.record(recorder, 'second@example.com')
+        query = SlowQuery.objects.get(sql__contains='"email" = ?')
+        self.assertEqual(query.calls, 2)
+        self.assertGreater(query.last_seen, first_seen)
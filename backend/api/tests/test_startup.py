@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase
+from recipes.catalog import ReferenceCatalog
+
+from api import startup
+from api.management.commands.profile_startup import Command, parse_importtime
+
+TIMINGS = {'setup': 0.5, 'wsgi': 0.2, 'warm_up': 0.1, 'total': 0.8}
+
+
+class WarmUpTest(TestCase):
+    """Подготовка приложения в мастере gunicorn до fork."""
+
+    def setUp(self):
+        # Закрытие соединения сломало бы транзакцию теста.
+        patcher = mock.patch.object(startup, 'connections')
+        self.connections = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warm_up(self):
+        with mock.patch.object(startup.catalog, 'refresh') as refresh:
+            startup.warm_up()
+        refresh.assert_called_once_with()
+        self.assertTrue(startup.get_resolver()._populated)
+        self.connections.close_all.assert_called_once_with()
+
+    def test_without_catalogs(self):
+        with mock.patch.object(startup.catalog, 'refresh') as refresh:
+            startup.warm_up(catalogs=False)
+        refresh.assert_not_called()
+
+    def test_database_unavailable(self):
+        with mock.patch.object(
+            startup.catalog, 'refresh', side_effect=DatabaseError
+        ), self.assertLogs('api.startup', 'WARNING'):
+            startup.warm_up()
+        self.connections.close_all.assert_called_once_with()
+
+    def test_failed_check_retried(self):
+        catalog = ReferenceCatalog(check_interval=60)
+        with mock.patch.object(
+            catalog, 'current_version', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                catalog.refresh()
+        with self.assertNumQueries(3):
+            catalog.refresh()
+
+
+class ProfileStartupTest(SimpleTestCase):
+    """История времени запуска и проверка регрессии."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = os.path.join(directory.name, 'history.jsonl')
+
+    def profile(self, total, **options):
+        timings = {**TIMINGS, 'total': total}
+        modules = {'django.db': 0.05, 'django.urls': 0.02, 'PIL': 0.01}
+        stdout = StringIO()
+        with mock.patch.object(
+            Command, 'probe', return_value=(timings, modules)
+        ):
+            call_command(
+                'profile_startup', runs=1, history=self.history,
+                stdout=stdout, **options
+            )
+        return stdout.getvalue()
+
+    def entries(self):
+        with open(self.history, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_parse_importtime(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   django.db\n'
+            'some other output\n'
+            'import time:      1500 |       1620 | PIL\n'
+        )
+        self.assertEqual(
+            parse_importtime(stderr), {'django.db': 0.00012, 'PIL': 0.0015}
+        )
+
+    def test_history_recorded(self):
+        output = self.profile(0.8)
+        self.assertIn('total', output)
+        (entry,) = self.entries()
+        self.assertEqual(entry['total'], 0.8)
+        self.assertAlmostEqual(entry['packages']['django'], 0.07)
+
+    def test_regression_detected(self):
+        for _ in range(3):
+            self.profile(1.0)
+        self.profile(1.1, max_regression=20)
+        with self.assertRaisesMessage(CommandError, 'выросло на 50.0%'):
+            self.profile(1.5, max_regression=20)
+        self.assertEqual(len(self.entries()), 5)
+
+    def test_first_run_not_compared(self):
+        output = self.profile(5.0, max_regression=20)
+        self.assertNotIn('Относительно медианы', output)
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import time
+from io import StringIO
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.models import StoredFile
+from api.storage import INCOMING_DIR
+from api.tests.base import (IMAGE, APITestCase, MediaRootMixin, create_recipe,
+                            create_user)
+
+
+class ContentAddressedStorageTest(MediaRootMixin, APITestCase):
+    """Хранение одинаковых файлов один раз и учет ссылок."""
+
+    def test_same_content_stored_once(self):
+        first = self.save()
+        second = self.save(name='recipes/images/copy.PNG')
+        sha256 = hashlib.sha256(IMAGE).hexdigest()
+        self.assertEqual(first, f'recipes/images/{sha256[:2]}/{sha256}.png')
+        self.assertEqual(second, first)
+        stored = StoredFile.objects.get(name=first)
+        self.assertEqual(
+            (stored.sha256, stored.size, stored.refcount),
+            (sha256, len(IMAGE), 2)
+        )
+        self.assertEqual(os.listdir(default_storage.path(INCOMING_DIR)), [])
+
+    def test_file_removed_with_last_reference(self):
+        name = self.save()
+        self.save()
+        default_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).refcount, 1)
+        default_storage.delete(name)
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_untracked_file_removed(self):
+        name = 'recipes/images/legacy.png'
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as file:
+            file.write(IMAGE)
+        default_storage.delete(name)
+        self.assertFalse(default_storage.exists(name))
+
+
+class MediaReferencesTest(MediaRootMixin, APITestCase):
+    """Ссылки снимаются при замене изображения и удалении владельца."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+
+    def test_replaced_image_released_after_commit(self):
+        old_name = self.save()
+        recipe = create_recipe(self.author, image=old_name)
+        self.save()
+        recipe.image = self.save(b'new image')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertEqual(StoredFile.objects.get(name=old_name).refcount, 1)
+
+    def test_unchanged_image_kept(self):
+        name = self.save()
+        recipe = create_recipe(self.author, image=name)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            recipe.name = 'Другое название'
+            recipe.save()
+        self.assertEqual(callbacks, [])
+
+    def test_deleted_recipe_releases_image(self):
+        name = self.save()
+        recipe = create_recipe(self.author, image=name)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+
+class VerifyMediaTest(MediaRootMixin, APITestCase):
+    """Проверка файлов хранилища командой verify_media."""
+
+    def verify(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('verify_media', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_healthy(self):
+        self.save()
+        stdout, stderr = self.verify('--deep', '--strict')
+        self.assertIn('Проверено файлов: 1, с ошибками: 0', stdout)
+        self.assertEqual(stderr, '')
+
+    def test_problems_reported(self):
+        missing = self.save(b'missing')
+        resized = self.save(b'resized')
+        corrupted = self.save(b'corrupted')
+        os.remove(default_storage.path(missing))
+        with open(default_storage.path(resized), 'ab') as file:
+            file.write(b'!')
+        with open(default_storage.path(corrupted), 'wb') as file:
+            file.write(b'CORRUPTED')
+        _, stderr = self.verify()
+        self.assertIn(f'{missing}: файл отсутствует', stderr)
+        self.assertIn(f'{resized}: размер 8 вместо 7', stderr)
+        self.assertNotIn(corrupted, stderr)
+        _, stderr = self.verify('--deep')
+        self.assertIn(f'{corrupted}: хэш не совпадает', stderr)
+        with self.assertRaisesMessage(CommandError, 'с ошибками: 3'):
+            self.verify('--deep', '--strict')
+
+    def test_stale_incoming_removed(self):
+        incoming = default_storage.path(INCOMING_DIR)
+        os.makedirs(incoming)
+        stale, fresh = (
+            os.path.join(incoming, name) for name in ('stale', 'fresh')
+        )
+        for path in (stale, fresh):
+            open(path, 'wb').close()
+        old = time.time() - 2 * 60 * 60
+        os.utime(stale, (old, old))
+        self.verify()
+        self.assertEqual(os.listdir(incoming), ['fresh'])
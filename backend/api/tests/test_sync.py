@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+from recipes.changes import compact, current_token, horizon, record_changes
+from recipes.models import Favorite, RecipeChange
+
+from api.tests.base import APITestCase, create_recipe, create_user
+
+
+def settle(age=timedelta(minutes=1)):
+    """Состарить записи журнала, чтобы они стали видны клиентам."""
+    RecipeChange.objects.update(created=timezone.now() - age)
+
+
+class RecipeSyncTest(APITestCase):
+    """Синхронизация рецептов по журналу изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        settle()
+        self.token = current_token()
+
+    def sync(self, user=None, **params):
+        return self.client_for(user).get('/api/recipes/sync/', params)
+
+    def test_token_without_since(self):
+        response = self.sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'token': self.token, 'has_more': False,
+            'updated': [], 'deleted': [],
+        })
+
+    def test_updated_and_deleted(self):
+        other = create_recipe(self.author, 'Другой')
+        self.recipe.name = 'Новое название'
+        self.recipe.save()
+        other_pk = other.pk
+        other.delete()
+        settle()
+        response = self.sync(since=self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data['updated']],
+            ['Новое название']
+        )
+        self.assertEqual(response.data['deleted'], [other_pk])
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(
+            response.data['token'],
+            RecipeChange.objects.latest('id').id
+        )
+
+    def test_personal_changes_visible_to_owner(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        settle()
+        response = self.sync(self.reader, since=self.token)
+        self.assertTrue(response.data['updated'][0]['is_favorited'])
+        response = self.sync(self.author, since=self.token)
+        self.assertEqual(response.data['updated'], [])
+        # Токен сдвигается и за чужими записями.
+        self.assertGreater(response.data['token'], self.token)
+
+    def test_unsettled_changes_held_back(self):
+        record_changes([self.recipe.pk])
+        settle()
+        settled = RecipeChange.objects.latest('id').id
+        record_changes([self.recipe.pk])
+        response = self.sync(since=self.token)
+        self.assertEqual(len(response.data['updated']), 1)
+        self.assertEqual(response.data['token'], settled)
+        response = self.sync(since=settled)
+        self.assertEqual(response.data['updated'], [])
+        self.assertEqual(response.data['token'], settled)
+
+    def test_pages(self):
+        recipes = [
+            create_recipe(self.author, f'Рецепт {index}')
+            for index in range(3)
+        ]
+        settle()
+        response = self.sync(since=self.token, limit=2)
+        self.assertTrue(response.data['has_more'])
+        ids = [recipe['id'] for recipe in response.data['updated']]
+        response = self.sync(since=response.data['token'], limit=2)
+        self.assertFalse(response.data['has_more'])
+        ids += [recipe['id'] for recipe in response.data['updated']]
+        self.assertEqual(ids, [recipe.pk for recipe in recipes])
+
+    def test_invalid_params(self):
+        cases = ({'since': 'x'}, {'since': -1}, {'since': 0, 'limit': 0})
+        for params in cases:
+            with self.subTest(**params):
+                self.assertEqual(self.sync(**params).status_code, 400)
+
+    def test_expired_token(self):
+        record_changes([self.recipe.pk])
+        settle(timedelta(days=60))
+        compact(timedelta(days=30))
+        self.assertEqual(self.sync(since=self.token).status_code, 410)
+        response = self.sync(since=horizon())
+        self.assertEqual(response.status_code, 200)
+
+
+class CompactTest(APITestCase):
+    """Сжатие журнала изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(create_user('author'))
+
+    def test_superseded_records_removed(self):
+        RecipeChange.objects.all().delete()
+        record_changes([self.recipe.pk], user_id=self.user.pk)
+        record_changes([self.recipe.pk])
+        record_changes([self.recipe.pk], user_id=self.user.pk)
+        latest = list(RecipeChange.objects.order_by('id'))[1:]
+        self.assertEqual(compact(timedelta(days=30))[:2], (1, 0))
+        self.assertEqual(list(RecipeChange.objects.order_by('id')), latest)
+
+    def test_command(self):
+        settle(timedelta(days=10))
+        stdout = StringIO()
+        call_command(
+            'compact_recipe_changes', retention_days=5, stdout=stdout
+        )
+        self.assertFalse(RecipeChange.objects.exists())
+        self.assertIn(f'Граница журнала: {horizon()}', stdout.getvalue())
@@ -0,0 +1,186 @@
+import math
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from api import throttling
+from api.constants import (THROTTLE_BODY_BYTES_PER_TOKEN,
+                           THROTTLE_RECIPE_WRITE_COST, THROTTLE_ROWS_PER_TOKEN)
+from api.tests.base import APITestCase, create_user
+from api.throttling import TokenBucketStore, parse_rate, request_cost
+from api.views import RecipeViewSet
+
+
+class TokenBucketStoreTest(SimpleTestCase):
+    """Корзины жетонов в общем файле."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'throttle')
+        self.now = 1000.0
+        patcher = mock.patch(
+            'api.throttling.time.time', side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('120/min'), (120, 2))
+        self.assertEqual(parse_rate('10/s'), (10, 10))
+
+    def test_consume_and_refill(self):
+        store = TokenBucketStore(self.path, 16)
+        self.assertEqual(store.consume('a', 10, 1, 8), 0)
+        self.assertEqual(store.consume('a', 10, 1, 4), 2)
+        self.now += 2
+        self.assertEqual(store.consume('a', 10, 1, 4), 0)
+
+    def test_refund(self):
+        store = TokenBucketStore(self.path, 16)
+        store.consume('a', 10, 1, 10)
+        store.consume('a', 10, 1, -5)
+        self.assertEqual(store.consume('a', 10, 1, 5), 0)
+
+    def test_cost_above_capacity_rejected(self):
+        store = TokenBucketStore(self.path, 16)
+        self.assertEqual(store.consume('a', 10, 1, 11), math.inf)
+        # Отклоненный запрос не расходует жетоны.
+        self.assertEqual(store.consume('a', 10, 1, 10), 0)
+
+    def test_shared_between_processes(self):
+        TokenBucketStore(self.path, 16).consume('a', 10, 1, 10)
+        self.assertEqual(
+            TokenBucketStore(self.path, 16).consume('a', 10, 1, 1), 1
+        )
+
+    def test_oldest_slot_evicted(self):
+        store = TokenBucketStore(self.path, 1)
+        keys = [f'key-{index}' for index in range(9)]
+        for key in keys:
+            store.consume(key, 10, 1, 10)
+            self.now += 1
+        # Корзина первого ключа вытеснена и снова полна.
+        self.assertEqual(store.consume(keys[0], 10, 1, 10), 0)
+        self.assertGreater(store.consume(keys[-1], 10, 1, 10), 0)
+
+
+class RequestCostTest(SimpleTestCase):
+    """Стоимость запроса в жетонах."""
+
+    factory = APIRequestFactory()
+
+    def view(self, action, request):
+        view = RecipeViewSet()
+        view.action = action
+        view.request = request
+        return view
+
+    def test_action_cost(self):
+        request = self.factory.post('/api/recipes/')
+        self.assertEqual(
+            request_cost(request, self.view('create', request)),
+            THROTTLE_RECIPE_WRITE_COST
+        )
+
+    def test_body_size(self):
+        request = self.factory.post(
+            '/api/recipes/1/favorite/',
+            b'x' * THROTTLE_BODY_BYTES_PER_TOKEN * 2,
+            content_type='application/octet-stream'
+        )
+        self.assertEqual(
+            request_cost(request, self.view('favorite', request)), 3
+        )
+
+    def test_page_depth(self):
+        request = self.factory.get('/api/recipes/', {'page': 5, 'limit': 40})
+        request.query_params = request.GET
+        self.assertEqual(
+            request_cost(request, self.view('list', request)),
+            1 + 5 * 40 // THROTTLE_ROWS_PER_TOKEN
+        )
+
+    def test_page_size_capped(self):
+        request = self.factory.get(
+            '/api/recipes/', {'page': 1, 'limit': 100000}
+        )
+        request.query_params = request.GET
+        self.assertEqual(
+            request_cost(request, self.view('list', request)),
+            1 + 100 // THROTTLE_ROWS_PER_TOKEN
+        )
+
+
+class TokenBucketThrottleTest(APITestCase):
+    """Ограничение частоты запросов к API."""
+
+    def setUp(self):
+        # Корзины класса общие, а тестам нужны полные.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(throttling, 'buckets', TokenBucketStore(
+            os.path.join(directory.name, 'throttle'), settings.THROTTLE_SLOTS
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rates(self, **rates):
+        return override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                'ip': '1000/min', 'user': '1000/min', 'route': '1000/min',
+                **rates,
+            },
+        })
+
+    def test_route_limit(self):
+        with self.rates(route='2/min'):
+            for _ in range(2):
+                self.assertEqual(
+                    self.client.get('/api/tags/').status_code, 200
+                )
+            response = self.client.get('/api/tags/')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+            self.assertEqual(
+                self.client.get('/api/ingredients/').status_code, 200
+            )
+
+    def test_request_above_capacity_rejected(self):
+        with self.rates(route='3/min'):
+            response = self.client.get(
+                '/api/recipes/', {'page': 3, 'limit': 100}
+            )
+            self.assertEqual(response.status_code, 429)
+            self.assertNotIn('Retry-After', response)
+            self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+
+    def test_rejected_request_refunded(self):
+        with self.rates(ip='3/min', route='2/min'):
+            for _ in range(3):
+                self.client.get('/api/tags/')
+            # Третий запрос отклонен корзиной маршрута, и жетон IP вернулся.
+            self.assertEqual(
+                self.client.get('/api/ingredients/').status_code, 200
+            )
+            self.assertEqual(
+                self.client.get('/api/ingredients/').status_code, 429
+            )
+
+    def test_user_bucket(self):
+        first, second = create_user('first'), create_user('second')
+        with self.rates(user='1/min'):
+            self.assertEqual(
+                self.client_for(first).get('/api/tags/').status_code, 200
+            )
+            self.assertEqual(
+                self.client_for(first).get('/api/tags/').status_code, 429
+            )
+            self.assertEqual(
+                self.client_for(second).get('/api/tags/').status_code, 200
+            )
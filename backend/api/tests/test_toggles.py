@@ -0,0 +1,138 @@
+import threading
+from unittest import mock, skipUnless
+
+from django.db import IntegrityError, connection, connections, transaction
+from recipes.constants import (TRENDING_FAVORITE_WEIGHT,
+                               TRENDING_FOLLOW_WEIGHT,
+                               TRENDING_SHOPPING_CART_WEIGHT)
+from recipes.models import Favorite, Recipe, RecipeChange
+from recipes.toggles import add_link
+
+from api.serializers import RecipeMiniSerializer
+from api.tests.base import (APITestCase, APITransactionTestCase, create_recipe,
+                            create_user)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL')
+class ToggleSideEffectsTest(APITestCase):
+    """Переключатель меняет популярность и журнал ровно один раз."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.user = create_user('reader')
+        cls.recipe = create_recipe(cls.author)
+        cls.other_recipe = create_recipe(cls.author, name='Другой')
+
+    def setUp(self):
+        self.client = self.client_for(self.user)
+
+    def score(self, recipe):
+        return Recipe.objects.get(pk=recipe.pk).trending_score
+
+    def changes(self):
+        return RecipeChange.objects.filter(
+            recipe_id=self.recipe.pk, user_id=self.user.pk
+        ).count()
+
+    def check_recipe_toggle(self, action, weight):
+        url = f'/api/recipes/{self.recipe.pk}/{action}/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertAlmostEqual(self.score(self.recipe), weight, places=3)
+        self.assertEqual(self.changes(), 1)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertAlmostEqual(self.score(self.recipe), weight, places=3)
+        self.assertEqual(self.changes(), 1)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.changes(), 2)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.changes(), 2)
+        self.assertAlmostEqual(self.score(self.recipe), weight, places=3)
+
+    def test_favorite(self):
+        self.check_recipe_toggle('favorite', TRENDING_FAVORITE_WEIGHT)
+
+    def test_shopping_cart(self):
+        self.check_recipe_toggle(
+            'shopping_cart', TRENDING_SHOPPING_CART_WEIGHT
+        )
+
+    def test_follow_bumps_each_author_recipe_once(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        for recipe in (self.recipe, self.other_recipe):
+            self.assertAlmostEqual(
+                self.score(recipe), TRENDING_FOLLOW_WEIGHT, places=3
+            )
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+    def test_response_contains_requested_fields(self):
+        response = self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(
+            set(response.data), set(RecipeMiniSerializer.Meta.fields)
+        )
+        self.assertEqual(response.data['name'], self.recipe.name)
+
+    def test_invalid_subscriptions(self):
+        url = f'/api/users/{self.user.pk}/subscribe/'
+        self.assertEqual(self.client.post(url).status_code, 400)
+        for user_id in ('0', 'abc'):
+            with self.subTest(user_id=user_id):
+                url = f'/api/users/{user_id}/subscribe/'
+                self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_missing_recipe(self):
+        response = self.client.post('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.delete('/api/recipes/0/favorite/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_insert_keeps_outer_transaction(self):
+        with transaction.atomic():
+            with mock.patch.object(
+                connection, 'check_constraints', side_effect=IntegrityError
+            ):
+                result = add_link(Favorite, self.user, self.recipe.pk, ())
+            self.assertEqual(result, (None, False))
+            self.assertFalse(Favorite.objects.exists())
+        self.assertEqual(self.changes(), 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL')
+class ToggleRaceTest(APITransactionTestCase):
+    """Одновременные добавления создают одну связь."""
+
+    def test_concurrent_add(self):
+        user = create_user('reader')
+        recipe = create_recipe(create_user('author'))
+        barrier = threading.Barrier(4)
+        results = []
+
+        def add():
+            try:
+                barrier.wait()
+                results.append(add_link(Favorite, user, recipe.pk, ('name',)))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(created for _, created in results),
+            [False, False, False, True]
+        )
+        # Повтор в гонке не считается ошибкой и возвращает рецепт.
+        self.assertEqual({obj.pk for obj, _ in results}, {recipe.pk})
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.assertEqual(
+            RecipeChange.objects.filter(user_id=user.pk).count(), 1
+        )
@@ -0,0 +1,78 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from recipes.constants import TRENDING_HALF_LIFE, TRENDING_MIN_SCORE
+from recipes.models import Recipe, TrendingState
+from recipes.trending import TRENDING_STATE_ID, bump_recipe, renormalize
+
+from api.tests.base import APITestCase, create_recipe, create_user
+
+
+class TrendingTest(APITestCase):
+    """Затухающая популярность рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipes = [
+            create_recipe(cls.author, name=f'Рецепт {index}')
+            for index in range(3)
+        ]
+
+    def set_epoch(self, epoch):
+        TrendingState.objects.update_or_create(
+            pk=TRENDING_STATE_ID, defaults={'epoch': epoch}
+        )
+
+    def score(self, recipe):
+        return Recipe.objects.get(pk=recipe.pk).trending_score
+
+    def test_later_events_weigh_more(self):
+        now = time.time()
+        self.set_epoch(now - TRENDING_HALF_LIFE)
+        with mock.patch('recipes.trending.time.time', return_value=now):
+            bump_recipe(self.recipes[0].pk, 3)
+        self.assertAlmostEqual(self.score(self.recipes[0]), 6, places=3)
+
+    def test_renormalize_keeps_order_and_decays(self):
+        now = time.time()
+        self.set_epoch(now - 2 * TRENDING_HALF_LIFE)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(trending_score=8)
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(trending_score=4)
+        Recipe.objects.filter(pk=self.recipes[2].pk).update(
+            trending_score=TRENDING_MIN_SCORE
+        )
+        with mock.patch('recipes.trending.time.time', return_value=now):
+            renormalize()
+        self.assertAlmostEqual(self.score(self.recipes[0]), 2, places=3)
+        self.assertAlmostEqual(self.score(self.recipes[1]), 1, places=3)
+        self.assertEqual(self.score(self.recipes[2]), 0)
+        self.assertAlmostEqual(
+            TrendingState.objects.get(pk=TRENDING_STATE_ID).epoch, now
+        )
+
+    def test_renormalize_command_creates_state(self):
+        TrendingState.objects.all().delete()
+        call_command('renormalize_trending', stdout=StringIO())
+        self.assertTrue(
+            TrendingState.objects.filter(pk=TRENDING_STATE_ID).exists()
+        )
+
+    def test_trending_ordering(self):
+        for recipe, score in zip(self.recipes, (1, 5, 3)):
+            Recipe.objects.filter(pk=recipe.pk).update(trending_score=score)
+        response = self.client_for().get(
+            '/api/recipes/', {'ordering': 'trending'}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipes[1].pk, self.recipes[2].pk, self.recipes[0].pk]
+        )
+
+    def test_unknown_ordering_is_rejected(self):
+        response = self.client_for().get(
+            '/api/recipes/', {'ordering': 'name'}
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+import json
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from recipes.catalog import catalog
+from recipes.models import Recipe
+
+from api.tests.base import (APITestCase, MediaRootMixin, create_catalog,
+                            create_user, png, png_data_uri)
+
+
+def upload(content, name='image.png'):
+    return SimpleUploadedFile(name, content)
+
+
+class ImageUploadTest(MediaRootMixin, APITestCase):
+    """Загрузка изображений multipart и base64 с ограничением размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.admin = create_user('admin', is_staff=True, is_superuser=True)
+        tags, ingredients = create_catalog(tags=1, ingredients=1)
+        cls.fields = {
+            'name': 'Суп',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tags[0].pk],
+            'ingredients': [{'id': ingredients[0].pk, 'amount': 10}],
+        }
+
+    def setUp(self):
+        super().setUp()
+        catalog.reload()
+
+    def post_multipart(self, image, data=None):
+        return self.client_for(self.author).post('/api/recipes/', {
+            'image': image,
+            'data': json.dumps(self.fields) if data is None else data,
+        }, format='multipart')
+
+    def test_multipart_recipe(self):
+        response = self.post_multipart(upload(png((4, 3))))
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(name='Суп')
+        self.assertEqual(recipe.ingredients.count(), 1)
+        with Image.open(recipe.image.path) as image:
+            self.assertEqual(image.size, (4, 3))
+
+    def test_multipart_avatar(self):
+        response = self.client_for(self.author).put(
+            '/api/users/me/avatar/', {'avatar': upload(png())},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.author.refresh_from_db()
+        self.assertTrue(self.author.avatar)
+
+    def test_invalid_data_part(self):
+        for data in ('{', '[]'):
+            with self.subTest(data=data):
+                response = self.post_multipart(upload(png()), data)
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=64)
+    def test_multipart_too_large(self):
+        response = self.post_multipart(upload(png((64, 64))))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=64)
+    def test_base64_too_large(self):
+        response = self.client_for(self.author).post('/api/recipes/', {
+            **self.fields, 'image': png_data_uri((64, 64)),
+        }, format='json')
+        self.assertEqual(response.status_code, 413)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=64)
+    def test_admin_upload_too_large(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            '/admin/recipes/recipe/add/', {'image': upload(png((64, 64)))}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(IMAGE_MAX_DIMENSION=10)
+    def test_dimension_limit(self):
+        response = self.post_multipart(upload(png((11, 5))))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_not_an_image(self):
+        response = self.post_multipart(upload(b'not an image'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_unsupported_format(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, 'BMP')
+        response = self.post_multipart(upload(buffer.getvalue(), 'image.bmp'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
@@ -0,0 +1,197 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from api.constants import (THROTTLE_BODY_BYTES_PER_TOKEN,
+                           THROTTLE_DEFAULT_COST, THROTTLE_PROBES,
+                           THROTTLE_ROWS_PER_TOKEN)
+from api.metrics import registry
+
+# Ячейка таблицы: хэш ключа, число жетонов и время последнего обновления.
+SLOT = struct.Struct('Qdd')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Емкость и скорость пополнения корзины из строки вида 120/min."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """Корзины жетонов в отображенном в память файле, общие для процессов.
+
+    Файл — хэш-таблица фиксированного размера с линейным пробированием
+    в пределах THROTTLE_PROBES соседних ячеек, которые блокируются на
+    время изменения. Если все они заняты другими ключами, вытесняется
+    ячейка, дольше всех не обновлявшаяся: ее владелец получает полную
+    корзину, что безопасно для ограничения частоты.
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self.size = (slots + THROTTLE_PROBES) * SLOT.size
+        self._fd = None
+        self._mmap = None
+        # Блокировки fcntl действуют на процесс, а не на поток.
+        self._lock = threading.Lock()
+
+    def _map(self):
+        if self._mmap is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            self._mmap = mmap.mmap(fd, self.size)
+            self._fd = fd
+        return self._mmap
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def consume(self, key, capacity, rate, cost):
+        """Списать cost жетонов; вернуть 0 или время ожидания в секундах.
+
+        Отрицательная стоимость возвращает жетоны в корзину. Запрос дороже
+        емкости корзины не пройдет и при полной корзине, поэтому он
+        отклоняется без списания, и возвращается math.inf.
+        """
+        if cost > capacity:
+            return math.inf
+        buffer = self._map()
+        key_hash = self._hash(key)
+        start = key_hash % self.slots * SLOT.size
+        length = THROTTLE_PROBES * SLOT.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                now = time.time()
+                offset, tokens, updated = self._find(
+                    buffer, start, key_hash, capacity, now
+                )
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                wait = 0.0
+                if tokens >= cost:
+                    tokens = min(capacity, tokens - cost)
+                else:
+                    wait = (cost - tokens) / rate
+                SLOT.pack_into(buffer, offset, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        return wait
+
+    @staticmethod
+    def _find(buffer, start, key_hash, capacity, now):
+        """Ячейка ключа с ее состоянием или новая ячейка с полной корзиной."""
+        oldest = None
+        for index in range(THROTTLE_PROBES):
+            offset = start + index * SLOT.size
+            slot_hash, tokens, updated = SLOT.unpack_from(buffer, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, updated
+            if slot_hash == 0:
+                return offset, capacity, now
+            if oldest is None or updated < oldest[1]:
+                oldest = (offset, updated)
+        return oldest[0], capacity, now
+
+
+buckets = TokenBucketStore(settings.THROTTLE_STATE_PATH,
+                           settings.THROTTLE_SLOTS)
+
+
+def request_cost(request, view):
+    """Стоимость запроса в жетонах.
+
+    Базовая стоимость действия берется из throttle_costs представления;
+    к ней добавляется плата за размер тела запроса и за глубину страницы
+    в постраничных списках.
+    """
+    action = getattr(view, 'action', None) or request.method.lower()
+    cost = getattr(view, 'throttle_costs', {}).get(
+        action, THROTTLE_DEFAULT_COST
+    )
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    cost += length // THROTTLE_BODY_BYTES_PER_TOKEN
+    paginator = getattr(view, 'paginator', None)
+    if action == 'list' and paginator is not None:
+        try:
+            page = int(request.query_params.get('page', 1))
+            limit = int(request.query_params.get(
+                getattr(paginator, 'page_size_query_param', None) or 'limit',
+                paginator.page_size or 0
+            ))
+        except (TypeError, ValueError):
+            page, limit = 1, 0
+        max_page_size = getattr(paginator, 'max_page_size', None)
+        if max_page_size:
+            limit = min(limit, max_page_size)
+        cost += max(page, 1) * max(limit, 0) // THROTTLE_ROWS_PER_TOKEN
+    return cost
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов корзинами жетонов.
+
+    Запрос списывает свою стоимость из корзины IP-адреса, корзины
+    пользователя и корзины маршрута для этого клиента. Емкость и скорость
+    пополнения задаются в DEFAULT_THROTTLE_RATES под ключами ip, user и
+    route. Если жетонов не хватает в любой корзине, списанное возвращается,
+    а клиент получает 429 с Retry-After.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_buckets(self, request, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        ident = self.get_ident(request)
+        client = f'ip:{ident}'
+        result = [(client, rates['ip'])]
+        if request.user and request.user.is_authenticated:
+            client = f'user:{request.user.pk}'
+            result.append((client, rates['user']))
+        route = getattr(request, 'metrics_route', view.__class__.__name__)
+        result.append((f'route:{route}:{client}', rates['route']))
+        return route, result
+
+    def allow_request(self, request, view):
+        cost = request_cost(request, view)
+        route, bucket_rates = self.get_buckets(request, view)
+        consumed = []
+        for key, rate in bucket_rates:
+            capacity, refill = parse_rate(rate)
+            wait = buckets.consume(key, capacity, refill, cost)
+            if wait:
+                for refund in consumed:
+                    buckets.consume(*refund, -cost)
+                self.wait_seconds = wait
+                registry.inc(
+                    'foodgram_throttled_total',
+                    route=route,
+                    bucket=key.split(':', 1)[0]
+                )
+                return False
+            consumed.append((key, capacity, refill))
+        return True
+
+    def wait(self):
+        if not self.wait_seconds or math.isinf(self.wait_seconds):
+            return None
+        return math.ceil(self.wait_seconds)
@@ -0,0 +1,99 @@
+import json
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig, ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+from api.constants import IMAGE_UPLOAD_FORMATS
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Размер изображения превышает допустимый.'
+    default_code = 'upload_too_large'
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемые файлы во временные файлы по частям.
+
+    Загрузка обрывается, как только прочитано больше
+    IMAGE_UPLOAD_MAX_SIZE байт файла, не дожидаясь конца тела запроса.
+    Обработчик подключен глобально, поэтому бросает исключение Django:
+    представления вне API, например админка, отвечают на него 400, а
+    MultiPartJSONParser превращает его в 413.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise RequestDataTooBig(UploadTooLarge.default_detail)
+        return super().receive_data_chunk(raw_data, start)
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data, в котором поля, кроме файлов, переданы JSON.
+
+    JSON передается частью data, файлы — отдельными частями с именами
+    полей. Без части data запрос разбирается как обычная форма.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            result = super().parse(stream, media_type, parser_context)
+        except RequestDataTooBig:
+            raise UploadTooLarge
+        if 'data' not in result.data:
+            return result
+        try:
+            data = json.loads(result.data['data'])
+        except ValueError as exc:
+            raise ParseError(f'Часть data содержит некорректный JSON: {exc}')
+        if not isinstance(data, dict):
+            raise ParseError('Часть data должна содержать JSON-объект.')
+        # Request объединяет data и files через dict.update, который у
+        # MultiValueDict взял бы списки значений вместо файлов.
+        return DataAndFiles(data, result.files.dict())
+
+
+class HeaderImageField(forms.ImageField):
+    """Поле формы, проверяющее изображение только по заголовку.
+
+    Image.open читает формат и размеры без декодирования пикселей, а
+    загруженный во временный файл образ открывается по пути, поэтому
+    проверка не держит изображение в памяти.
+    """
+
+    def to_python(self, data):
+        file = forms.FileField.to_python(self, data)
+        if file is None:
+            return None
+        if hasattr(data, 'temporary_file_path'):
+            source = data.temporary_file_path()
+        else:
+            data.seek(0)
+            source = data
+        try:
+            with Image.open(source) as image:
+                image_format, size = image.format, image.size
+        except Exception as exc:
+            raise ValidationError(
+                self.error_messages['invalid_image'], code='invalid_image'
+            ) from exc
+        if image_format not in IMAGE_UPLOAD_FORMATS:
+            raise ValidationError(
+                self.error_messages['invalid_image'], code='invalid_image'
+            )
+        if max(size) > settings.IMAGE_MAX_DIMENSION:
+            raise ValidationError(
+                'Сторона изображения должна быть не больше '
+                f'{settings.IMAGE_MAX_DIMENSION} пикселей.',
+                code='image_too_large'
+            )
+        file.content_type = Image.MIME.get(image_format)
+        file.seek(0)
+        return file
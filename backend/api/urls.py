@@ -1,7 +1,7 @@
 from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet, recipe_by_short_link)
+from api.views import (BatchView, CustomUserViewSet, IngredientViewSet,
+                       RecipeViewSet, TagViewSet, recipe_by_short_link)
 
 app_name = 'api'
 
@@ -13,6 +13,7 @@ router_v1.register('users', CustomUserViewSet, basename='users')
 
 urlpatterns = [
     path('', include(router_v1.urls)),
+    path('batch/', BatchView.as_view()),
     path('auth/', include('djoser.urls.authtoken')),
-    re_path(r'^s/(?P<short_link>[а-яёА-ЯЁ\-]+)/$', recipe_by_short_link),
+    re_path(r'^s/(?P<short_link>[\w-]+)/$', recipe_by_short_link),
 ]
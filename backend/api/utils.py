@@ -1,21 +1,58 @@
 import uuid
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
 import base64
+from api.uploads import HeaderImageField, UploadTooLarge
 
 
 class Base64ImageField(serializers.ImageField):
+    """Изображение строкой data:image/...;base64 или загруженным файлом.
+
+    Изображение проверяется только по заголовку, а размер строки base64
+    проверяется до декодирования.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('_DjangoImageField', HeaderImageField)
+        super().__init__(**kwargs)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
+            if len(imgstr) * 3 // 4 > settings.IMAGE_UPLOAD_MAX_SIZE:
+                raise UploadTooLarge
             ext = format.split('/')[-1]
             id = uuid.uuid4()
             data = ContentFile(base64.b64decode(imgstr), name=f"{id}.{ext}")
         return super().to_internal_value(data)
 
 
+class CatalogRelatedField(serializers.PrimaryKeyRelatedField):
+    """Связь по первичному ключу, проверяемая по справочнику в памяти.
+
+    lookup возвращает объект по id или None, если объекта нет.
+    """
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.lookup(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
 def generate_shopping_cart(ingredients):
     shopping_cart = []
     for ingredient in ingredients:
@@ -1,36 +1,55 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import router
 from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from recipes.changes import ChangeTokenExpired, changes_since, current_token
+from recipes.export import EXPORT_CONTENT_TYPES, EXPORTERS, iter_recipes
 from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
-                            Tag)
+                            ShortLinkAlias, Tag)
+from recipes.toggles import add_link, remove_link
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from api.batch import run_batch
+from api.cache import TieredCache
+from api.constants import (BATCH_READ_METHODS, RECIPE_BULK_MAX_IDS,
+                           SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE,
+                           THROTTLE_RECIPE_WRITE_COST,
+                           THROTTLE_REGISTRATION_COST,
+                           THROTTLE_SHOPPING_CART_DOWNLOAD_COST)
+from api.fieldsets import get_fieldset
 from api.filters import IngredientFilter, RecipeFilter
 from api.pagination import CustomPagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (ChangePasswordSerializer, CreateUserSerializer,
-                             FavoriteSerializer, FollowSerializer,
-                             IngredientSerializer, RecipeCreateSerializer,
-                             RecipeIngredient, RecipeSerializer,
-                             ShoppingCartSerializer, TagSerializer,
-                             UserFollowSerializer, UserSerializer)
+from api.serializers import (BatchSerializer, ChangePasswordSerializer,
+                             CreateUserSerializer, IngredientSerializer,
+                             RecipeCreateSerializer, RecipeIngredient,
+                             RecipeMiniSerializer, RecipeSerializer,
+                             TagSerializer, UserFollowSerializer,
+                             UserSerializer)
 from api.utils import generate_shopping_cart
 
 User = get_user_model()
 
+short_links = TieredCache(
+    'short-link', settings.SHORT_LINK_CACHE_SIZE, settings.SHORT_LINK_CACHE_TTL
+)
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet для тэгов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    replica_reads = True
+    admission_class = 'read'
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -40,6 +59,8 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    replica_reads = True
+    admission_class = 'read'
 
 
 class CustomUserViewSet(UserViewSet):
@@ -49,6 +70,13 @@ class CustomUserViewSet(UserViewSet):
     pagination_class = CustomPagination
     http_method_names = ('get', 'post', 'delete', 'head', 'put')
     pk_url_kwarg = 'id'
+    replica_reads = True
+    throttle_costs = {'create': THROTTLE_REGISTRATION_COST}
+    admission_classes = {
+        'create': 'heavy',
+        'avatar': 'heavy',
+        'subscriptions': 'heavy',
+    }
 
     def get_permission(self):
         if self.action == 'me':
@@ -98,7 +126,6 @@ class CustomUserViewSet(UserViewSet):
         if not user.avatar:
             return Response({'error': 'Аватар не найден.'},
                             status=status.HTTP_400_BAD_REQUEST)
-        user.avatar.delete(save=True)
         user.avatar = None
         user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -119,31 +146,35 @@ class CustomUserViewSet(UserViewSet):
             permission_classes=(IsAuthenticated,))
     def subscribe(self, request, id):
         """Подписаться на автора."""
-        user = request.user
-        following = get_object_or_404(User, id=id)
-        if request.user == following:
+        try:
+            following_id = int(id)
+        except ValueError:
+            raise Http404
+        if following_id == request.user.pk:
             return Response({
                 'detail': 'Вы не можете подписаться на самого себя.'
             }, status=status.HTTP_400_BAD_REQUEST)
-        if Follow.objects.filter(user=user, following=following).exists():
+        following, created = add_link(
+            Follow, request.user, following_id,
+            UserFollowSerializer.Meta.fields
+        )
+        if following is None:
+            raise Http404
+        if not created:
             return Response({
                 'detail': 'Вы уже подписаны на этого пользователя.'
             }, status=status.HTTP_400_BAD_REQUEST)
-        new_follow = Follow.objects.create(user=user, following=following)
-        serializer = FollowSerializer(
-            new_follow, context={'request': request})
+        serializer = UserFollowSerializer(
+            following, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
         """Отменить подписку."""
-        following = get_object_or_404(User, pk=id)
-        follow = Follow.objects.filter(
-            user=request.user,
-            following=following
-        )
-        if follow.exists():
-            follow.delete()
+        found, deleted = remove_link(Follow, request.user, id)
+        if not found:
+            raise Http404
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -169,6 +200,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    replica_reads = True
+    throttle_costs = {
+        'create': THROTTLE_RECIPE_WRITE_COST,
+        'update': THROTTLE_RECIPE_WRITE_COST,
+        'partial_update': THROTTLE_RECIPE_WRITE_COST,
+        'download_shopping_cart': THROTTLE_SHOPPING_CART_DOWNLOAD_COST,
+    }
+    admission_classes = {
+        'create': 'heavy',
+        'update': 'heavy',
+        'partial_update': 'heavy',
+        'download_shopping_cart': 'heavy',
+        'export': 'heavy',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = get_fieldset(self.request, RecipeSerializer)
+        if fieldset is not None and 'text' not in fieldset:
+            queryset = queryset.defer('text')
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -202,30 +254,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk=None):
         """Добавить рецепт в список покупок."""
-        recipe = self.get_object()
-        if ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
+        recipe, created = add_link(
+            ShoppingCart, request.user, pk, RecipeMiniSerializer.Meta.fields
+        )
+        if recipe is None:
+            raise Http404
+        if not created:
             return Response({
                 'detail': 'Recipe already in shopping cart.'
             }, status=status.HTTP_400_BAD_REQUEST)
-        shopping_cart = ShoppingCart.objects.create(
-            user=request.user, recipe=recipe
-        )
-        serializer = ShoppingCartSerializer(
-            shopping_cart, context={'request': request}
+        serializer = RecipeMiniSerializer(
+            recipe, context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request, pk=None):
         """Удалить рецепт из списка покупок."""
-        recipe = self.get_object()
-        shopping_cart = ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        )
-        if shopping_cart.exists():
-            shopping_cart.delete()
+        found, deleted = remove_link(ShoppingCart, request.user, pk)
+        if not found:
+            raise Http404
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({
             'detail': 'Recipe not found in shopping cart.'
@@ -245,37 +294,175 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response['Content-Disposition'] = 'attachment; filename="shopping.txt"'
         return response
 
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """Рецепты по списку id из параметра ids в порядке запроса.
+
+        Рецепты загружаются одним запросом, id ненайденных рецептов
+        перечисляются в missing.
+        """
+        raw_ids = request.query_params.get('ids', '')
+        try:
+            ids = [int(pk) for pk in raw_ids.split(',')]
+        except ValueError:
+            ids = []
+        if not ids or min(ids) < 1:
+            return Response({
+                'detail': 'ids должен содержать id рецептов через запятую.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > RECIPE_BULK_MAX_IDS:
+            return Response({
+                'detail': f'Можно запросить не больше {RECIPE_BULK_MAX_IDS} '
+                          'рецептов.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        recipes = self.get_queryset().in_bulk(ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in recipes],
+        })
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Рецепты, созданные, измененные и удаленные после токена since.
+
+        Без since возвращает только текущий токен: клиент запоминает его,
+        загружает список рецептов и дальше запрашивает изменения от него.
+        """
+        if 'since' not in request.query_params:
+            return Response({
+                'token': current_token(),
+                'has_more': False,
+                'updated': [],
+                'deleted': [],
+            })
+        try:
+            since = int(request.query_params['since'])
+            limit = int(request.query_params.get('limit', SYNC_PAGE_SIZE))
+        except ValueError:
+            since = limit = -1
+        if since < 0 or limit < 1:
+            return Response({
+                'detail': 'since и limit должны быть неотрицательными '
+                          'целыми числами, limit больше нуля.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            recipe_ids, token, has_more = changes_since(
+                since, min(limit, SYNC_MAX_PAGE_SIZE), request.user
+            )
+        except ChangeTokenExpired:
+            return Response({
+                'detail': 'Токен устарел, загрузите рецепты заново.'
+            }, status=status.HTTP_410_GONE)
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return Response({
+            'token': token,
+            'has_more': has_more,
+            'updated': serializer.data,
+            'deleted': [pk for pk in recipe_ids if pk not in recipes],
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=(IsAdminUser,))
+    def export(self, request):
+        """Потоковая выгрузка всех рецептов в NDJSON или CSV."""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORTERS:
+            return Response({
+                'detail': f'Допустимые форматы: {", ".join(EXPORTERS)}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        # Выгрузка читается уже после выхода из представления, поэтому
+        # база для чтения выбирается заранее.
+        recipes = iter_recipes(using=router.db_for_read(Recipe))
+        response = StreamingHttpResponse(
+            EXPORTERS[output](recipes),
+            content_type=EXPORT_CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{output}"'
+        )
+        return response
+
     @action(
         methods=['post'],
         detail=True,
         permission_classes=(IsAuthenticated,)
     )
     def favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        serializer = FavoriteSerializer(
-            data={
-                'recipe': recipe.id,
-                'user': request.user.id
-            },
-            context={'request': request}
+        recipe, created = add_link(
+            Favorite, request.user, pk, RecipeMiniSerializer.Meta.fields
+        )
+        if recipe is None:
+            raise Http404
+        if not created:
+            return Response({
+                'non_field_errors': ['Рецепт уже в избранном.']
+            }, status=status.HTTP_400_BAD_REQUEST)
+        serializer = RecipeMiniSerializer(
+            recipe, context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
-        recipe = self.get_object()
-        favorite = Favorite.objects.filter(
-            user=request.user, recipe=recipe
-        )
-        if favorite.exists():
-            favorite.delete()
+        found, deleted = remove_link(Favorite, request.user, pk)
+        if not found:
+            raise Http404
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+class BatchView(APIView):
+    """Несколько запросов к API за один вызов с одной аутентификацией.
+
+    Сам пакет не занимает слот допуска: слоты занимают вложенные запросы,
+    и каждый из них расходует жетоны ограничения частоты.
+    """
+    batchable = False
+    admission_class = None
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+        results = run_batch(request, items)
+        request._request.stick_to_primary = any(
+            item['method'] not in BATCH_READ_METHODS
+            and result['status'] < 500
+            for item, result in zip(items, results)
+        )
+        return Response(results)
+
+
+def resolve_short_link(short_link):
+    """Найти id рецепта по короткой ссылке или ее прежнему варианту."""
+    recipe_id = short_links.get(short_link)
+    if recipe_id is not None:
+        return recipe_id
+    recipe_id = Recipe.objects.filter(
+        short_link=short_link
+    ).values_list('pk', flat=True).first()
+    if recipe_id is None:
+        recipe_id = ShortLinkAlias.objects.filter(
+            slug=short_link
+        ).values_list('recipe_id', flat=True).first()
+    if recipe_id is None:
+        raise Http404
+    short_links.set(short_link, recipe_id)
+    return recipe_id
+
+
 def recipe_by_short_link(request, short_link):
     """Редирект с короткой ссылки на рецепт."""
-    recipe = get_object_or_404(Recipe.objects, short_link=short_link)
-    return redirect(f'http://{settings.DOMAIN}/api/recipes/{recipe.pk}')
+    recipe_id = resolve_short_link(short_link)
+    return redirect(f'http://{settings.DOMAIN}/api/recipes/{recipe_id}')
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
@@ -17,6 +18,10 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', default='test.com').split(',')
 DOMAIN = os.getenv('DOMAIN', default='test.com')
 
 IMPORT_FOLDER = os.path.join(BASE_DIR, 'data')
+
+SHARED_STATE_DIR = os.getenv(
+    'SHARED_STATE_DIR', os.path.join(tempfile.gettempdir(), 'foodgram')
+)
 # Application definition
 
 INSTALLED_APPS = [
@@ -37,6 +42,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.AdmissionControlMiddleware',
+    'api.middleware.SlowQueryMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'api.middleware.IdentityMapMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +91,130 @@ DATABASES = {
     }
 }
 
+if os.getenv('USE_SQLITE', default='false').lower() in ('true', '1'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+
+# Реплики для чтения: хосты PostgreSQL (host[:port]) или, при USE_SQLITE,
+# имена файлов SQLite относительно BASE_DIR, через запятую.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(os.getenv('DB_REPLICAS', '').split(',')):
+    replica = replica.strip()
+    if not replica:
+        continue
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = BASE_DIR / replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 2))
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 15))
+REPLICA_STICKY_COOKIE = 'primary_until'
+REPLICA_STICKY_HEADER = 'X-Primary-Until'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.getenv('SHARED_CACHE_BACKEND'):
+    CACHES['shared'] = {
+        'BACKEND': os.getenv('SHARED_CACHE_BACKEND'),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', ''),
+    }
+
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 5))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 600))
+
+RECIPE_FRAGMENT_CACHE_SIZE = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_SIZE', 5000)
+)
+RECIPE_FRAGMENT_CACHE_TTL = int(os.getenv('RECIPE_FRAGMENT_CACHE_TTL', 3600))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(SHARED_STATE_DIR, 'metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+THROTTLE_STATE_PATH = os.getenv(
+    'THROTTLE_STATE_PATH', os.path.join(SHARED_STATE_DIR, 'throttle')
+)
+THROTTLE_SLOTS = int(os.getenv('THROTTLE_SLOTS', 65536))
+
+# Классы допуска: (одновременно выполняемых, ожидающих в очереди) на узел.
+ADMISSION_DIR = os.getenv(
+    'ADMISSION_DIR', os.path.join(SHARED_STATE_DIR, 'admission')
+)
+ADMISSION_LIMITS = {
+    'read': (
+        int(os.getenv('ADMISSION_READ_CONCURRENCY', 8)),
+        int(os.getenv('ADMISSION_READ_QUEUE', 32)),
+    ),
+    'default': (
+        int(os.getenv('ADMISSION_DEFAULT_CONCURRENCY', 6)),
+        int(os.getenv('ADMISSION_DEFAULT_QUEUE', 12)),
+    ),
+    'heavy': (
+        int(os.getenv('ADMISSION_HEAVY_CONCURRENCY', 2)),
+        int(os.getenv('ADMISSION_HEAVY_QUEUE', 4)),
+    ),
+}
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 5))
+
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 10))
+BATCH_MAX_COST = int(os.getenv('BATCH_MAX_COST', 20))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 100))
+
+LOG_DIR = os.getenv('LOG_DIR', os.path.join(BASE_DIR, 'logs'))
+os.makedirs(LOG_DIR, exist_ok=True)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(message)s',
+        },
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOG_DIR, 'slow_queries.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': 'plain',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'foodgram.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -115,6 +249,15 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+DEFAULT_FILE_STORAGE = 'api.storage.ContentAddressedStorage'
+
+# Загружаемые файлы сразу пишутся во временные файлы, а не в память.
+FILE_UPLOAD_HANDLERS = ['api.uploads.LimitedTemporaryFileUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 8000))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CystomUser'
@@ -124,10 +267,31 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+        # Первым должен оставаться класс с заголовком WWW-Authenticate,
+        # иначе отказы 401 станут 403.
+        'api.authentication.BatchAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.instrumentation.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'api.uploads.MultiPartJSONParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': os.getenv('THROTTLE_IP_RATE', '600/min'),
+        'user': os.getenv('THROTTLE_USER_RATE', '300/min'),
+        'route': os.getenv('THROTTLE_ROUTE_RATE', '120/min'),
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
 DJOSER = {
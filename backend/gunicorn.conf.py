@@ -0,0 +1,34 @@
+import gc
+import glob
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:7000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+# Приложение загружается в мастере один раз, воркеры получают его через fork.
+preload_app = os.getenv(
+    'GUNICORN_PRELOAD', default='true'
+).lower() in ('true', '1')
+warm_catalogs = os.getenv(
+    'GUNICORN_WARM_CATALOGS', default='true'
+).lower() in ('true', '1')
+
+
+def on_starting(server):
+    """Удалить снимки метрик процессов прошлого запуска."""
+    from django.conf import settings
+
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from api.startup import warm_up
+
+    warm_up(catalogs=warm_catalogs)
+    # Объекты мастера переносятся в постоянное поколение: сборщик мусора
+    # воркеров не обходит их и не копирует страницы, где они лежат.
+    gc.freeze()
@@ -1,8 +1,74 @@
 from django import forms
 from django.contrib import admin
 from django.contrib.admin import display
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Left
+from django.utils.functional import cached_property
+from recipes.constants import (ADMIN_COUNT_ESTIMATE_THRESHOLD,
+                               ADMIN_TEXT_PREVIEW_LENGTH)
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Tag)
+from recipes.signals import touch_recipes
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий число строк большой таблицы из статистики.
+
+    Для списков без фильтров на PostgreSQL вместо COUNT(*) используется
+    оценка планировщика, если она больше порога; на небольших таблицах и
+    при поиске число строк считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Настройки списка для таблиц с миллионами строк."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с текстовым полем вместо списка всех значений."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (name, value)
+            for name, value in changelist.params.items()
+            if name not in (self.parameter_name, PAGE_VAR)
+        )
+        yield all_choice
+
+
+class RecipeNameFilter(InputFilter):
+    title = 'началу названия рецепта'
+    parameter_name = 'recipe_name'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(recipe__name__startswith=self.value())
+        return queryset
 
 
 class IngredientsInRecipeInlineFormset(forms.models.BaseInlineFormSet):
@@ -23,26 +89,60 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     formset = IngredientsInRecipeInlineFormset
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredient')
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         'author',
         'name',
-        'text',
+        'short_text',
         'cooking_time',
         'image',
         'short_link',
         'added_in_favorites'
     )
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
     list_filter = ('tags',)
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline,)
 
-    @display(description='Количество в избранных')
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match.url_name != 'recipes_recipe_changelist':
+            return queryset
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(count=Count('pk'))
+        return queryset.defer('text').annotate(
+            text_preview=Left('text', ADMIN_TEXT_PREVIEW_LENGTH),
+            favorites_count=Coalesce(
+                Subquery(favorites.values('count')), 0,
+                output_field=IntegerField()
+            )
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            # Ингредиенты и теги сохраняются после рецепта.
+            touch_recipes(Recipe.objects.filter(pk=form.instance.pk))
+
+    @display(description='Описание рецепта')
+    def short_text(self, obj):
+        if len(obj.text_preview) < ADMIN_TEXT_PREVIEW_LENGTH:
+            return obj.text_preview
+        return f'{obj.text_preview}…'
+
+    @display(description='Количество в избранных',
+             ordering='favorites_count')
     def added_in_favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
@@ -57,22 +157,43 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredient)
-class IngredientAmountAdmin(admin.ModelAdmin):
+class IngredientAmountAdmin(LargeTableAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
-    list_filter = ('recipe',)
+    list_filter = (RecipeNameFilter,)
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        touch_recipes(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        touch_recipes(Recipe.objects.filter(pk=obj.recipe_id))
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ('user', 'following')
+    list_select_related = ('user', 'following')
+    autocomplete_fields = ('user', 'following')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+from recipes.models import CatalogVersion, Ingredient, Tag
+
+CATALOG_VERSION_ID = 1
+
+
+def bump_catalog_version():
+    """Отметить изменение справочников, чтобы процессы перечитали их."""
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=F('version') + 1
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_ID, defaults={'version': 1}
+        )
+
+
+class ReferenceCatalog:
+    """Справочники ингредиентов и тегов в памяти процесса.
+
+    Версия справочников в БД проверяется не чаще раза в check_interval
+    секунд, и при ее изменении справочники загружаются заново целиком.
+    Загруженные словари не изменяются, а заменяются новыми, поэтому
+    читать их можно из нескольких потоков без блокировок.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self.version = None
+        self.ingredients = {}
+        self.tags = {}
+        self._checked_at = None
+        self._reloaded_at = None
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        # Поля сериализаторов копируются вместе с аргументами, а справочник
+        # должен оставаться общим для процесса.
+        return self
+
+    @staticmethod
+    def current_version():
+        version = CatalogVersion.objects.filter(
+            pk=CATALOG_VERSION_ID
+        ).values_list('version', flat=True).first()
+        return version or 0
+
+    def refresh(self, check_now=False):
+        """Перечитать справочники, если их версия в БД изменилась."""
+        if not check_now and self._is_fresh():
+            return
+        with self._lock:
+            if not check_now and self._is_fresh():
+                return
+            version = self.current_version()
+            if version != self.version:
+                self.load(version)
+            # Проверка, упавшая с ошибкой БД, повторится при следующем вызове.
+            self._checked_at = time.monotonic()
+
+    def reload(self):
+        """Перечитать справочники независимо от версии."""
+        with self._lock:
+            self._checked_at = self._reloaded_at = time.monotonic()
+            self.load(self.current_version())
+
+    def _is_fresh(self):
+        return self._checked_at is not None and (
+            time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def load(self, version):
+        self.ingredients = {
+            pk: (name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        }
+        self.tags = {tag.pk: tag for tag in Tag.objects.all()}
+        self.version = version
+
+    def ingredient(self, pk):
+        """Название и единица измерения ингредиента, указанного в рецепте.
+
+        Промах сначала сверяет версию справочников. Если ингредиента нет и
+        после этого, справочник могли изменить в обход сигналов, и он
+        загружается заново, но не чаще раза в check_interval секунд: иначе
+        каждое обращение к удаленному ингредиенту перечитывало бы
+        справочники целиком. Если ингредиента нет и тогда, значит, его
+        удалили вместе со строками рецептов после их чтения, и возвращается
+        None.
+        """
+        self.refresh()
+        entry = self.ingredients.get(pk)
+        if entry is None:
+            self.refresh(check_now=True)
+            entry = self.ingredients.get(pk)
+        if entry is None and not self._reloaded_recently():
+            self.reload()
+            entry = self.ingredients.get(pk)
+        return entry
+
+    def _reloaded_recently(self):
+        return self._reloaded_at is not None and (
+            time.monotonic() - self._reloaded_at < self.check_interval
+        )
+
+    def has_ingredient(self, pk):
+        self.refresh()
+        if pk not in self.ingredients:
+            self.refresh(check_now=True)
+        return pk in self.ingredients
+
+    def tag(self, pk):
+        """Тег по id или None, если такого тега нет."""
+        self.refresh()
+        if pk not in self.tags:
+            self.refresh(check_now=True)
+        return self.tags.get(pk)
+
+
+catalog = ReferenceCatalog(settings.CATALOG_CHECK_INTERVAL)
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.db.models import Exists, Max, OuterRef, Q
+from django.db.transaction import atomic
+from django.utils import timezone
+from recipes.constants import RECIPE_CHANGE_SETTLE_SECONDS
+from recipes.models import RecipeChange, RecipeChangeHorizon
+
+CHANGE_HORIZON_ID = 1
+
+
+class ChangeTokenExpired(Exception):
+    """Токен старше границы сжатого журнала изменений."""
+
+
+def record_changes(recipe_ids, user_id=None, deleted=False):
+    """Добавить в журнал записи об изменении рецептов."""
+    RecipeChange.objects.bulk_create(
+        RecipeChange(recipe_id=pk, user_id=user_id, deleted=deleted)
+        for pk in recipe_ids
+    )
+
+
+def horizon():
+    return RecipeChangeHorizon.objects.filter(
+        pk=CHANGE_HORIZON_ID
+    ).values_list('token', flat=True).first() or 0
+
+
+def _settled(token):
+    """Записи после token, транзакции которых наверняка завершены.
+
+    Идентификаторы выдаются до фиксации транзакции, поэтому запись с
+    меньшим id может стать видимой позже записи с большим. Записи
+    моложе RECIPE_CHANGE_SETTLE_SECONDS и все следующие за первой из
+    них не выдаются, чтобы токен клиента не перескочил через них.
+    """
+    changes = RecipeChange.objects.filter(id__gt=token)
+    boundary = changes.filter(
+        created__gt=timezone.now() - timedelta(
+            seconds=RECIPE_CHANGE_SETTLE_SECONDS
+        )
+    ).order_by('id').values_list('id', flat=True).first()
+    if boundary is not None:
+        changes = changes.filter(id__lt=boundary)
+    return changes
+
+
+def current_token():
+    """Токен, с которого клиент начинает синхронизацию."""
+    token = horizon()
+    return _settled(token).aggregate(latest=Max('id'))['latest'] or token
+
+
+def changes_since(token, limit, user):
+    """Id рецептов, измененных после token, новый токен и признак продолжения.
+
+    Id перечислены в порядке первого изменения без повторов. Записи
+    других пользователей пропускаются, но токен сдвигается и за них.
+    """
+    if token < horizon():
+        raise ChangeTokenExpired
+    settled = _settled(token)
+    visible = Q(user__isnull=True)
+    if user.is_authenticated:
+        visible |= Q(user=user)
+    changes = list(
+        settled.filter(visible).order_by('id').values_list('id', 'recipe_id')
+        [:limit]
+    )
+    has_more = len(changes) == limit
+    if has_more:
+        new_token = changes[-1][0]
+    else:
+        new_token = settled.aggregate(latest=Max('id'))['latest'] or token
+    recipe_ids = list(dict.fromkeys(recipe_id for _, recipe_id in changes))
+    return recipe_ids, new_token, has_more
+
+
+@atomic
+def compact(retention):
+    """Сжать журнал изменений.
+
+    Удаляются записи, после которых есть более новая общая запись о том
+    же рецепте или более новая запись для того же пользователя: клиент с
+    любым токеном все равно получит более новую. Записи старше retention
+    удаляются целиком, а граница журнала сдвигается за них, и клиенты с
+    более старыми токенами должны загрузить рецепты заново.
+    """
+    newer = RecipeChange.objects.filter(
+        recipe_id=OuterRef('recipe_id'), id__gt=OuterRef('id')
+    )
+    shared = Exists(newer.filter(user__isnull=True))
+    personal = Exists(newer.filter(user=OuterRef('user')))
+    superseded = RecipeChange.objects.filter(shared | personal)
+    deduplicated, _ = superseded.delete()
+    expired = RecipeChange.objects.filter(
+        created__lt=timezone.now() - retention
+    )
+    token = expired.aggregate(latest=Max('id'))['latest']
+    expired_count = 0
+    if token is not None:
+        expired_count, _ = RecipeChange.objects.filter(
+            id__lte=token
+        ).delete()
+        RecipeChangeHorizon.objects.update_or_create(
+            pk=CHANGE_HORIZON_ID, defaults={'token': token}
+        )
+    return deduplicated, expired_count, horizon()
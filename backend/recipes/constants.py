@@ -1,7 +1,20 @@
+BASE62_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 100000
+ADMIN_TEXT_PREVIEW_LENGTH = 80
+EXPORT_CHUNK_SIZE = 500
 INGREDIENT_NAME_MAX_LENGTH = 128
 MEASURE_UNIT_MAX_LENGTH = 64
 MIN_AMOUNT = 1
 MIN_COOKING_TIME = 1
+RECIPE_CHANGE_RETENTION_DAYS = 30
+RECIPE_CHANGE_SETTLE_SECONDS = 5
 RECIPE_NAME_MAX_LENGTH = 256
 TAG_NAME_MAX_LENGTH = 32
 TAG_SLUG_MAX_LENGTH = 32
+TRENDING_FAVORITE_WEIGHT = 3
+TRENDING_FOLLOW_WEIGHT = 1
+TRENDING_HALF_LIFE = 24 * 60 * 60
+TRENDING_MIN_SCORE = 1e-6
+TRENDING_SHOPPING_CART_WEIGHT = 2
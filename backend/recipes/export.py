@@ -0,0 +1,131 @@
+import csv
+import json
+
+from django.db.models import prefetch_related_objects
+from recipes.catalog import catalog
+from recipes.constants import EXPORT_CHUNK_SIZE
+from recipes.models import Recipe
+
+CSV_HEADER = (
+    'id', 'name', 'author_id', 'author', 'cooking_time', 'pub_date',
+    'updated_at', 'image', 'tags', 'ingredients', 'text'
+)
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+EXPORT_FORMATS = tuple(EXPORT_CONTENT_TYPES)
+
+
+def iter_recipes(chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """Рецепты с тегами и ингредиентами, подгружаемыми пачками.
+
+    Рецепты читаются курсором на стороне сервера, а связанные объекты
+    подгружаются отдельно для каждой пачки, поэтому в памяти одновременно
+    находится не больше chunk_size рецептов.
+    """
+    recipes = Recipe.objects.select_related('author').order_by('pk')
+    if using is not None:
+        recipes = recipes.using(using)
+    chunk = []
+    for recipe in recipes.iterator(chunk_size=chunk_size):
+        chunk.append(recipe)
+        if len(chunk) >= chunk_size:
+            yield from _with_relations(chunk)
+            chunk = []
+    if chunk:
+        yield from _with_relations(chunk)
+
+
+def _with_relations(chunk):
+    prefetch_related_objects(chunk, 'tags', 'recipeingredient_set')
+    catalog.refresh()
+    ingredients = catalog.ingredients
+    # Справочник мог отстать от базы: ингредиенты, которых в нем нет,
+    # читаются из нее одним запросом на пачку.
+    misses = [
+        item for recipe in chunk for item in recipe.recipeingredient_set.all()
+        if item.ingredient_id not in ingredients
+    ]
+    prefetch_related_objects(misses, 'ingredient')
+    return chunk
+
+
+def recipe_record(recipe):
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'author': {
+            'id': recipe.author_id,
+            'username': recipe.author.username,
+        },
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'updated_at': recipe.updated_at.isoformat(),
+        'image': recipe.image.name,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            _ingredient_record(item)
+            for item in recipe.recipeingredient_set.all()
+        ],
+        'text': recipe.text,
+    }
+
+
+def _ingredient_record(item):
+    entry = catalog.ingredients.get(item.ingredient_id)
+    if entry is None:
+        ingredient = item.ingredient
+        if ingredient is None:
+            raise ValueError(
+                f'Ингредиент {item.ingredient_id} рецепта {item.recipe_id} '
+                'удален во время выгрузки.'
+            )
+        entry = ingredient.name, ingredient.measurement_unit
+    name, measurement_unit = entry
+    return {
+        'name': name,
+        'measurement_unit': measurement_unit,
+        'amount': item.amount,
+    }
+
+
+def export_ndjson(recipes):
+    for recipe in recipes:
+        yield json.dumps(recipe_record(recipe), ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(recipes):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for recipe in recipes:
+        record = recipe_record(recipe)
+        yield writer.writerow((
+            record['id'],
+            record['name'],
+            record['author']['id'],
+            record['author']['username'],
+            record['cooking_time'],
+            record['pub_date'],
+            record['updated_at'],
+            record['image'],
+            '|'.join(record['tags']),
+            '|'.join(
+                f'{item["name"]}:{item["amount"]}:{item["measurement_unit"]}'
+                for item in record['ingredients']
+            ),
+            record['text'],
+        ))
+
+
+EXPORTERS = {
+    'ndjson': export_ndjson,
+    'csv': export_csv,
+}
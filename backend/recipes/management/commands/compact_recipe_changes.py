@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from recipes.changes import compact
+from recipes.constants import RECIPE_CHANGE_RETENTION_DAYS
+
+
+class Command(BaseCommand):
+    help = 'Сжатие журнала изменений рецептов для синхронизации клиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int,
+            default=RECIPE_CHANGE_RETENTION_DAYS,
+            help='Сколько дней хранить записи журнала'
+        )
+
+    def handle(self, *args, **options):
+        deduplicated, expired, horizon = compact(
+            timedelta(days=options['retention_days'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено повторных записей: {deduplicated}, '
+            f'устаревших: {expired}. Граница журнала: {horizon}'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from recipes.constants import EXPORT_CHUNK_SIZE
+from recipes.export import EXPORT_FORMATS, EXPORTERS, iter_recipes
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка рецептов с тегами и ингредиентами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', choices=EXPORT_FORMATS, default='ndjson',
+            help='Формат выгрузки'
+        )
+        parser.add_argument(
+            '--file', help='Файл для выгрузки, по умолчанию stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Количество рецептов, загружаемых за один раз'
+        )
+
+    def handle(self, *args, **options):
+        lines = EXPORTERS[options['output']](
+            iter_recipes(options['chunk_size'])
+        )
+        if not options['file']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        newline = '' if options['output'] == 'csv' else None
+        with open(
+            options['file'], 'w', encoding='utf-8', newline=newline
+        ) as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(
+            f'Рецепты выгружены в {options["file"]}'
+        ))
@@ -1,6 +1,7 @@
 import json
 
 from django.core.management.base import BaseCommand
+from recipes.catalog import bump_catalog_version
 from recipes.models import Ingredient
 
 
@@ -16,6 +17,7 @@ class Command(BaseCommand):
             Ingredient.objects.bulk_create(
                 Ingredient(**ingredient) for ingredient in ingredients
             ),
+        bump_catalog_version()
 
         self.stdout.write(self.style.SUCCESS(
             'Ингредиенты успешно импортированы'
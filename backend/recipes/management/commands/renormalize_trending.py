@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.trending import renormalize
+
+
+class Command(BaseCommand):
+    help = 'Перенос точки отсчета оценок популярности рецептов'
+
+    def handle(self, *args, **options):
+        renormalize()
+        self.stdout.write(self.style.SUCCESS(
+            'Оценки популярности нормированы'
+        ))
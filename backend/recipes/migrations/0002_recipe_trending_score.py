@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-19 01:22
+
+import time
+
+from django.db import migrations, models
+
+
+def create_trending_state(apps, schema_editor):
+    TrendingState = apps.get_model('recipes', 'TrendingState')
+    TrendingState.objects.get_or_create(pk=1, defaults={'epoch': time.time()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.FloatField(verbose_name='Начало отсчета (unix-время)')),
+            ],
+            options={
+                'verbose_name': 'Состояние популярности',
+                'verbose_name_plural': 'состояние популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(create_trending_state, migrations.RunPython.noop),
+    ]
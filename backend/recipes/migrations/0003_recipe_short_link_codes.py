@@ -0,0 +1,73 @@
+# Generated by Django 3.2 on 2026-10-19 01:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BASE62_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+
+
+def encode_base62(number):
+    digits = []
+    while True:
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def short_link_code(number, aliases):
+    code = candidate = encode_base62(number)
+    suffix = 0
+    while candidate in aliases:
+        suffix += 1
+        candidate = f'{code}-{suffix}'
+    return candidate
+
+
+def backfill_short_links(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShortLinkAlias = apps.get_model('recipes', 'ShortLinkAlias')
+    ShortLinkAlias.objects.bulk_create(
+        ShortLinkAlias(recipe_id=recipe_id, slug=short_link)
+        for recipe_id, short_link in Recipe.objects.exclude(
+            short_link__isnull=True
+        ).exclude(short_link='').values_list('pk', 'short_link')
+    )
+    Recipe.objects.update(short_link=None)
+    # Код, совпавший с прежней ссылкой, увел бы ее на другой рецепт.
+    aliases = set(ShortLinkAlias.objects.values_list('slug', flat=True))
+    recipes = [
+        Recipe(pk=pk, short_link=short_link_code(pk, aliases))
+        for pk in Recipe.objects.values_list('pk', flat=True)
+    ]
+    Recipe.objects.bulk_update(recipes, ('short_link',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_trending_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_link',
+            field=models.SlugField(blank=True, null=True, unique=True, verbose_name='Короткая ссылка'),
+        ),
+        migrations.CreateModel(
+            name='ShortLinkAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(allow_unicode=True, max_length=256, unique=True, verbose_name='Короткая ссылка')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='short_link_aliases', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Прежняя короткая ссылка',
+                'verbose_name_plural': 'прежние короткие ссылки',
+            },
+        ),
+        migrations.RunPython(backfill_short_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-19 01:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_catalogversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChangeHorizon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.BigIntegerField(default=0, verbose_name='Токен')),
+            ],
+            options={
+                'verbose_name': 'Граница журнала изменений',
+                'verbose_name_plural': 'граница журнала изменений',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('recipe_id', models.BigIntegerField(verbose_name='Рецепт')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Рецепт удален')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'журнал изменений рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipechange',
+            index=models.Index(fields=['recipe_id', 'id'], name='recipechange_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipechange',
+            index=models.Index(fields=['created'], name='recipechange_created_idx'),
+        ),
+    ]
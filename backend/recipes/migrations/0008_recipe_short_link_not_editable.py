@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_link',
+            field=models.SlugField(blank=True, editable=False, null=True, unique=True, verbose_name='Короткая ссылка'),
+        ),
+    ]
@@ -2,11 +2,11 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.utils.text import slugify
 from recipes.constants import (INGREDIENT_NAME_MAX_LENGTH,
                                MEASURE_UNIT_MAX_LENGTH, MIN_AMOUNT,
                                MIN_COOKING_TIME, RECIPE_NAME_MAX_LENGTH,
                                TAG_NAME_MAX_LENGTH, TAG_SLUG_MAX_LENGTH)
+from recipes.utils import encode_base62, short_link_code
 
 User = get_user_model()
 
@@ -90,28 +90,145 @@ class Recipe(models.Model):
     short_link = models.SlugField(
         'Короткая ссылка',
         unique=True,
-        blank=True
+        blank=True,
+        null=True,
+        editable=False
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
         editable=False
     )
+    trending_score = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     def save(self, *args, **kwargs):
-        if not self.short_link:
-            self.short_link = slugify(self.name, allow_unicode=True)
         super().save(*args, **kwargs)
+        if not self.short_link:
+            # Новый код не должен перекрыть прежнюю ссылку другого рецепта.
+            aliases = set(ShortLinkAlias.objects.filter(
+                slug__startswith=encode_base62(self.pk)
+            ).values_list('slug', flat=True))
+            self.short_link = short_link_code(self.pk, aliases)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-trending_score', '-pub_date'],
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ShortLinkAlias(models.Model):
+    """Прежняя короткая ссылка рецепта, оставленная для совместимости."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link_aliases',
+        verbose_name='Рецепт'
+    )
+    slug = models.SlugField(
+        'Короткая ссылка',
+        max_length=RECIPE_NAME_MAX_LENGTH,
+        unique=True,
+        allow_unicode=True
+    )
+
+    class Meta:
+        verbose_name = 'Прежняя короткая ссылка'
+        verbose_name_plural = 'прежние короткие ссылки'
+
+    def __str__(self):
+        return self.slug
+
+
+class TrendingState(models.Model):
+    """Точка отсчета, к которой приведены оценки популярности рецептов."""
+    epoch = models.FloatField('Начало отсчета (unix-время)')
+
+    class Meta:
+        verbose_name = 'Состояние популярности'
+        verbose_name_plural = 'состояние популярности'
+
+
+class CatalogVersion(models.Model):
+    """Версия справочников ингредиентов и тегов, кэшируемых в процессах."""
+    version = models.PositiveBigIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия справочников'
+        verbose_name_plural = 'версия справочников'
+
+
+class RecipeChange(models.Model):
+    """Запись журнала изменений рецептов для синхронизации клиентов.
+
+    Идентификатор записи служит токеном синхронизации. Записи с
+    пользователем отражают изменения его избранного и списка покупок и
+    видны только ему; deleted отмечает удаление рецепта.
+    """
+    id = models.BigAutoField(primary_key=True)
+    recipe_id = models.BigIntegerField('Рецепт')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    deleted = models.BooleanField('Рецепт удален', default=False)
+    created = models.DateTimeField('Время изменения', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'журнал изменений рецептов'
+        indexes = [
+            models.Index(
+                fields=['recipe_id', 'id'],
+                name='recipechange_recipe_idx'
+            ),
+            models.Index(
+                fields=['created'],
+                name='recipechange_created_idx'
+            )
+        ]
+
+
+class RecipeChangeHorizon(models.Model):
+    """Токен, до которого журнал изменений рецептов сжат."""
+    token = models.BigIntegerField('Токен', default=0)
+
+    class Meta:
+        verbose_name = 'Граница журнала изменений'
+        verbose_name_plural = 'граница журнала изменений'
+
+
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -164,6 +281,12 @@ class RecipeTag(models.Model):
                 name='unique_recipe_tag'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['tag', 'recipe'],
+                name='recipetag_tag_recipe_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} {self.tag}'
@@ -192,6 +315,12 @@ class ShoppingCart(models.Model):
                 name='unique_user_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='cart_recipe_user_idx'
+            )
+        ]
 
 
 class Favorite(models.Model):
@@ -217,6 +346,12 @@ class Favorite(models.Model):
                 name='unique_favorite_user_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'],
+                name='favorite_recipe_user_idx'
+            )
+        ]
 
 
 class Follow(models.Model):
@@ -239,6 +374,12 @@ class Follow(models.Model):
                 name='unique_user_following'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['following', 'user'],
+                name='follow_following_user_idx'
+            )
+        ]
         verbose_name = 'Подписки'
         verbose_name_plural = 'подписки'
 
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from recipes.catalog import bump_catalog_version
+from recipes.changes import record_changes
+from recipes.constants import (TRENDING_FAVORITE_WEIGHT,
+                               TRENDING_FOLLOW_WEIGHT,
+                               TRENDING_SHOPPING_CART_WEIGHT)
+from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
+                            Tag)
+from recipes.trending import bump_author, bump_recipe
+
+User = get_user_model()
+
+
+def touch_recipes(recipes):
+    """Обновить updated_at и записать изменение рецептов в журнал.
+
+    Кэшированные представления рецептов при этом устаревают.
+    """
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now()
+        )
+        record_changes(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    record_changes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    record_changes([instance.pk], deleted=True)
+
+
+RECIPE_LINK_WEIGHTS = {
+    Favorite: TRENDING_FAVORITE_WEIGHT,
+    ShoppingCart: TRENDING_SHOPPING_CART_WEIGHT,
+}
+
+
+def link_added(model, user_id, target_id):
+    """Учесть новую связь: избранное, список покупок или подписку.
+
+    Вызывается приемником post_save и add_link, который на PostgreSQL
+    вставляет связь SQL-запросом без сигналов.
+    """
+    if model is Follow:
+        bump_author(target_id, TRENDING_FOLLOW_WEIGHT)
+        return
+    record_changes([target_id], user_id=user_id)
+    bump_recipe(target_id, RECIPE_LINK_WEIGHTS[model])
+
+
+def link_removed(model, user_id, target_id):
+    """Учесть удаление связи; вызывается post_delete и remove_link."""
+    if model is not Follow:
+        record_changes([target_id], user_id=user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_link_saved(sender, instance, created, **kwargs):
+    if created:
+        link_added(sender, instance.user_id, instance.recipe_id)
+    else:
+        record_changes([instance.recipe_id], user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_link_deleted(sender, instance, **kwargs):
+    link_removed(sender, instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        link_added(sender, instance.user_id, instance.following_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    # Строки связей удаляются каскадом без сигналов, поэтому рецепты
+    # отмечаются измененными один раз до удаления.
+    touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def catalog_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
@@ -0,0 +1,136 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, router, transaction
+from recipes.signals import link_added, link_removed
+
+
+def _fields(model):
+    """Поле пользователя и поле объекта связи, например recipe."""
+    user_field = model._meta.get_field('user')
+    target_field = next(
+        field for field in model._meta.concrete_fields
+        if field.is_relation and field is not user_field
+    )
+    return user_field, target_field
+
+
+def _target_pk(target_field, value):
+    try:
+        return target_field.target_field.to_python(value)
+    except ValidationError:
+        return None
+
+
+def add_link(model, user, target_id, fields):
+    """Связать пользователя с объектом: избранное, список покупок, подписка.
+
+    На PostgreSQL объект читается и связь вставляется одним запросом с
+    ON CONFLICT DO NOTHING, поэтому повтор и гонка не дают IntegrityError.
+    Из объекта читаются только поля fields. Возвращает (объект, создана
+    ли связь) или (None, False), если объекта нет. Сигналы при вставке
+    запросом не отправляются, последствия создания связи учитывает
+    link_added.
+    """
+    user_field, target_field = _fields(model)
+    target = target_field.related_model
+    target_pk = _target_pk(target_field, target_id)
+    if target_pk is None:
+        return None, False
+    names = [
+        field for field in target._meta.concrete_fields
+        if field.name in fields or field.primary_key
+    ]
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        obj = target.objects.using(using).filter(pk=target_pk).only(
+            *(field.name for field in names)
+        ).first()
+        if obj is None:
+            return None, False
+        try:
+            _, created = model.objects.using(using).get_or_create(
+                **{user_field.name: user, target_field.name: obj}
+            )
+        except IntegrityError:
+            created = False
+        return obj, created
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in names)
+    sql = f'''
+        WITH target AS (
+            SELECT {columns} FROM {quote(target._meta.db_table)}
+            WHERE {quote(target._meta.pk.column)} = %s
+        ), inserted AS (
+            INSERT INTO {quote(model._meta.db_table)}
+                ({quote(user_field.column)}, {quote(target_field.column)})
+            SELECT %s, {quote(target._meta.pk.column)} FROM target
+            ON CONFLICT DO NOTHING
+            RETURNING {quote(model._meta.pk.column)}
+        )
+        SELECT {columns}, (SELECT {quote(model._meta.pk.column)}
+                           FROM inserted)
+        FROM target
+    '''
+    nested = connection.in_atomic_block
+    try:
+        # Точка сохранения не дает ошибке сломать внешнюю транзакцию.
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [target_pk, user.pk])
+                row = cursor.fetchone()
+            if nested and row is not None and row[-1] is not None:
+                # Внешние ключи отложены до фиксации внешней транзакции.
+                connection.check_constraints(
+                    table_names=[model._meta.db_table]
+                )
+    except IntegrityError:
+        # Объект удален между чтением и проверкой внешнего ключа.
+        row = None
+    if row is None:
+        return None, False
+    *values, link_pk = row
+    obj = target.from_db(using, [field.attname for field in names], values)
+    if link_pk is not None:
+        link_added(model, user.pk, target_pk)
+    return obj, link_pk is not None
+
+
+def remove_link(model, user, target_id):
+    """Удалить связь пользователя с объектом.
+
+    На PostgreSQL связь удаляется и наличие объекта проверяется одним
+    запросом, а последствия удаления учитывает link_removed. Возвращает
+    (есть ли объект, была ли удалена связь).
+    """
+    user_field, target_field = _fields(model)
+    target = target_field.related_model
+    target_pk = _target_pk(target_field, target_id)
+    if target_pk is None:
+        return False, False
+    using = router.db_for_write(model)
+    connection = connections[using]
+    links = {user_field.name: user, target_field.attname: target_pk}
+    if connection.vendor != 'postgresql':
+        deleted, _ = model.objects.using(using).filter(**links).delete()
+        if deleted:
+            return True, True
+        return target.objects.using(using).filter(pk=target_pk).exists(), False
+    quote = connection.ops.quote_name
+    sql = f'''
+        WITH deleted AS (
+            DELETE FROM {quote(model._meta.db_table)}
+            WHERE {quote(user_field.column)} = %s
+                AND {quote(target_field.column)} = %s
+            RETURNING {quote(model._meta.pk.column)}
+        )
+        SELECT EXISTS (
+            SELECT 1 FROM {quote(target._meta.db_table)}
+            WHERE {quote(target._meta.pk.column)} = %s
+        ), (SELECT {quote(model._meta.pk.column)} FROM deleted)
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, target_pk, target_pk])
+        found, link_pk = cursor.fetchone()
+    if link_pk is not None:
+        link_removed(model, user.pk, target_pk)
+    return found, link_pk is not None
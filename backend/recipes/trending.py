@@ -0,0 +1,63 @@
+import time
+
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Coalesce, Power
+from django.db.transaction import atomic
+from recipes.constants import TRENDING_HALF_LIFE, TRENDING_MIN_SCORE
+from recipes.models import Recipe, TrendingState
+
+TRENDING_STATE_ID = 1
+
+
+def _boost(weight):
+    """Вес события, приведенный к текущей точке отсчета.
+
+    Оценка хранится как сумма весов, умноженных на 2 ** (t / период
+    полураспада), поэтому порядок рецептов по ней совпадает с порядком
+    по затухающей популярности, а новое событие добавляется одним UPDATE.
+    """
+    now = time.time()
+    epoch = Subquery(
+        TrendingState.objects.filter(pk=TRENDING_STATE_ID).values('epoch')
+    )
+    return Value(float(weight)) * Power(
+        Value(2.0),
+        (Value(now) - Coalesce(epoch, Value(now))) / Value(TRENDING_HALF_LIFE)
+    )
+
+
+def bump_recipe(recipe_id, weight):
+    """Увеличить популярность рецепта."""
+    Recipe.objects.filter(pk=recipe_id).update(
+        trending_score=F('trending_score') + _boost(weight)
+    )
+
+
+def bump_author(author_id, weight):
+    """Увеличить популярность всех рецептов автора."""
+    Recipe.objects.filter(author_id=author_id).update(
+        trending_score=F('trending_score') + _boost(weight)
+    )
+
+
+@atomic
+def renormalize():
+    """Перенести точку отсчета на текущий момент.
+
+    Без этого множитель новых событий растет экспоненциально и через
+    несколько сотен периодов полураспада выходит за пределы float.
+    """
+    now = time.time()
+    state, created = TrendingState.objects.select_for_update().get_or_create(
+        pk=TRENDING_STATE_ID, defaults={'epoch': now}
+    )
+    if created:
+        return
+    factor = 2 ** (-(now - state.epoch) / TRENDING_HALF_LIFE)
+    scored = Recipe.objects.filter(trending_score__gt=0)
+    scored.update(trending_score=F('trending_score') * factor)
+    scored.filter(trending_score__lt=TRENDING_MIN_SCORE).update(
+        trending_score=0
+    )
+    state.epoch = now
+    state.save(update_fields=('epoch',))
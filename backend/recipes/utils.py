@@ -0,0 +1,27 @@
+from recipes.constants import BASE62_ALPHABET
+
+
+def encode_base62(number):
+    """Представление неотрицательного числа в base62."""
+    base = len(BASE62_ALPHABET)
+    digits = []
+    while True:
+        number, remainder = divmod(number, base)
+        digits.append(BASE62_ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def short_link_code(number, aliases):
+    """Короткая ссылка рецепта: id в base62 или, если такой код уже занят
+    прежней ссылкой, код с суффиксом -1, -2 и так далее.
+
+    Часть до дефиса однозначно задает id, поэтому коды с суффиксом не
+    совпадают с кодами других рецептов.
+    """
+    code = candidate = encode_base62(number)
+    suffix = 0
+    while candidate in aliases:
+        suffix += 1
+        candidate = f'{code}-{suffix}'
+    return candidate